@@ -0,0 +1,56 @@
+"""
+Seeded synthetic market data for the benchmarks. The same seed always gives the same
+data, so runs of different versions replay exactly the same events.
+"""
+
+import numpy as np
+
+
+def synthetic_tob(
+    n: int,
+    seed: int = 0,
+    price: float = 100.0,
+    tick_size: float = 0.01,
+    interval_us: int = 100,
+) -> np.ndarray:
+    """
+    TOB updates of a random walk on the tick grid with a spread of one to three ticks.
+
+    :return: (np.ndarray) rows of [timestamp, bid_amount, bid_price, ask_price, ask_amount]
+    """
+    rng = np.random.default_rng(seed)
+    ts = np.cumsum(rng.integers(1, 2 * interval_us, n))
+    bid = np.round(price / tick_size) + np.cumsum(rng.integers(-1, 2, n))
+    ask = bid + rng.integers(1, 4, n)
+    return np.column_stack(
+        [
+            ts,
+            rng.exponential(1.0, n),
+            bid * tick_size,
+            ask * tick_size,
+            rng.exponential(1.0, n),
+        ]
+    )
+
+
+def synthetic_trades(
+    n: int,
+    seed: int = 0,
+    price: float = 100.0,
+    tick_size: float = 0.01,
+    interval_us: int = 100,
+) -> np.ndarray:
+    """
+    Public trades around a random walk, in the format of TOB_Exchange.load_trades.
+
+    :return: (np.ndarray) object rows of [timestamp, id, side, price, amount]
+    """
+    rng = np.random.default_rng(seed + 1)
+    trades = np.empty((n, 5), dtype=object)
+    trades[:, 0] = np.cumsum(rng.integers(1, 2 * interval_us, n))
+    trades[:, 1] = np.arange(n)
+    trades[:, 2] = np.where(rng.random(n) < 0.5, "buy", "sell")
+    ticks = np.round(price / tick_size) + np.cumsum(rng.integers(-1, 2, n))
+    trades[:, 3] = ticks * tick_size
+    trades[:, 4] = rng.exponential(0.1, n)
+    return trades
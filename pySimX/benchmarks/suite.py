@@ -0,0 +1,375 @@
+"""
+Throughput and memory benchmarks of pySimX.
+
+Every benchmark replays the seeded data of data.py and reports the number of events
+(or operations) per second of the best of `repeat` runs. The peak memory of loading
+and replaying market data is measured with tracemalloc in separate runs, as tracing
+slows down the timed code. Loading is reported in MB per million events. The replay
+only converts one block of records at a time, so its peak does not grow with the data
+and is reported in MB.
+
+    python -m pySimX.benchmarks --out results.json
+    python -m pySimX.benchmarks --out new.json --compare results.json
+
+With --compare, every throughput that dropped or memory figure that grew by more than
+the tolerance is reported as a regression and the exit code is 1.
+"""
+
+from typing import Callable, Dict, List, Optional
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from importlib import metadata
+
+import numpy as np
+
+from ..src.data_types import Order
+from ..src.exchange import TOB_Exchange
+from ..src.latency_models import ConstantLatency, LogNormalLatency
+from ..src.matching_engine import OrderBook
+from .data import synthetic_tob, synthetic_trades
+
+SYMBOL = "BTCUSDT"
+
+# Throughput targets in operations per second, printed next to the results. The
+# OrderBook target is set for the low-level id/tick interface only, add_order and
+# cancel_order also update Orders and build Trades and are not expected to reach it.
+TARGETS = {"order_book_add": 1_000_000, "order_book_cancel": 1_000_000}
+
+
+def _best(run: Callable[[], Optional[Callable[[], None]]], repeat: int) -> float:
+    """
+    Best time of the timed part of run. run prepares everything that is not measured
+    and returns the function to time.
+    """
+    best = np.inf
+    for _ in range(repeat):
+        timed = run()
+        start = time.perf_counter()
+        timed()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _result(count: int, seconds: float, unit: str = "events") -> dict:
+    return {unit: count, "seconds": seconds, f"{unit}_per_s": count / seconds}
+
+
+def _exchange(tob: np.ndarray, trades: Optional[np.ndarray] = None) -> TOB_Exchange:
+    exchange = TOB_Exchange(fees=[0, 0], latency=ConstantLatency(1))
+    exchange.add_market(SYMBOL, "BTC", "USDT", tick_size=0.01)
+    exchange.add_balance("BTC", 1e9)
+    exchange.add_balance("USDT", 1e12)
+    exchange.load_tob(tob, SYMBOL)
+    if trades is not None:
+        exchange.load_trades(trades, SYMBOL)
+    return exchange
+
+
+def bench_loading(n: int, seed: int, repeat: int) -> Dict[str, dict]:
+    tob = synthetic_tob(n, seed)
+    trades = synthetic_trades(n, seed)
+
+    def load_tob():
+        exchange = TOB_Exchange()
+        exchange.add_market(SYMBOL, "BTC", "USDT")
+        # Loading includes merging the records into the sorted store
+        return lambda: (exchange.load_tob(tob, SYMBOL), exchange.events.data)
+
+    def load_trades():
+        exchange = _exchange(tob[:1])
+        return lambda: (exchange.load_trades(trades, SYMBOL), exchange.events.data)
+
+    return {
+        "load_tob": _result(n, _best(load_tob, repeat)),
+        "load_trades": _result(n, _best(load_trades, repeat)),
+    }
+
+
+def _rest_orders(exchange: TOB_Exchange, count: int) -> None:
+    # Orders far away from the market on both sides, on different levels, so they
+    # rest for the whole replay
+    price = exchange.markets[SYMBOL].bp
+    ts = exchange.next_timestamp()
+    for i in range(count):
+        side = i % 2
+        level = price * (0.5 if side else 2) + (-1 if side else 1) * 0.01 * (i // 2)
+        exchange.limit_order(SYMBOL, 0.01, level, side, ts)
+    while len(exchange.live_events) > 0:
+        exchange._simulation_step()
+
+
+def bench_replay(
+    n: int, seed: int, repeat: int, open_orders: List[int]
+) -> Dict[str, dict]:
+    """
+    _simulation_step over TOB updates mixed with public trades, one trade every four
+    updates, with a number of resting orders that never fill.
+    """
+    exchange = _exchange(synthetic_tob(n, seed), synthetic_trades(n // 4, seed))
+    events = len(exchange.events.data)
+
+    out = {}
+    for count in open_orders:
+
+        def replay():
+            exchange.prepare_backtest()
+            _rest_orders(exchange, count)
+            start = exchange._cursor.position
+
+            def steps():
+                while exchange.has_events():
+                    exchange._simulation_step()
+                assert len(exchange.trades) == 0
+
+            replay.events = events - start
+            return steps
+
+        seconds = _best(replay, repeat)
+        out[f"simulation_step_{count}_orders"] = _result(replay.events, seconds)
+    return out
+
+
+def bench_order_book(n: int, seed: int, repeat: int) -> Dict[str, dict]:
+    rng = np.random.default_rng(seed)
+    sides = rng.integers(0, 2, n)
+    # Bids below and asks above 100, nothing crosses
+    offsets = rng.integers(1, 500, n) * 0.01
+    prices = np.where(sides == 1, 100 - offsets, 100 + offsets).tolist()
+    amounts = rng.exponential(1.0, n).tolist()
+    sides = sides.tolist()
+
+    def orders():
+        return [
+            Order(
+                symbol=SYMBOL,
+                side=sides[i],
+                taker=False,
+                amount=amounts[i],
+                price=prices[i],
+                entryTime=i,
+            )
+            for i in range(n)
+        ]
+
+    def add():
+        book = OrderBook(tick_size=0.01)
+        new = orders()
+        return lambda: [book.add_order(order) for order in new]
+
+    def cancel():
+        book = OrderBook(tick_size=0.01)
+        new = orders()
+        for order in new:
+            book.add_order(order)
+        rng.shuffle(new)
+        return lambda: [book.cancel_order(order) for order in new]
+
+    # The low-level interface with ids and ticks, without Order objects and Trades
+    ticks = [round(price / 0.01) for price in prices]
+    ids = rng.permutation(n).tolist()
+
+    def add_ids():
+        book = OrderBook(tick_size=0.01)
+        add = book.add
+        return lambda: [add(i, sides[i], ticks[i], amounts[i]) for i in range(n)]
+
+    def cancel_ids():
+        book = OrderBook(tick_size=0.01)
+        for i in range(n):
+            book.add(i, sides[i], ticks[i], amounts[i])
+        return lambda: [book.cancel(i) for i in ids]
+
+    return {
+        "order_book_add_order": _result(n, _best(add, repeat), "orders"),
+        "order_book_cancel_order": _result(n, _best(cancel, repeat), "orders"),
+        "order_book_add": _result(n, _best(add_ids, repeat), "orders"),
+        "order_book_cancel": _result(n, _best(cancel_ids, repeat), "orders"),
+    }
+
+
+def bench_latency(n: int, seed: int, repeat: int) -> Dict[str, dict]:
+    def single():
+        latency = LogNormalLatency(5000, 0.3, seed=seed)
+
+        def sample():
+            estimate = latency.estimate
+            for _ in range(n):
+                estimate()
+
+        return sample
+
+    def many():
+        latency = LogNormalLatency(5000, 0.3, seed=seed)
+        return lambda: latency.estimate_many(n)
+
+    return {
+        "latency_estimate": _result(n, _best(single, repeat), "samples"),
+        "latency_estimate_many": _result(n, _best(many, repeat), "samples"),
+    }
+
+
+def _peak_mb(run: Callable[[], None]) -> float:
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def bench_memory(n: int, seed: int) -> Dict[str, float]:
+    """
+    Peak traced memory of loading TOB data in MB per million events and of replaying
+    it in MB.
+    """
+    tob = synthetic_tob(n, seed)
+    exchange = TOB_Exchange(fees=[0, 0], latency=ConstantLatency(1))
+    exchange.add_market(SYMBOL, "BTC", "USDT")
+
+    def load():
+        exchange.load_tob(tob, SYMBOL)
+        exchange.events.data
+
+    def replay():
+        exchange.prepare_backtest()
+        while exchange.has_events():
+            exchange._simulation_step()
+
+    return {
+        "load_tob_mb_per_million": _peak_mb(load) * 1e6 / n,
+        "replay_peak_mb": _peak_mb(replay),
+    }
+
+
+def _version() -> Optional[str]:
+    try:
+        return metadata.version("pySimX")
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def run_suite(
+    events: int = 1_000_000,
+    orders: int = 100_000,
+    samples: int = 1_000_000,
+    memory_events: int = 200_000,
+    open_orders: List[int] = [0, 10, 100, 1_000],
+    seed: int = 0,
+    repeat: int = 3,
+) -> dict:
+    """
+    Run all benchmarks.
+
+    :param events: (int) number of TOB updates and trades for loading and replay
+    :param orders: (int) number of orders for the order book
+    :param samples: (int) number of latency samples
+    :param memory_events: (int) number of TOB updates for the memory measurement
+    :param open_orders: (List[int]) numbers of resting orders during the replay
+    :param seed: (int) seed of the synthetic data
+    :param repeat: (int) the best of this many runs is reported
+
+    :return: (dict) the results, ready to be written as JSON
+    """
+    results = {}
+    results.update(bench_loading(events, seed, repeat))
+    results.update(bench_replay(events, seed, repeat, open_orders))
+    results.update(bench_order_book(orders, seed, repeat))
+    results.update(bench_latency(samples, seed, repeat))
+
+    return {
+        "version": _version(),
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "params": {
+            "events": events,
+            "orders": orders,
+            "samples": samples,
+            "memory_events": memory_events,
+            "seed": seed,
+            "repeat": repeat,
+        },
+        "results": results,
+        "memory": bench_memory(memory_events, seed),
+    }
+
+
+def compare(current: dict, previous: dict, tolerance: float = 0.1) -> List[str]:
+    """
+    Regressions of current against previous: throughputs that are lower by more than
+    the tolerance and memory figures that are higher by more than the tolerance.
+
+    :return: (List[str]) one line per regression
+    """
+    regressions = []
+    for name, result in current["results"].items():
+        before = previous["results"].get(name)
+        if before is None:
+            continue
+        key = next(k for k in result if k.endswith("_per_s"))
+        if result[key] < before[key] * (1 - tolerance):
+            regressions.append(
+                f"{name}: {result[key]:,.0f} {key} < {before[key]:,.0f} before"
+            )
+
+    for name, value in current["memory"].items():
+        before = previous["memory"].get(name)
+        if before is not None and value > before * (1 + tolerance):
+            regressions.append(f"{name}: {value:.1f} MB > {before:.1f} MB before")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--out", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of a previous run")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--samples", type=int, default=1_000_000)
+    parser.add_argument("--memory-events", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    current = run_suite(
+        events=args.events,
+        orders=args.orders,
+        samples=args.samples,
+        memory_events=args.memory_events,
+        seed=args.seed,
+        repeat=args.repeat,
+    )
+
+    for name, result in current["results"].items():
+        key = next(k for k in result if k.endswith("_per_s"))
+        line = f"{name:<35} {result[key]:>15,.0f} {key}"
+        if name in TARGETS:
+            missed = " (missed)" if result[key] < TARGETS[name] else ""
+            line += f"  target {TARGETS[name]:,}{missed}"
+        print(line)
+    for name, value in current["memory"].items():
+        print(f"{name:<35} {value:>15.1f} MB")
+
+    if args.out is not None:
+        with open(args.out, "w") as f:
+            json.dump(current, f, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        regressions = compare(current, previous, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if len(regressions) > 0 else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,20 +5,31 @@ if parent_dir not in sys.path:
     sys.path.append(parent_dir)
 
 from src.data_types import OrderStatus
+from src.scheduler import Scheduler
 
 
 class cross_exchange:
-    def __init__(self, origin, hedging, initial_quote):
+    def __init__(
+        self,
+        origin,
+        hedging,
+        initial_quote,
+        amount=0.01,
+        distance=100 / 10_000,
+        sensitivity=20 / 10_000,
+    ):
         self.origin = origin
         self.hedging = hedging
+        # Both venues are replayed on one clock
+        self.scheduler = Scheduler({"origin": origin, "hedging": hedging})
 
         self.base = "BTC"
         self.quote = "USDT"
         self.symbol = self.base + self.quote
-        self.amount = 0.01
+        self.amount = amount
 
-        self.distance = 100 / 10_000  # place orders at 10bps distance
-        self.sensitivity = 20 / 10_000  # after a move of 4bps, replace the order
+        self.distance = distance  # place orders at 10bps distance
+        self.sensitivity = sensitivity  # after a move of 4bps, replace the order
         self.initial_quote = initial_quote
 
         self.last_buy_trade = -1
@@ -35,13 +46,13 @@ class cross_exchange:
         self.balances = []
 
     def run_strategy(self):
-        # Update the latest TOBs
-        hedging_tob = self.hedging.fetch_tob(self.symbol)
-        origin_tob = self.origin.fetch_tob(self.symbol)
-        hedging_ask = hedging_tob["ask_price"]
-        hedging_bid = hedging_tob["bid_price"]
+        # Latest TOB of the hedging exchange
+        hedging_tob = self.hedging.markets[self.symbol]
+        hedging_ask = hedging_tob.ap
+        hedging_bid = hedging_tob.bp
 
-        self.timestamp = max(origin_tob["timestamp"], hedging_tob["timestamp"])
+        # The TOB reaches the strategy one GET latency after the current event
+        self.timestamp = self.scheduler.now + int(self.hedging.latency.estimate())
 
         skew = abs(self.origin.balances["USDT"] / self.initial_quote)
         self.skew = skew
@@ -86,7 +97,7 @@ class cross_exchange:
             and not self.sell_open
             and skew < 0.9
         ):
-            new_price = round(hedging_ask * (1 + distance_up * self.distance), 8)
+            new_price = hedging_ask * (1 + distance_up * self.distance)
             # print(f"New sell {self.amount} @ {new_price} with {hedging_ask}")
             self.origin.limit_order(
                 self.symbol, self.amount, new_price, 0, self.timestamp
@@ -97,7 +108,7 @@ class cross_exchange:
         elif len(self.origin.open_orders[self.symbol][0]) == 1:
             # if the price moved too much, replace the order
             if abs(self.ask_open / hedging_ask - 1) > self.sensitivity:
-                new_price = round(hedging_ask * (1 + distance_up * self.distance), 8)
+                new_price = hedging_ask * (1 + distance_up * self.distance)
                 # print(f"Replacing sell {self.amount} @ {new_price} with {hedging_ask}")
                 self.origin.cancel_order(
                     self.origin.open_orders[self.symbol][0].peekitem(0)[1]
@@ -112,7 +123,7 @@ class cross_exchange:
             and not self.buy_open
             and skew > 0.2
         ):
-            new_price = round(hedging_ask * (1 - self.distance), 8)
+            new_price = hedging_ask * (1 - self.distance)
             # print(f"New Buy {self.amount} @ {new_price} with {hedging_bid}")
             self.origin.limit_order(
                 self.symbol, self.amount, new_price, 1, self.timestamp
@@ -124,7 +135,7 @@ class cross_exchange:
         elif (abs(self.bid_open / hedging_bid - 1) > self.sensitivity) and (
             len(self.origin.open_orders[self.symbol][1]) == 1
         ):
-            new_price = round(hedging_bid * (1 - self.distance), 8)
+            new_price = hedging_bid * (1 - self.distance)
             # print(f"Replacing buy {self.amount} @ {new_price} with {hedging_bid}")
             self.origin.cancel_order(
                 self.origin.open_orders[self.symbol][1].peekitem(0)[1]
@@ -134,28 +145,23 @@ class cross_exchange:
             )
             self.bid_open = hedging_bid
 
-        # Run the simulation step in the place where we are behind
-        if hedging_tob["timestamp"] > origin_tob["timestamp"]:
-            self.origin._simulation_step()
-        else:
-            self.hedging._simulation_step()
-
     def run_simulation(self):
-        while (len(self.origin.events) > 0) and (len(self.hedging.events) > 0):
+        self.scheduler.prepare_backtest()
+        while self.scheduler.has_events():
             self.run_strategy()
+            # Process the next event of whichever exchange is first
+            self.scheduler.step()
 
             self.counter += 1
             if self.counter >= 100:
-                hedging_tob = self.hedging.fetch_tob(self.symbol)
+                hedging_tob = self.hedging.markets[self.symbol]
                 self.counter = 0
                 update = self.origin.balances.copy()
                 u_2 = self.hedging.balances.copy()
 
                 update["base_hedging"] = u_2[self.base]
                 update["quote_hedging"] = u_2[self.quote]
-                update["mid"] = (
-                    hedging_tob["bid_price"] + hedging_tob["ask_price"]
-                ) / 2
+                update["mid"] = (hedging_tob.bp + hedging_tob.ap) / 2
 
                 # print(self.bid_open, hedging_tob['bid_price'], len(origin.open_orders[self.symbol][1]), self.skew, abs(self.bid_open / hedging_tob['bid_price'] - 1) * 10_000)
                 update["ts"] = self.timestamp
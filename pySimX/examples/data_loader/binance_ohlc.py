@@ -31,3 +31,24 @@ def fetch_data(symbol: str, interval: str, start: datetime, end: datetime):
         data += tmp_data
 
     return data
+
+
+def to_ohlc(data: list) -> pd.DataFrame:
+    """
+    Bars in the format of the OHLCExchange and backtest from the raw klines.
+    """
+    df = pd.DataFrame(
+        [row[:6] for row in data],
+        columns=["timestamp", "open", "high", "low", "close", "volume"],
+    )
+    df = df.drop_duplicates("timestamp").reset_index(drop=True)
+    return df.astype(
+        {
+            "timestamp": "int64",
+            "open": float,
+            "high": float,
+            "low": float,
+            "close": float,
+            "volume": float,
+        }
+    )
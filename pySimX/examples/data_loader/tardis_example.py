@@ -29,3 +29,13 @@ datasets.download(
     symbols=["SUSHIUSDT"]  # ["BTCUSDT"],
     # api_key="YOUR API KEY (optionally)",
 )
+
+# Convert the downloaded files once into a memory-mapped cache. Backtests can then use
+# TOB_Exchange.load_cache("datasets/SUSHIUSDT.psx") instead of parsing the CSVs again.
+# from src.data_loader import convert_tardis
+#
+# convert_tardis(
+#     quotes=[f"datasets/binance-futures_quotes_{start}_SUSHIUSDT.csv.gz"],
+#     trades=[f"datasets/binance-futures_trades_{start}_SUSHIUSDT.csv.gz"],
+#     path="datasets/SUSHIUSDT.psx",
+# )
@@ -1,10 +1,63 @@
-from .exchange import OHLCExchange
+from typing import List, Literal, Optional
+import numpy as np
 import pandas as pd
 
+from .exchange import OHLCExchange
+from .ohlc import BarResult, simulate_bars
+
 
 class backtest:
     def __init__(self, ohlc: pd.DataFrame) -> None:
+        """
+        :param ohlc: (pd.DataFrame) bars with the columns timestamp, open, high, low,
+        close, e.g. from examples/data_loader/binance_ohlc.py
+        """
         self.ohlc = ohlc
 
-    def run(self):
-        pass
+    def run(
+        self,
+        target: np.ndarray,
+        fees: List[int] = [0, 2],
+        initial_quote: float = 10_000,
+        fill: Literal["next_open", "limit"] = "next_open",
+        limit: Optional[np.ndarray] = None,
+    ) -> BarResult:
+        """
+        Vectorized backtest of target positions, see simulate_bars. A target of shape
+        (bars, configs) runs every configuration at once.
+        """
+        return simulate_bars(
+            self.ohlc["open"].to_numpy(),
+            self.ohlc["high"].to_numpy(),
+            self.ohlc["low"].to_numpy(),
+            self.ohlc["close"].to_numpy(),
+            target,
+            fees=fees,
+            initial_quote=initial_quote,
+            fill=fill,
+            limit=limit,
+        )
+
+    def run_events(
+        self,
+        strategy,
+        symbol: str,
+        base: str,
+        quote: str,
+        fees: List[int] = [0, 2],
+        initial_quote: float = 10_000,
+        initial_base: float = 0,
+    ) -> OHLCExchange:
+        """
+        Event-driven backtest on an OHLCExchange, strategy(exchange) is called with
+        the exchange and has to provide run_strategy.
+
+        :return: (OHLCExchange) the exchange after the run
+        """
+        exchange = OHLCExchange(fees=fees)
+        exchange.add_market(symbol, base, quote)
+        exchange.add_balance(base, initial_base)
+        exchange.add_balance(quote, initial_quote)
+        exchange.load_ohlc(self.ohlc, symbol)
+        exchange.run_simulation(lambda _: strategy(exchange), symbol)
+        return exchange
@@ -0,0 +1,198 @@
+"""
+Loaders for market data in the CSV format of Tardis.
+
+See https://docs.tardis.dev/downloadable-csv-files and examples/data_loader/tardis_example.py
+on how to download the files. The columns used are:
+- quotes: symbol, timestamp, ask_amount, ask_price, bid_price, bid_amount
+- trades: symbol, timestamp, side, price, amount
+- incremental_book_L2: symbol, timestamp, is_snapshot, side, price, amount
+"""
+
+from typing import Iterator, List, Sequence
+from functools import partial
+import numpy as np
+import pandas as pd
+
+from .event_store import EventStore, EventStream, book_chunk, tob_chunk, trade_chunk
+
+QUOTE_COLUMNS = [
+    "symbol",
+    "timestamp",
+    "bid_amount",
+    "bid_price",
+    "ask_price",
+    "ask_amount",
+]
+TRADE_COLUMNS = ["symbol", "timestamp", "side", "price", "amount"]
+BOOK_COLUMNS = ["symbol", "timestamp", "is_snapshot", "side", "price", "amount"]
+
+
+def _book_chunk(symbol_id: int, df: pd.DataFrame) -> np.ndarray:
+    return book_chunk(
+        symbol_id,
+        ts=df["timestamp"].to_numpy(np.int64),
+        side=(df["side"] == "bid").to_numpy(),
+        price=df["price"].to_numpy(np.float64),
+        amount=df["amount"].to_numpy(np.float64),
+        snapshot=df["is_snapshot"].to_numpy(bool),
+    )
+
+
+def read_tardis(
+    quotes: List[str],
+    trades: List[str],
+    store: EventStore = None,
+    book: Sequence[str] = (),
+) -> EventStore:
+    """
+    Read Tardis quote, trade and incremental_book_L2 files (csv or csv.gz) into an
+    event store.
+
+    :param quotes: (List[str]) paths of the quote files
+    :param trades: (List[str]) paths of the trade files
+    :param store: (EventStore) store to add the events to, a new one if None
+    :param book: (Sequence[str]) paths of the incremental_book_L2 files
+
+    :return: (EventStore)
+    """
+    store = EventStore() if store is None else store
+
+    # Tardis file names contain the date, sorting them keeps the days in order
+    for path in sorted(quotes):
+        df = pd.read_csv(path, usecols=QUOTE_COLUMNS)
+        for symbol, group in df.groupby("symbol", sort=False):
+            store.add_tob(group[QUOTE_COLUMNS[1:]].to_numpy(np.float64), symbol)
+
+    for path in sorted(trades):
+        df = pd.read_csv(path, usecols=TRADE_COLUMNS)
+        for symbol, group in df.groupby("symbol", sort=False):
+            chunk = trade_chunk(
+                store.symbol_id(symbol),
+                ts=group["timestamp"].to_numpy(np.int64),
+                side=(group["side"] == "buy").to_numpy(),
+                price=group["price"].to_numpy(np.float64),
+                amount=group["amount"].to_numpy(np.float64),
+            )
+            store.add_chunk(chunk)
+
+    for path in sorted(book):
+        df = pd.read_csv(path, usecols=BOOK_COLUMNS)
+        for symbol, group in df.groupby("symbol", sort=False):
+            store.add_chunk(_book_chunk(store.symbol_id(symbol), group))
+
+    return store
+
+
+def convert_tardis(
+    quotes: List[str], trades: List[str], path: str, book: Sequence[str] = ()
+) -> EventStore:
+    """
+    One-time conversion of Tardis quote, trade and book files into a binary cache file.
+    Later runs can memory-map the cache with EventStore.load or TOB_Exchange.load_cache
+    instead of parsing the CSV files again.
+
+    :param quotes: (List[str]) paths of the quote files
+    :param trades: (List[str]) paths of the trade files
+    :param path: (str) location of the cache file
+    :param book: (Sequence[str]) paths of the incremental_book_L2 files
+
+    :return: (EventStore) the memory-mapped cache
+    """
+    read_tardis(quotes, trades, book=book).save(path)
+    return EventStore.load(path)
+
+
+def _quote_chunks(
+    paths: List[str], symbol_id: int, chunk_size: int, skip_first: bool
+) -> Iterator[np.ndarray]:
+    for path in paths:
+        for df in pd.read_csv(path, usecols=QUOTE_COLUMNS, chunksize=chunk_size):
+            values = df[QUOTE_COLUMNS[1:]].to_numpy(np.float64)
+            # The first quote is the initial state of the market and not an event
+            if skip_first:
+                values = values[1:]
+                skip_first = False
+            yield tob_chunk(
+                symbol_id,
+                ts=values[:, 0].astype(np.int64),
+                bq=values[:, 1],
+                bp=values[:, 2],
+                ap=values[:, 3],
+                aq=values[:, 4],
+            )
+
+
+def _trade_chunks(
+    paths: List[str], symbol_id: int, chunk_size: int
+) -> Iterator[np.ndarray]:
+    for path in paths:
+        for df in pd.read_csv(path, usecols=TRADE_COLUMNS, chunksize=chunk_size):
+            yield trade_chunk(
+                symbol_id,
+                ts=df["timestamp"].to_numpy(np.int64),
+                side=(df["side"] == "buy").to_numpy(),
+                price=df["price"].to_numpy(np.float64),
+                amount=df["amount"].to_numpy(np.float64),
+            )
+
+
+def _book_chunks(
+    paths: List[str], symbol_id: int, chunk_size: int
+) -> Iterator[np.ndarray]:
+    for path in paths:
+        for df in pd.read_csv(path, usecols=BOOK_COLUMNS, chunksize=chunk_size):
+            yield _book_chunk(symbol_id, df)
+
+
+def _group_by_symbol(paths: List[str]) -> dict:
+    """
+    Group files by the symbol in their first row, every group sorted by file name.
+    """
+    groups = {}
+    for path in sorted(paths):
+        symbol = pd.read_csv(path, usecols=["symbol"], nrows=1)["symbol"].iloc[0]
+        groups.setdefault(symbol, []).append(path)
+    return groups
+
+
+def stream_tardis(
+    quotes: List[str],
+    trades: List[str],
+    chunk_size: int = 250_000,
+    book: Sequence[str] = (),
+) -> EventStream:
+    """
+    Stream Tardis quote and trade files (csv or csv.gz) lazily into the backtest. The
+    files are read in chunks of chunk_size rows while the events are replayed, so the
+    peak memory depends on the chunk size and not on the length of the files. Every
+    file has to contain a single symbol, as the downloads from Tardis do.
+
+    :param quotes: (List[str]) paths of the quote files
+    :param trades: (List[str]) paths of the trade files
+    :param chunk_size: (int) number of rows read at once from a file
+    :param book: (Sequence[str]) paths of the incremental_book_L2 files
+
+    :return: (EventStream) can be passed to TOB_Exchange(events=...)
+    """
+    stream = EventStream()
+
+    for symbol, paths in _group_by_symbol(quotes).items():
+        first = pd.read_csv(paths[0], usecols=QUOTE_COLUMNS, nrows=1)
+        ts, bq, bp, ap, aq = first[QUOTE_COLUMNS[1:]].to_numpy(np.float64)[0].tolist()
+        stream.initial[symbol] = (int(ts), bq, bp, ap, aq)
+
+        stream.add_source(
+            partial(_quote_chunks, paths, stream.symbol_id(symbol), chunk_size, True)
+        )
+
+    for symbol, paths in _group_by_symbol(trades).items():
+        stream.add_source(
+            partial(_trade_chunks, paths, stream.symbol_id(symbol), chunk_size)
+        )
+
+    for symbol, paths in _group_by_symbol(book).items():
+        stream.add_source(
+            partial(_book_chunks, paths, stream.symbol_id(symbol), chunk_size)
+        )
+
+    return stream
@@ -1,8 +1,9 @@
 from dataclasses import dataclass, field
 from itertools import count
-from typing import Optional
-from enum import Enum
+from typing import List, Optional
+from enum import Enum, IntEnum
 from collections import OrderedDict
+from decimal import Decimal
 
 
 class OrderStatus(Enum):
@@ -15,8 +16,27 @@ class OrderStatus(Enum):
 ExchangeType = Enum("ExchangeType", ["future", "spot"])
 
 
-# TOB
-@dataclass
+# Kinds of events. TOB, TRADE and the BOOK updates are market data stored in the
+# columnar event store, the others are user events in the live queue of the exchange.
+class EventKind(IntEnum):
+    TOB = 0
+    TRADE = 1
+    ORDER = 2
+    MODIFY = 3
+    CANCEL = 4
+    BOOK = 5
+    BOOK_SNAPSHOT = 6
+    CANCEL_ALL = 7
+    REPLACE = 8
+    BATCH = 9
+
+
+# The events are slotted dataclasses, they have no per-instance __dict__ which keeps
+# them small and fast to create in the replay loop.
+
+
+# TOB, the market state of a symbol is updated in place on every TOB event
+@dataclass(slots=True)
 class TOB:
     symbol: str
     timestamp: int
@@ -26,17 +46,47 @@ class TOB:
     aq: float
 
 
+# Market of an exchange. Prices and amounts are kept on the grid of the tick and lot
+# size: internally as integer ticks and lots, at the interface as floats rounded to the
+# decimals of the grid, so the same tick always gives the same float.
+@dataclass(slots=True)
+class Instrument:
+    symbol: str
+    base: str
+    quote: str
+    tick_size: float = 1e-8
+    lot_size: float = 1e-8
+    price_decimals: int = field(init=False)
+    amount_decimals: int = field(init=False)
+
+    def __post_init__(self):
+        self.price_decimals = max(0, -Decimal(str(self.tick_size)).as_tuple().exponent)
+        self.amount_decimals = max(0, -Decimal(str(self.lot_size)).as_tuple().exponent)
+
+    def ticks(self, price: float) -> int:
+        return int(round(price / self.tick_size))
+
+    def price(self, ticks: int) -> float:
+        return round(ticks * self.tick_size, self.price_decimals)
+
+    def lots(self, amount: float) -> int:
+        return int(round(amount / self.lot_size))
+
+    def amount(self, lots: int) -> float:
+        return round(lots * self.lot_size, self.amount_decimals)
+
+
 # Orderbook level
 @dataclass
 class Level:
     price: float
     size: int = 0
     totalAmount: float = 0
-    orders = OrderedDict()
+    orders: OrderedDict = field(default_factory=OrderedDict)
 
 
 # Order definition
-@dataclass
+@dataclass(slots=True)
 class Order:
     order_id: int = field(default_factory=count().__next__, init=False)
     symbol: str
@@ -49,28 +99,54 @@ class Order:
     eventTime: Optional[int] = None
     status: OrderStatus = OrderStatus.OPEN
     parentLevel: Optional[Level] = None
+    # Price and amount on the grid of the market, set by the exchange
+    tick: int = 0
+    lots: int = 0
 
     def __post_init__(self):
         self.remainingAmount = self.amount
 
 
 # Modify Order
-@dataclass
+@dataclass(slots=True)
 class ModifyOrder:
     symbol: str
     order: Order
-    new_amount: Optional[float]
-    new_price: Optional[float]
+    new_amount: Optional[float] = None
+    new_price: Optional[float] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class CancelOrder:
     symbol: str
     order: Order
 
 
+# Cancel all open orders of a symbol, of both sides if side is None
+@dataclass(slots=True)
+class CancelAll:
+    symbol: str
+    side: Optional[bool] = None
+
+
+# Cancel an order and send a new one in its place, the new order is only placed if the
+# old one was still open
+@dataclass(slots=True)
+class ReplaceOrder:
+    symbol: str
+    order: Order
+    new_order: Order
+
+
+# Several user events sent as one message, applied in order as (EventKind, event)
+@dataclass(slots=True)
+class OrderBatch:
+    symbol: str
+    events: List[tuple] = field(default_factory=list)
+
+
 # Trade definition
-@dataclass
+@dataclass(slots=True)
 class Trade:
     symbol: str
     trade_id: int = field(default_factory=count().__next__, init=False)
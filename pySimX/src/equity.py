@@ -0,0 +1,115 @@
+"""
+Recorder of the balances of an exchange over the course of a backtest.
+
+Every sample is written into growable NumPy columns, one per asset plus the mid price
+of the traded symbol and the timestamp, instead of copying the balances into a new
+dict. How often a sample is taken is configurable: every N events, every T
+microseconds and/or whenever a trade was filled.
+"""
+
+from typing import Optional
+import numpy as np
+import pandas as pd
+
+
+class EquityRecorder:
+    def __init__(
+        self,
+        every_events: Optional[int] = 1,
+        every_us: Optional[int] = None,
+        on_fills: bool = False,
+        capacity: int = 4096,
+    ) -> None:
+        """
+        A sample is taken as soon as one of the configured conditions is met.
+
+        :param every_events: (int) sample every N events, disabled if None
+        :param every_us: (int) sample once T microseconds have passed since the last
+        sample, disabled if None
+        :param on_fills: (bool) sample after every event that filled an order
+        :param capacity: (int) initial number of rows, the columns double when full
+        """
+        self.every_events = every_events
+        self.every_us = every_us
+        self.on_fills = on_fills
+        self.capacity = capacity
+        self.reset()
+
+    def reset(self) -> None:
+        self._columns = {}
+        self._size = 0
+        self._events = 0
+        self._fills = 0
+        self._last_ts = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    def sample(
+        self, ts: int, balances: dict, mid_name: str, mid: float, fills: int
+    ) -> None:
+        """
+        Called after every event, records a row if one of the conditions is met.
+
+        :param ts: (int) timestamp of the event
+        :param balances: (dict) asset -> balance
+        :param mid_name: (str) name of the mid price column, e.g. "BTCUSDT_mid"
+        :param mid: (float) mid price of the symbol
+        :param fills: (int) number of fills of the exchange so far
+        """
+        self._events += 1
+        if (
+            (self.every_events is not None and self._events >= self.every_events)
+            or (
+                self.every_us is not None
+                and (self._last_ts is None or ts - self._last_ts >= self.every_us)
+            )
+            or (self.on_fills and fills > self._fills)
+        ):
+            self.record(ts, balances, mid_name, mid)
+        self._fills = fills
+
+    def record(self, ts: int, balances: dict, mid_name: str, mid: float) -> None:
+        """
+        Record a row unconditionally.
+        """
+        if self._size == len(self._columns.get("ts", ())):
+            self._grow()
+
+        i = self._size
+        for asset, balance in balances.items():
+            self._column(asset, np.float64)[i] = balance
+        self._column(mid_name, np.float64)[i] = mid
+        self._column("ts", np.int64)[i] = ts
+
+        self._size += 1
+        self._events = 0
+        self._last_ts = ts
+
+    def _column(self, name: str, dtype: type) -> np.ndarray:
+        column = self._columns.get(name)
+        if column is None:
+            # Columns that appear later are NaN in the rows before
+            length = max(len(self._columns.get("ts", ())), self.capacity)
+            column = np.zeros(length, dtype=dtype)
+            if dtype == np.float64:
+                column[:] = np.nan
+            self._columns[name] = column
+        return column
+
+    def _grow(self) -> None:
+        for name, column in self._columns.items():
+            grown = np.zeros(max(2 * len(column), self.capacity), dtype=column.dtype)
+            if column.dtype == np.float64:
+                grown[len(column) :] = np.nan
+            grown[: len(column)] = column
+            self._columns[name] = grown
+
+    def to_numpy(self) -> dict:
+        """
+        :return: (dict) column name -> array of the recorded rows
+        """
+        return {name: column[: self._size] for name, column in self._columns.items()}
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return pd.DataFrame({k: v.copy() for k, v in self.to_numpy().items()})
@@ -0,0 +1,557 @@
+"""
+Columnar storage for the historical market data that is replayed by the exchanges.
+
+Instead of allocating one python object per quote or trade, all preloaded events are
+kept in a single NumPy structured array sorted by timestamp. During a backtest the
+array is walked with an integer cursor and only the user generated events (orders,
+cancels, modifications) live in a small priority queue inside the exchange.
+
+Once merged, the data is read-only. The same store can be shared by several exchanges
+and backtest runs, every run only creates a new cursor over it.
+
+Every record has the same layout:
+- ts: event timestamp (int, us)
+- symbol: id of the symbol in the symbol table of the store
+- kind: EventKind of the record (TOB, TRADE, BOOK or BOOK_SNAPSHOT)
+- side: 1 for a buy, 0 for a sell (trades), 1 for the bid, 0 for the ask (book)
+- bq, bp, ap, aq: bid quantity, bid price, ask price, ask quantity (TOB only)
+- price, amount: price and amount of the public trade, or the price level and its new
+  total amount for a book update (0 removes the level)
+
+A store can be written to a binary cache file with `save` and memory-mapped again with
+`EventStore.load`. The file consists of:
+- 8 bytes magic (MAGIC) and 8 bytes little-endian header length
+- a JSON header with the symbol table, initial TOBs, time range and record count
+- padding up to a multiple of 64 bytes, followed by the raw EVENT_DTYPE records
+
+Data that does not fit into memory can be replayed through an EventStream instead, which
+merges sorted chunks from several lazy sources while the backtest runs.
+"""
+
+from typing import Callable, Iterable, Iterator, List, Optional
+import json
+import numpy as np
+
+from .data_types import EventKind
+
+EVENT_DTYPE = np.dtype(
+    [
+        ("ts", np.int64),
+        ("symbol", np.int32),
+        ("kind", np.int8),
+        ("side", np.int8),
+        ("bq", np.float64),
+        ("bp", np.float64),
+        ("ap", np.float64),
+        ("aq", np.float64),
+        ("price", np.float64),
+        ("amount", np.float64),
+    ]
+)
+
+MAGIC = b"PYSIMX01"
+ALIGNMENT = 64
+
+
+def tob_chunk(
+    symbol_id: int,
+    ts: np.ndarray,
+    bq: np.ndarray,
+    bp: np.ndarray,
+    ap: np.ndarray,
+    aq: np.ndarray,
+) -> np.ndarray:
+    """
+    Build an array of TOB events out of the individual columns.
+    """
+    chunk = np.zeros(len(ts), dtype=EVENT_DTYPE)
+    chunk["ts"] = ts
+    chunk["symbol"] = symbol_id
+    chunk["kind"] = EventKind.TOB
+    chunk["bq"] = bq
+    chunk["bp"] = bp
+    chunk["ap"] = ap
+    chunk["aq"] = aq
+    return chunk
+
+
+def trade_chunk(
+    symbol_id: int,
+    ts: np.ndarray,
+    side: np.ndarray,
+    price: np.ndarray,
+    amount: np.ndarray,
+) -> np.ndarray:
+    """
+    Build an array of public trade events out of the individual columns.
+    """
+    chunk = np.zeros(len(ts), dtype=EVENT_DTYPE)
+    chunk["ts"] = ts
+    chunk["symbol"] = symbol_id
+    chunk["kind"] = EventKind.TRADE
+    chunk["side"] = side
+    chunk["price"] = price
+    chunk["amount"] = amount
+    return chunk
+
+
+def book_chunk(
+    symbol_id: int,
+    ts: np.ndarray,
+    side: np.ndarray,
+    price: np.ndarray,
+    amount: np.ndarray,
+    snapshot: np.ndarray,
+) -> np.ndarray:
+    """
+    Build an array of L2 book updates out of the individual columns. Rows that are
+    part of a snapshot get the kind BOOK_SNAPSHOT.
+    """
+    chunk = np.zeros(len(ts), dtype=EVENT_DTYPE)
+    chunk["ts"] = ts
+    chunk["symbol"] = symbol_id
+    chunk["kind"] = np.where(snapshot, EventKind.BOOK_SNAPSHOT, EventKind.BOOK)
+    chunk["side"] = side
+    chunk["price"] = price
+    chunk["amount"] = amount
+    return chunk
+
+
+def merge_chunks(streams: List[Iterable[np.ndarray]]) -> Iterator[np.ndarray]:
+    """
+    Lazily merge several streams of event chunks, each sorted by timestamp, into one
+    sorted stream of chunks. Only the current chunk of every stream is kept in memory.
+    Events with the same timestamp are ordered by the position of their stream.
+
+    :param streams: (List[Iterable[np.ndarray]]) streams of EVENT_DTYPE arrays
+
+    :return: (Iterator[np.ndarray]) merged chunks
+    """
+    iterators = [iter(stream) for stream in streams]
+    buffers = [np.zeros(0, dtype=EVENT_DTYPE) for _ in iterators]
+    active = [True for _ in iterators]
+
+    while True:
+        # Refill the empty buffers of streams that are not exhausted yet
+        for i, it in enumerate(iterators):
+            while active[i] and len(buffers[i]) == 0:
+                chunk = next(it, None)
+                if chunk is None:
+                    active[i] = False
+                else:
+                    buffers[i] = chunk
+
+        if not any(active):
+            rest = [b for b in buffers if len(b) > 0]
+            if len(rest) > 0:
+                rest = np.concatenate(rest)
+                yield rest[np.argsort(rest["ts"], kind="stable")]
+            return
+
+        # Everything before the smallest last timestamp of the active streams is final
+        watermark = min(b["ts"][-1] for i, b in enumerate(buffers) if active[i])
+        parts = []
+        for i, b in enumerate(buffers):
+            n = np.searchsorted(b["ts"], watermark, side="left")
+            if n > 0:
+                parts.append(b[:n])
+                buffers[i] = b[n:]
+
+        # The streams that end on the watermark only hold events at the watermark,
+        # extend them with their next chunk so equal timestamps stay in stream order
+        for i, b in enumerate(buffers):
+            if active[i] and len(b) > 0 and b["ts"][-1] == watermark:
+                chunk = next(iterators[i], None)
+                if chunk is None:
+                    active[i] = False
+                else:
+                    buffers[i] = np.concatenate([b, chunk])
+
+        if len(parts) > 0:
+            merged = np.concatenate(parts)
+            yield merged[np.argsort(merged["ts"], kind="stable")]
+
+
+class MarketData:
+    def __init__(self) -> None:
+        # Symbol table, the position in the list is the id stored in the records
+        self.symbols = []
+        self.symbol_ids = {}
+
+        # First TOB of every symbol as (ts, bq, bp, ap, aq), the state at the start
+        self.initial = {}
+
+    def symbol_id(self, symbol: str) -> int:
+        """
+        Returns the id of a symbol and registers it if it is not known yet.
+        """
+        if symbol not in self.symbol_ids:
+            self.symbol_ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return self.symbol_ids[symbol]
+
+
+class EventStore(MarketData):
+    def __init__(self) -> None:
+        super().__init__()
+
+        # Arrays in the order they were loaded and the merged, sorted result
+        self._chunks = []
+        self._data = None
+        # Cache file the store was saved to or loaded from
+        self.path = None
+
+    def __len__(self) -> int:
+        return sum(len(chunk) for chunk in self._chunks)
+
+    def add_chunk(self, chunk: np.ndarray) -> None:
+        """
+        Add an array of events with dtype EVENT_DTYPE, e.g. built by tob_chunk.
+        """
+        if len(chunk) > 0:
+            self._chunks.append(chunk)
+            self._data = None
+            self.path = None
+
+    def add_tob(self, tob_updates: List[float], symbol: str) -> None:
+        """
+        Add TOB updates in the format [timestamp, bid_amount, bid_price, ask_price, ask_amount].
+        The very first update of a symbol is not an event but its initial state.
+
+        :param tob_updates: (List[float]) list or 2d array of TOB updates
+        :param symbol: (str) symbol the updates belong to
+        """
+        values = np.asarray(tob_updates, dtype=np.float64).reshape(-1, 5)
+
+        if symbol not in self.initial and len(values) > 0:
+            ts, bq, bp, ap, aq = values[0].tolist()
+            self.initial[symbol] = (int(ts), bq, bp, ap, aq)
+            values = values[1:]
+
+        chunk = tob_chunk(
+            self.symbol_id(symbol),
+            ts=values[:, 0].astype(np.int64),
+            bq=values[:, 1],
+            bp=values[:, 2],
+            ap=values[:, 3],
+            aq=values[:, 4],
+        )
+        self.add_chunk(chunk)
+
+    def add_trades(self, trades: List[float], symbol: str) -> None:
+        """
+        Add public trades in the format [timestamp, id, side, price, amount]
+        where side is either "buy" or "sell".
+
+        :param trades: (List[float]) list or 2d array of trades
+        :param symbol: (str) symbol the trades belong to
+        """
+        values = np.asarray(trades, dtype=object).reshape(-1, 5)
+
+        chunk = trade_chunk(
+            self.symbol_id(symbol),
+            ts=values[:, 0].astype(np.float64).astype(np.int64),
+            side=values[:, 2] == "buy",
+            price=values[:, 3].astype(np.float64),
+            amount=values[:, 4].astype(np.float64),
+        )
+        self.add_chunk(chunk)
+
+    def add_book(self, book_updates: List[float], symbol: str) -> None:
+        """
+        Add L2 book updates in the format [timestamp, side, price, amount, is_snapshot]
+        where side is either "bid" or "ask" and amount the new total amount of the level.
+
+        :param book_updates: (List[float]) list or 2d array of book updates
+        :param symbol: (str) symbol the updates belong to
+        """
+        values = np.asarray(book_updates, dtype=object).reshape(-1, 5)
+
+        chunk = book_chunk(
+            self.symbol_id(symbol),
+            ts=values[:, 0].astype(np.float64).astype(np.int64),
+            side=values[:, 1] == "bid",
+            price=values[:, 2].astype(np.float64),
+            amount=values[:, 3].astype(np.float64),
+            snapshot=values[:, 4].astype(bool),
+        )
+        self.add_chunk(chunk)
+
+    @property
+    def data(self) -> np.ndarray:
+        """
+        All loaded events merged into one read-only array and sorted by timestamp.
+        Events with the same timestamp keep the order in which they were loaded.
+        """
+        if self._data is None:
+            if len(self._chunks) == 0:
+                data = np.zeros(0, dtype=EVENT_DTYPE)
+            else:
+                data = np.concatenate(self._chunks)
+                data = data[np.argsort(data["ts"], kind="stable")]
+            data.flags.writeable = False
+            self._data = data
+            self._chunks = [data]
+        return self._data
+
+    @property
+    def time_range(self) -> tuple:
+        """
+        First and last timestamp of the stored events.
+        """
+        data = self.data
+        if len(data) == 0:
+            return (None, None)
+        return (int(data["ts"][0]), int(data["ts"][-1]))
+
+    def cursor(self, block_size: int = 65_536) -> "ReplayCursor":
+        return ReplayCursor(self.data, block_size=block_size)
+
+    def save(self, path: str) -> None:
+        """
+        Write the store to a binary cache file that can be memory-mapped with load.
+
+        :param path: (str) location of the cache file
+        """
+        data = self.data
+        start, end = self.time_range
+        header = json.dumps(
+            {
+                "count": len(data),
+                "dtype": EVENT_DTYPE.descr,
+                "symbols": self.symbols,
+                "initial": self.initial,
+                "start": start,
+                "end": end,
+            }
+        ).encode()
+
+        # Pad the header so the records start on an aligned offset
+        offset = len(MAGIC) + 8 + len(header)
+        header += b" " * (-offset % ALIGNMENT)
+
+        with open(path, "wb") as f:
+            f.write(MAGIC)
+            f.write(len(header).to_bytes(8, "little"))
+            f.write(header)
+            data.tofile(f)
+        self.path = path
+
+    @classmethod
+    def load(cls, path: str) -> "EventStore":
+        """
+        Memory-map a cache file written by save. The records are not read into memory,
+        the OS pages them in during the replay and shares them between processes.
+
+        :param path: (str) location of the cache file
+        """
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a pySimX event cache")
+            length = int.from_bytes(f.read(8), "little")
+            header = json.loads(f.read(length))
+
+        if np.dtype([tuple(i) for i in header["dtype"]]) != EVENT_DTYPE:
+            raise ValueError(f"{path} was written with an incompatible event layout")
+
+        store = cls()
+        for symbol in header["symbols"]:
+            store.symbol_id(symbol)
+        store.initial = {k: tuple(v) for k, v in header["initial"].items()}
+
+        if header["count"] > 0:
+            data = np.memmap(
+                path,
+                dtype=EVENT_DTYPE,
+                mode="r",
+                offset=len(MAGIC) + 8 + length,
+                shape=(header["count"],),
+            )
+        else:
+            data = np.zeros(0, dtype=EVENT_DTYPE)
+            data.flags.writeable = False
+
+        # The records in the file are already merged and sorted
+        store._data = data
+        store._chunks = [data]
+        store.path = path
+        return store
+
+
+class _BlockCursor:
+    """
+    Common logic of the cursors. The records of the current block are kept both as
+    array, for vectorized scans, and as python tuples, for the replay loop.
+    """
+
+    position: int
+    head: Optional[tuple]
+
+    def _set_block(self, array: np.ndarray, position: int) -> None:
+        self._array = array
+        self._block = array.tolist()
+        self._offset = position
+        self.head = self._block[0] if len(self._block) > 0 else None
+
+    def _load(self, position: int) -> None:
+        raise NotImplementedError
+
+    def advance(self) -> None:
+        """
+        Move the cursor to the next record. head is None once the data is exhausted.
+        """
+        self.position += 1
+        i = self.position - self._offset
+        if i < len(self._block):
+            self.head = self._block[i]
+        else:
+            self._load(self.position)
+
+    def _seek_in_block(self, position: int) -> None:
+        self.position = position
+        i = position - self._offset
+        if i < len(self._block):
+            self.head = self._block[i]
+        else:
+            self._load(position)
+
+    def skip_until(self, stop: Callable[[np.ndarray], np.ndarray]) -> List[np.ndarray]:
+        """
+        Advance the cursor to the first record for which stop is True. The records are
+        scanned vectorized over growing windows of the current block.
+
+        :param stop: (Callable) maps an array of records to a boolean mask
+        :return: (List[np.ndarray]) the skipped records in order
+        """
+        skipped = []
+        window = 64
+        while self.head is not None:
+            i = self.position - self._offset
+            array = self._array[i : i + window]
+
+            mask = stop(array)
+            n = int(np.argmax(mask)) if mask.any() else len(array)
+            if n > 0:
+                skipped.append(array[:n])
+            self._seek_in_block(self.position + n)
+
+            if n < len(array):
+                break
+            window *= 4
+
+        return skipped
+
+    def skip_run(self, symbol_id: int, limit: Optional[int] = None) -> tuple:
+        """
+        Advance past all consecutive records of a symbol with a timestamp of at most
+        limit.
+
+        :param symbol_id: (int) id of the symbol
+        :param limit: (int) largest timestamp to skip, no limit if None
+
+        :return: (tuple) the last skipped TOB record and the last skipped record,
+        None if there was none.
+        """
+        row = self.head
+        if row is None or row[1] != symbol_id or (limit is not None and row[0] > limit):
+            return None, None
+
+        def stop(array: np.ndarray) -> np.ndarray:
+            mask = array["symbol"] != symbol_id
+            if limit is not None:
+                mask |= array["ts"] > limit
+            return mask
+
+        skipped = self.skip_until(stop)
+
+        last_tob = None
+        for array in reversed(skipped):
+            tob = np.flatnonzero(array["kind"] == EventKind.TOB)
+            if len(tob) > 0:
+                last_tob = array[tob[-1]].tolist()
+                break
+
+        return last_tob, skipped[-1][-1].tolist()
+
+
+class ReplayCursor(_BlockCursor):
+    def __init__(self, data: np.ndarray, block_size: int = 65_536) -> None:
+        """
+        Integer cursor over an array of events. The records are converted to python
+        tuples in blocks, so the replay loop works with native python values while
+        only one block is materialized at a time.
+
+        :param data: (np.ndarray) array with dtype EVENT_DTYPE sorted by timestamp
+        :param block_size: (int) number of records converted per block
+        """
+        self.data = data
+        self.block_size = block_size
+
+        self.position = 0
+        self.head: Optional[tuple] = None
+        self._load(0)
+
+    def __len__(self) -> int:
+        return len(self.data) - self.position
+
+    def _load(self, position: int) -> None:
+        self._set_block(self.data[position : position + self.block_size], position)
+
+    def skip_until(self, stop: Callable[[np.ndarray], np.ndarray]) -> List[np.ndarray]:
+        # Same as _BlockCursor.skip_until, but the scan runs over the whole array so
+        # blocks that are skipped completely are never converted to python values.
+        position = self.position
+        start = position
+        window = 64
+        while position < len(self.data):
+            array = self.data[position : position + window]
+
+            mask = stop(array)
+            n = int(np.argmax(mask)) if mask.any() else len(array)
+            position += n
+
+            if n < len(array):
+                break
+            window *= 4
+
+        self._seek_in_block(position)
+        return [self.data[start:position]] if position > start else []
+
+
+class EventStream(MarketData):
+    def __init__(self) -> None:
+        """
+        Market data that is read lazily while it is replayed, e.g. from large compressed
+        files. Every source is a function returning a new iterator of EVENT_DTYPE chunks
+        sorted by timestamp, so the stream can be replayed more than once. Peak memory
+        is bounded by the chunk size of the sources instead of the length of the data.
+        """
+        super().__init__()
+        self._sources = []
+
+    def add_source(self, source: Callable[[], Iterable[np.ndarray]]) -> None:
+        self._sources.append(source)
+
+    def cursor(self) -> "StreamCursor":
+        return StreamCursor(merge_chunks([source() for source in self._sources]))
+
+
+class StreamCursor(_BlockCursor):
+    def __init__(self, chunks: Iterable[np.ndarray]) -> None:
+        """
+        Cursor with the same interface as ReplayCursor over a stream of event chunks.
+
+        :param chunks: (Iterable[np.ndarray]) EVENT_DTYPE arrays sorted by timestamp
+        """
+        self.chunks = iter(chunks)
+
+        self.position = 0
+        self.head: Optional[tuple] = None
+        self._load(0)
+
+    def _load(self, position: int) -> None:
+        for chunk in self.chunks:
+            if len(chunk) > 0:
+                self._set_block(chunk, position)
+                return
+        self._set_block(np.zeros(0, dtype=EVENT_DTYPE), position)
@@ -14,35 +14,44 @@ TODO:
 """
 
 from typing import List, Literal, Optional
-from collections import deque
-from copy import deepcopy
-from sortedcontainers import SortedDict
-from .matching_engine import OrderBook
+from itertools import count
+import heapq
+import numpy as np
+import pandas as pd
+from .event_store import EventStore
 from .data_types import (
     TOB,
     Order,
     Trade,
     ModifyOrder,
     CancelOrder,
+    CancelAll,
+    ReplaceOrder,
+    OrderBatch,
     ExchangeType,
     OrderStatus,
+    EventKind,
+    Instrument,
 )
-from .latency_models import LogNormalLatency, ConstantLatency
+from .latency_models import Latency, LogNormalLatency, ConstantLatency
+from .wakeup import WakeCondition
+from .journal import Journal, JournalKind
+from .equity import EquityRecorder
+from .open_orders import RestingOrders
+from .ladder import BookLadder
+from .ohlc import OHLC_COLUMNS
+from .features import Feature, FeaturePipeline
+from .feature_columns import FeatureColumns
 
 # from .analytics import PostTrade
 
 
-# Setup logging to console
+# Logging is left to the application, the events of a backtest are recorded in a
+# Journal instead (see journal.py)
 import logging
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-handler = logging.StreamHandler()
-formatter = logging.Formatter(
-    "%(asctime)s - %(levelname)s - %(name)s - %(exchange_name)s - %(message)s"
-)
-handler.setFormatter(formatter)
-logger.addHandler(handler)
+logger.addHandler(logging.NullHandler())
 
 
 class Exchange:
@@ -51,22 +60,31 @@ class Exchange:
         fees: List[int] = [0, 2],
         exchange_type: ExchangeType = "spot",
         name: str = "",
+        journal: Optional[Journal] = None,
+        equity: Optional[EquityRecorder] = None,
     ) -> None:
         """
 
         :param fees: (List[int]) a list containing two values for maker and taker
         fees expressed in basispoints.
+        :param journal: (Journal) records the orders and fills of a run, nothing is
+        recorded if None.
+        :param equity: (EquityRecorder) records the balances during a run, defaults
+        to a sample after every event.
         """
         # Load the fees and transform them from basis-points into percent
         self.maker_fee = fees[0] / 10_000
         self.taker_fee = fees[1] / 10_000
 
         self.logger = logging.LoggerAdapter(logger, {"exchange_name": name})
+        self.journal = journal
 
         self.balances = {}
+        self.initial_balances = {}
 
         self.markets = {}
         self.market_map = {}
+        self.instruments = {}
 
         self.exchange_type = exchange_type
         # If it is a futures / perpetual exchange, we work with the concept of positions
@@ -78,9 +96,23 @@ class Exchange:
         self.trades = []
         self.orders = []
 
-        self.historical_balance = []
+        self.equity = EquityRecorder() if equity is None else equity
+
+    @property
+    def historical_balance(self) -> pd.DataFrame:
+        """
+        The recorded balances, one column per asset plus the mid price and timestamp.
+        """
+        return self.equity.to_dataframe()
 
-    def add_market(self, symbol: str, base: str, quote: str) -> None:
+    def add_market(
+        self,
+        symbol: str,
+        base: str,
+        quote: str,
+        tick_size: float = 1e-8,
+        lot_size: float = 1e-8,
+    ) -> None:
         """
         Adds a new market to the exchange.
 
@@ -90,16 +122,19 @@ class Exchange:
         :param symbol: (str) The symbol representing the market, e.g., 'BTC/USD'.
         :param base: (str) The base currency in the market, e.g., 'BTC'.
         :param quote: (str) The quote or counter currency in the market, e.g., 'USD'.
-        :param perpetual: (bool)
+        :param tick_size: (float) price increment, prices of orders are rounded to it
+        :param lot_size: (float) amount increment, amounts of orders are rounded to it
 
         :return None:
         """
         self.market_map[symbol] = [base, quote]
+        self.instruments[symbol] = Instrument(symbol, base, quote, tick_size, lot_size)
         if self.exchange_type == "future":
             self.positions[symbol] = 0
 
     def add_balance(self, symbol: str, amount: float):
         self.balances[symbol] = amount
+        self.initial_balances[symbol] = amount
 
     def top_of_book(self, symbol):
         tb = self.markets[symbol].bp
@@ -108,13 +143,51 @@ class Exchange:
         return [tb, ta]
 
     def _update_balance(self, symbol: str) -> None:
-        update = self.balances.copy()
-        update[symbol + "_mid"] = (
-            self.markets[symbol].ap.copy() + self.markets[symbol].bp.copy()
-        ) / 2
-        update["ts"] = self.markets[symbol].timestamp
+        market = self.markets[symbol]
+        self.equity.sample(
+            market.timestamp,
+            self.balances,
+            symbol + "_mid",
+            (market.ap + market.bp) / 2,
+            len(self.trades),
+        )
+
+    def _check_balance(self, order: Order) -> bool:
+        """
+        Sanity check that we have enough balance to execute such an order
+        before we even place it.
+        """
+        # If it is a buy, check that we have enough quote currency
+        # available to buy the base
+        if self.exchange_type == "spot":
+            if order.side:
+                if (
+                    self.balances[self.market_map[order.symbol][1]]
+                    < order.amount * order.price
+                ):
+                    self.logger.warning(
+                        f"Buy Order couldnt be opened, not enough balance available \nOpened Amount: {order.amount * order.price}, Available Amount: {self.balances[self.market_map[order.symbol][1]]}"
+                    )
+                    return False
+            # else, check that we have enough base to sell it
+            else:
+                if self.balances[self.market_map[order.symbol][0]] < order.amount:
+                    self.logger.warning(
+                        f"Sell Order couldnt be opened, not enough balance available \nOpened Amount: {order.amount}, Available Amount: {self.balances[self.market_map[order.symbol][0]]}"
+                    )
+                    return False
+        elif self.exchange_type == "future":
+            if order.side:
+                if (
+                    self.balances[self.market_map[order.symbol][1]]
+                    < order.amount * order.price
+                ):
+                    self.logger.warning(
+                        f"Buy Order couldnt be opened, not enough balance available \nOpened Amount: {order.amount * order.price}, Available Amount: {self.balances[self.market_map[order.symbol][1]]}"
+                    )
+                    return False
 
-        self.historical_balance.append(update)
+        return True
 
     def _open_orders(self):
         return True if len(self.open_orders) > 0 else False
@@ -134,9 +207,10 @@ class Exchange:
         Buy 0.1 BTC: balance['BTC'] += 0.1 * (1 * 2 - 1) = 0.1 * 1 = 0.1
         Sell 0.1 BTC: balance['BTC'] += 0.1 * (0 * 2 - 1) = 0.1  * -1 = - 0.1
 
-        Quote update exmples. balance -= amount * price * (side * 2 -1)
+        Quote update exmples. balance -= amount * price * (side * 2 -1) + fees
         Buy 0.1 BTC @ 30k USD: Balance['USD'] -= 0.1 * 30'000 * (1 * 2 -1) = 3'000 * 1 = 3'000
         Sell 0.1 BTC @ 30k USD: Balance['USD'] -= 0.1 * 30'000 * (0 * 2 -1) = 3'000 * -1 = -3'000
+        The fees are paid on both sides.
         """
         # Balance update as described above
         self.balances[self.market_map[trade.symbol][0]] += trade.amount * (
@@ -145,10 +219,16 @@ class Exchange:
 
         # Update the balances
         self.balances[self.market_map[trade.symbol][1]] -= (
-            trade.amount * trade.price + trade.fees
-        ) * ((trade.side * 2) - 1)
+            trade.amount * trade.price * ((trade.side * 2) - 1) + trade.fees
+        )
 
-    def open_position(self, order: Order, timestamp: float) -> None:
+    def open_position(
+        self,
+        order: Order,
+        timestamp: float,
+        amount: Optional[float] = None,
+        price: Optional[float] = None,
+    ) -> None:
         """
         Order went through and can be opened it on the exchange.
         We calculate the fees and create a trade. This trade is then sent on
@@ -156,15 +236,24 @@ class Exchange:
 
         :param order: (Order)
         :param timestamp: (float)
+        :param amount: (float) filled amount, the remaining amount of the order if None
+        :param price: (float) fill price, the price of the order if None
         """
-        order.status = OrderStatus.FILLED
+        amount = order.remainingAmount if amount is None else amount
+        price = order.price if price is None else price
+
+        order.remainingAmount = order.remainingAmount - amount
+        order.status = (
+            OrderStatus.FILLED
+            if order.remainingAmount <= 0
+            else OrderStatus.PARTIALLY_FILLED
+        )
         order.eventTime = timestamp
-        order.remainingAmount = order.remainingAmount - order.amount
 
         # define the fee that will be used for the trade
         fee = self.taker_fee if order.taker else self.maker_fee
 
-        fee_quote = abs(order.amount * order.price * fee)
+        fee_quote = abs(amount * price * fee)
 
         # self.positions[order.symbol] = order.amount
 
@@ -173,17 +262,21 @@ class Exchange:
             order_id=order.order_id,
             side=order.side,
             taker=order.taker,
-            amount=order.amount,
-            price=order.price,
+            amount=amount,
+            price=price,
             fees=fee_quote,
             entryTime=order.entryTime,
             eventTime=timestamp,
         )
 
-        self.logger.info(f"Trade Executed {new_trade}")
+        if self.journal is not None:
+            self.journal.record(
+                timestamp, JournalKind.FILL, order.order_id, price, amount
+            )
 
         self.trades.append(new_trade)
-        self.orders.append(order)
+        if order.status == OrderStatus.FILLED:
+            self.orders.append(order)
 
         if self.exchange_type == "spot":
             self._adjust_balances_spot(trade=new_trade)
@@ -202,15 +295,300 @@ class Exchange:
 
 
 class OHLCExchange(Exchange):
-    def __init__(self, initial_balance: int = 10000, fees: List[int] = [0, 2]):
-        super().__init__(initial_balance, fees)
+    def __init__(
+        self,
+        fees: List[int] = [0, 2],
+        exchange_type: ExchangeType = "spot",
+        name: str = "",
+        journal: Optional[Journal] = None,
+        equity: Optional[EquityRecorder] = None,
+    ):
+        """
+        Exchange that replays OHLCV bars. The strategy runs after the close of every
+        bar and its orders are executed on the next bar: market orders at the open,
+        limit orders once the low (buys) or the high (sells) reaches their price, at
+        their price or at the open if the bar opens through it. Limit orders rest until
+        they are filled or cancelled, or for the number of bars given to limit_order.
+
+        simulate_bars in ohlc.py runs a strategy given as target positions vectorized
+        over all bars with the same fills. Its limit orders only live for the next bar,
+        a strategy sending limit orders with bars=1 gets the fills of simulate_bars.
+
+        :param fees: (List[int]) fees defined as basispoints [maker, taker]
+        :param journal: (Journal) records the orders and fills of a run
+        :param equity: (EquityRecorder) records the balances during a run
+        """
+        super().__init__(
+            fees=fees,
+            exchange_type=exchange_type,
+            name=name,
+            journal=journal,
+            equity=equity,
+        )
+
+        # Columns of the bars per symbol
+        self.bars = {}
+        # Market orders waiting for the open of the next bar
+        self.pending = {}
+        # order_id -> (last bar, order) of the limit orders that expire
+        self.expiring = {}
+        self.last_timestamp = None
+        self._timestamps = np.zeros(0, dtype=np.int64)
+        self._step = 0
+        self._cursors = {}
+
+    def load_ohlc(self, ohlc: pd.DataFrame, symbol: str) -> None:
+        """
+        Load the bars of a symbol, sorted by time.
+
+        :param ohlc: (pd.DataFrame) with the columns timestamp, open, high, low, close
+        """
+        self.logger.info(f"Loading {len(ohlc)} bars for {symbol}")
+        self.bars[symbol] = {
+            column: ohlc[column].to_numpy(
+                dtype=np.int64 if column == "timestamp" else np.float64
+            )
+            for column in OHLC_COLUMNS
+        }
+        self._reset_market(symbol)
+
+    def ohlc(self, symbol: str) -> dict:
+        """
+        The bars of a symbol up to the last closed one.
+
+        :return: (dict) column -> np.ndarray, views into the loaded bars
+        """
+        end = self._cursors.get(symbol, 0)
+        return {column: values[:end] for column, values in self.bars[symbol].items()}
+
+    def _reset_market(self, symbol: str) -> None:
+        self.open_orders[symbol] = {}
+        self.open_orders[symbol][1] = RestingOrders()
+        self.open_orders[symbol][0] = RestingOrders()
+        self.pending[symbol] = []
+        self.expiring[symbol] = {}
+        self._cursors[symbol] = 0
+
+        bars = self.bars[symbol]
+        price = float(bars["open"][0]) if len(bars["open"]) > 0 else np.nan
+        self.markets[symbol] = TOB(
+            symbol=symbol,
+            timestamp=int(bars["timestamp"][0]) if len(bars["open"]) > 0 else 0,
+            bq=0.0,
+            bp=price,
+            ap=price,
+            aq=0.0,
+        )
+
+    def market_order(
+        self, symbol: str, amount: float, side: bool, local_timestamp: int = None
+    ) -> Order:
+        """
+        Send a market order, it is executed at the open of the next bar.
+
+        :param symbol: (str) Symbol of the traded pair
+        :param amount: (float) Amount in base currency that will be traded
+        :param side: (bool) 1 if its a buy, 0 if its a sell.
+
+        :return: (Order)
+        """
+        instrument = self.instruments[symbol]
+        lots = instrument.lots(abs(amount))
+        order = Order(
+            symbol=symbol,
+            side=side,
+            taker=True,
+            price=None,
+            amount=instrument.amount(lots),
+            entryTime=self.markets[symbol].timestamp,
+            lots=lots,
+        )
+        self.pending[symbol].append(order)
+        return order
+
+    def limit_order(
+        self,
+        symbol: str,
+        amount: float,
+        price: float,
+        side: bool,
+        local_timestamp: int = None,
+        bars: Optional[int] = None,
+    ) -> Order:
+        """
+        Send a limit order, it can fill from the next bar on.
+
+        :param symbol: (str) Symbol of the traded pair
+        :param amount: (float) Amount in base currency that will be traded
+        :param price: (float) Price of the order, rounded to the tick size.
+        :param side: (bool) 1 if its a buy, 0 if its a sell.
+        :param bars: (int) number of bars the order lives, it is cancelled after the
+        last one if it did not fill. None keeps it open until it is filled or cancelled.
+
+        :return: (Order)
+        """
+        instrument = self.instruments[symbol]
+        tick = instrument.ticks(price)
+        lots = instrument.lots(abs(amount))
+        timestamp = self.markets[symbol].timestamp
+        order = Order(
+            symbol=symbol,
+            side=side,
+            taker=False,
+            amount=instrument.amount(lots),
+            price=instrument.price(tick),
+            entryTime=timestamp,
+            eventTime=timestamp,
+            tick=tick,
+            lots=lots,
+        )
+
+        if self._check_balance(order):
+            self.open_orders[symbol][side].add(order)
+            kind = JournalKind.OPEN
+            if bars is not None:
+                last = self._cursors[symbol] + bars - 1
+                self.expiring[symbol][order.order_id] = (last, order)
+        else:
+            kind = JournalKind.REJECT
+        if self.journal is not None:
+            self.journal.record(
+                timestamp, kind, order.order_id, order.price, order.amount
+            )
+        return order
+
+    def cancel_order(self, order: Order) -> None:
+        """
+        Cancel an open limit order or a market order that was not executed yet.
+        """
+        timestamp = self.markets[order.symbol].timestamp
+        if order.taker:
+            pending = self.pending[order.symbol]
+            cancelled = next((o for o in pending if o.order_id == order.order_id), None)
+            if cancelled is not None:
+                pending.remove(cancelled)
+        else:
+            cancelled = self.open_orders[order.symbol][order.side].remove(
+                order.order_id
+            )
+
+        if cancelled is None:
+            if self.journal is not None:
+                self.journal.record(
+                    timestamp, JournalKind.CANCEL_FAILED, order.order_id, 0, 0
+                )
+            return
+
+        order.status = OrderStatus.CANCELLED
+        order.eventTime = timestamp
+        self.orders.append(order)
+        if self.journal is not None:
+            self.journal.record(
+                timestamp,
+                JournalKind.CANCEL,
+                order.order_id,
+                0 if order.price is None else order.price,
+                order.remainingAmount,
+            )
+
+    def _apply_bar(self, symbol: str, i: int, ts: int) -> None:
+        bars = self.bars[symbol]
+        bar_open = float(bars["open"][i])
+        instrument = self.instruments[symbol]
+
+        # The market orders of the last close are executed at the open
+        pending = self.pending[symbol]
+        self.pending[symbol] = []
+        for order in pending:
+            order.price = bar_open
+            order.tick = instrument.ticks(bar_open)
+            if self._check_balance(order):
+                self.open_position(order, ts)
+            elif self.journal is not None:
+                self.journal.record(
+                    ts, JournalKind.REJECT, order.order_id, bar_open, order.amount
+                )
+
+        # Limit orders are filled if the bar reached their price, the best first
+        buys = self.open_orders[symbol][1]
+        if len(buys) > 0:
+            low = instrument.ticks(float(bars["low"][i]))
+            while len(buys) > 0 and buys.peekitem(-1)[0] >= low:
+                order = buys.popitem(-1)[1]
+                self.open_position(order, ts, price=min(bar_open, order.price))
+
+        sells = self.open_orders[symbol][0]
+        if len(sells) > 0:
+            high = instrument.ticks(float(bars["high"][i]))
+            while len(sells) > 0 and sells.peekitem(0)[0] <= high:
+                order = sells.popitem(0)[1]
+                self.open_position(order, ts, price=max(bar_open, order.price))
+
+        market = self.markets[symbol]
+        market.timestamp = ts
+        market.bp = market.ap = float(bars["close"][i])
+
+        # Limit orders that were not filled in their last bar are cancelled
+        expiring = self.expiring[symbol]
+        for order_id, (last, order) in list(expiring.items()):
+            if last <= i:
+                del expiring[order_id]
+                if order_id in self.open_orders[symbol][order.side]:
+                    self.cancel_order(order)
+
+    def _simulation_step(self) -> None:
+        # Close the next bar of every symbol that has one at the next timestamp
+        ts = int(self._timestamps[self._step])
+        self._step += 1
+        for symbol, bars in self.bars.items():
+            i = self._cursors[symbol]
+            if i < len(bars["timestamp"]) and bars["timestamp"][i] == ts:
+                self._cursors[symbol] = i + 1
+                self._apply_bar(symbol, i, ts)
+        self.last_timestamp = ts
+
+    def has_events(self) -> bool:
+        """
+        True as long as there are bars left to replay.
+        """
+        return self._step < len(self._timestamps)
+
+    def prepare_backtest(self):
+        """
+        Reset the exchange to the first bar.
+        """
+        for symbol in self.bars:
+            self._reset_market(symbol)
+
+        self.balances = self.initial_balances.copy()
+        if self.exchange_type == "future":
+            self.positions = {symbol: 0 for symbol in self.positions}
 
+        self.trades = []
+        self.orders = []
+        self.equity.reset()
+        self.last_timestamp = None
+        if self.journal is not None:
+            self.journal.clear()
 
-class TickExchange(Exchange):
-    def __init__(self, initial_balance: int = 10000, fees: List[int] = [0, 2]):
-        super().__init__(initial_balance, fees)
+        self._timestamps = np.unique(
+            np.concatenate(
+                [bars["timestamp"] for bars in self.bars.values()]
+                + [np.zeros(0, dtype=np.int64)]
+            )
+        )
+        self._step = 0
 
-        self.orderbook: OrderBook = OrderBook()
+    def run_simulation(self, strategy, symbol):
+        """
+        Run a strategy over the loaded bars, it is called after the close of every bar.
+        """
+        strat = strategy(symbol)
+        self.prepare_backtest()
+        while self.has_events():
+            self._simulation_step()
+            strat.run_strategy()
+            self._update_balance(symbol)
 
 
 class TOB_Exchange(Exchange):
@@ -218,30 +596,127 @@ class TOB_Exchange(Exchange):
         self,
         fees: List[int] = [0, 2],
         exchange_type: ExchangeType = "spot",
-        latency: LogNormalLatency = LogNormalLatency(mean=5000, sigma=0.3),
+        latency: Optional[Latency] = None,
         name: str = "",
+        events: Optional[EventStore] = None,
+        batch_market_data: bool = False,
+        journal: Optional[Journal] = None,
+        equity: Optional[EquityRecorder] = None,
+        features: Optional[FeaturePipeline] = None,
     ):
         """
         Initialize the TOB Exchange.
 
         :param fees: (List[int]) fees defined as basispoints [maker, taker]
-        :param latency: (List[int]) latency [mean, std] in us
+        :param latency: (Latency) latency model, defaults to
+        LogNormalLatency(5000, 0.3, seed=0) in us. Pass a model with another seed, or
+        seed=None for fresh draws in every run, to change the latencies.
+        :param events: (EventStore) already loaded market data to share with other
+        exchanges. If None, an empty store is created.
+        :param batch_market_data: (bool) if True, a simulation step applies all
+        consecutive market data of a symbol without open orders at once.
+        :param journal: (Journal) records the orders and fills of a run
+        :param equity: (EquityRecorder) records the balances during a run
+        :param features: (FeaturePipeline) features updated by the market data, see
+        add_feature
 
         """
-        super().__init__(fees=fees, exchange_type=exchange_type, name=name)
+        super().__init__(
+            fees=fees,
+            exchange_type=exchange_type,
+            name=name,
+            journal=journal,
+            equity=equity,
+        )
 
-        # Define latency summary metrics
-        self.latency = latency
+        # Define latency summary metrics, every exchange gets its own generator. The
+        # default one is seeded so that runs are reproducible.
+        self.latency = (
+            LogNormalLatency(mean=5000, sigma=0.3, seed=0)
+            if latency is None
+            else latency
+        )
 
         self.last_timestamp = None
+        # Symbol of the last processed event
+        self.last_symbol = None
+
+        # Columnar store of the preloaded market data, replayed through a cursor
+        self.events = EventStore() if events is None else events
+        self._cursor = None
+
+        # Priority queue of user generated events (orders, cancels, modifications)
+        # as (timestamp, sequence, kind, event). The sequence keeps insertion order on ties.
+        self.live_events = []
+        self._sequence = count()
+
+        self.batch_market_data = batch_market_data
+        self.features = features
+        # Features precomputed over the whole market data, see add_column
+        self.columns = None
+
+        # Set by a Scheduler that replays several exchanges on one clock. It is told
+        # about new user events and, during a step of the scheduler, the horizon is
+        # the next event of the other exchanges, which batching market data must not
+        # go past.
+        self.scheduler = None
+        self.horizon = None
+
+        # Handlers of the events by EventKind, called as handler(event, ts, symbol)
+        self._dispatch = [None] * len(EventKind)
+        self._dispatch[EventKind.TOB] = self._apply_tob
+        self._dispatch[EventKind.TRADE] = self._apply_public_trade
+        self._dispatch[EventKind.ORDER] = self._apply_order
+        self._dispatch[EventKind.MODIFY] = self._apply_modification
+        self._dispatch[EventKind.CANCEL] = self._apply_cancellation
+        self._dispatch[EventKind.CANCEL_ALL] = self._apply_cancel_all
+        self._dispatch[EventKind.REPLACE] = self._apply_replace
+        self._dispatch[EventKind.BATCH] = self._apply_batch
+
+    def add_feature(self, feature: Feature) -> int:
+        """
+        Register a feature that is updated by the market data of its symbol, see
+        features.py. Its current value is in self.features.values.
 
-        # Open a event queue for the symbol
-        self.events = SortedDict()
+        :return: (int) column of the feature in self.features.values
+        """
+        if self.features is None:
+            self.features = FeaturePipeline()
+        return self.features.add(feature)
+
+    def add_column(self, feature: Feature) -> str:
+        """
+        Register a feature that only depends on the market data. It is computed once
+        vectorized over all loaded data by prepare_backtest, cached next to a cache
+        file, and read with self.columns[name] at the current position of the replay,
+        see feature_columns.py.
+
+        :return: (str) name of the column
+        """
+        if self.columns is None:
+            self.columns = FeatureColumns()
+        return self.columns.add(feature)
 
     def _add_latency(self, timestamp: float) -> float:
         timestamp += int(self.latency.estimate())
         return timestamp
 
+    def _schedule(self, timestamp: int, kind: EventKind, event) -> None:
+        heapq.heappush(self.live_events, (timestamp, next(self._sequence), kind, event))
+        if self.scheduler is not None:
+            self.scheduler.wake(self, timestamp)
+
+    def next_timestamp(self) -> Optional[int]:
+        """
+        Timestamp of the next event to process, None if there is none left.
+        """
+        row = self._cursor.head
+        if len(self.live_events) > 0 and (
+            row is None or self.live_events[0][0] < row[0]
+        ):
+            return self.live_events[0][0]
+        return None if row is None else row[0]
+
     def fetch_tob(self, symbol) -> dict[float]:
         update = self.markets[symbol]
         out = {
@@ -268,96 +743,65 @@ class TOB_Exchange(Exchange):
 
     def load_trades(self, trades: List[float], symbol: str) -> None:
         self.logger.info(f"Loading {len(trades)} trades for {symbol}")
-        # Iterate through the trades that need to be added to the events
-        for i in trades:
-            # make sure the event has a queue at a given timestamp
-            i[0] = int(i[0])
-            if i[0] not in self.events.keys():
-                self.events[i[0]] = deque()
-
-            side = 1 if i[2] == "buy" else 0
-
-            # once were sure there is a queue, append the trade to the timestamp
-            self.events[i[0]].append(
-                Trade(
-                    symbol=symbol,
-                    order_id=-1,
-                    side=side,
-                    taker=True,
-                    amount=i[4],
-                    price=i[3],
-                    fees=0,
-                    entryTime=i[0],
-                    eventTime=i[0],
-                )
-            )
-
+        # The trades are stored as columns in the event store
+        self.events.add_trades(trades, symbol)
         self.logger.info("Trades loaded successfully")
 
     def load_tob(self, tob_updates: List[float], symbol: str) -> None:
         self.logger.info(f"Loading {len(tob_updates)} TOB-Updates for {symbol}")
+        # The first update is the initial state, the rest are events for the backtester
+        self.events.add_tob(tob_updates, symbol)
+        self._reset_market(symbol)
+        self.logger.info("TOB-Updates loaded successfully")
+
+    def load_cache(self, path: str) -> None:
+        """
+        Use the market data of a cache file written by EventStore.save or
+        data_loader.convert_tardis. The file is memory-mapped, not read into memory.
+
+        :param path: (str) location of the cache file
+        """
+        self.events = EventStore.load(path)
+        for symbol in self.events.initial:
+            self._reset_market(symbol)
+
+    def _reset_market(self, symbol: str) -> None:
+        """
+        Set the market of a symbol back to its initial TOB without any open orders.
+        """
         # Initialize a orders queue
         self.open_orders[symbol] = {}
-        self.open_orders[symbol][1] = SortedDict()
-        self.open_orders[symbol][0] = SortedDict()
+        self.open_orders[symbol][1] = RestingOrders()
+        self.open_orders[symbol][0] = RestingOrders()
 
         # Set initial Orderbook as the start
-        tob = tob_updates[0]
+        ts, bq, bp, ap, aq = self.events.initial[symbol]
         self.markets[symbol] = TOB(
-            symbol=symbol,
-            timestamp=int(tob[0]),
-            bq=tob[1],
-            bp=tob[2],
-            ap=tob[3],
-            aq=tob[4],
+            symbol=symbol, timestamp=ts, bq=bq, bp=bp, ap=ap, aq=aq
         )
-        # The rest will be taken apart and used as events for the backtester
-        # self._process_tob_updates(tob_updates[1:])
-
-        # Add all the TOB Updates to the queue
-        for i in tob_updates[1:]:
-            i[0] = int(i[0])
-            if i[0] not in self.events.keys():
-                self.events[i[0]] = deque()
-
-            self.events[i[0]].append(
-                TOB(symbol=symbol, timestamp=i[0], bq=i[1], bp=i[2], ap=i[3], aq=i[4])
-            )
-        self.logger.info("TOB-Updates loaded successfully")
 
     def market_order(
         self, symbol: str, amount: float, side: bool, local_timestamp: int
-    ) -> None:
+    ) -> Order:
         """
 
         :param symbol: (str) Symbol of the traded pair
         :param amount: (float) Amount in base currency that will be traded
         :param side: (bool) 1 if its a buy, 0 if its a sell.
 
-        :return: None
+        :return: (Order) the order on its way to the exchange
         """
         # Add latency to the timestamp of the last TOB update
         timestamp = self._add_latency(local_timestamp)
+        order = self._new_order(symbol, amount, None, side, local_timestamp, timestamp)
 
-        # If there is already an event in the queue at that time, add it at the end
-        if timestamp not in self.live_events.keys():
-            self.live_events[timestamp] = deque()
-
-        self.live_events[timestamp].append(
-            Order(
-                symbol=symbol,
-                side=side,
-                taker=True,
-                price=None,
-                amount=abs(amount),
-                entryTime=local_timestamp,
-                eventTime=timestamp,
-            )
-        )
+        # Add the order to the queue, events at the same time keep their order
+        self._schedule(timestamp, EventKind.ORDER, order)
+        return order
 
     def limit_order(
         self, symbol: str, amount: float, price: float, side: bool, local_timestamp: int
-    ) -> None:
+    ) -> Order:
         """
         Function that adds an order to the events queue. First there is some added
         Latency that can be defined in the initiation of the exchange object itself.
@@ -366,28 +810,53 @@ class TOB_Exchange(Exchange):
 
         :param symbol: (str) Symbol of the traded pair
         :param amount: (float) Amount in base currency that will be traded
-        :param price: (float) Price of the order.
+        :param price: (float) Price of the order, rounded to the tick size.
         :param side: (bool) 1 if its a buy, 0 if its a sell.
 
-        :return: None
+        :return: (Order) the order on its way to the exchange
         """
         # Add latency to the timestamp of the last TOB update
         timestamp = self._add_latency(local_timestamp)
+        order = self._new_order(symbol, amount, price, side, local_timestamp, timestamp)
 
-        # If there is already an event in the queue at that time, add it at the end
-        if timestamp not in self.live_events.keys():
-            self.live_events[timestamp] = deque()
+        # Add the order to the queue, events at the same time keep their order
+        self._schedule(timestamp, EventKind.ORDER, order)
+        return order
 
-        self.live_events[timestamp].append(
-            Order(
+    def _new_order(
+        self,
+        symbol: str,
+        amount: float,
+        price: Optional[float],
+        side: bool,
+        local_timestamp: int,
+        timestamp: int,
+    ) -> Order:
+        # Order on the grid of the market, a market order if the price is None
+        instrument = self.instruments[symbol]
+        lots = instrument.lots(abs(amount))
+        if price is None:
+            return Order(
                 symbol=symbol,
                 side=side,
-                taker=False,
-                amount=abs(amount),
-                price=price,
+                taker=True,
+                price=None,
+                amount=instrument.amount(lots),
                 entryTime=local_timestamp,
                 eventTime=timestamp,
+                lots=lots,
             )
+        tick = instrument.ticks(price)
+        return Order(
+            symbol=symbol,
+            side=side,
+            taker=False,
+            amount=instrument.amount(lots),
+            price=instrument.price(tick),
+            entryTime=local_timestamp,
+            eventTime=timestamp,
+            tick=tick,
+            lots=lots,
         )
 
     def cancel_order(self, order: Order) -> None:
@@ -400,12 +869,10 @@ class TOB_Exchange(Exchange):
         """
         # Add latency simulation
         timestamp = self._add_latency(self.markets[order.symbol].timestamp)
-        if timestamp not in self.live_events.keys():
-            self.live_events[timestamp] = deque()
 
-        # Append the CancelOrder
-        self.live_events[timestamp].append(
-            CancelOrder(symbol=order.symbol, order=order)
+        # Add the CancelOrder to the queue
+        self._schedule(
+            timestamp, EventKind.CANCEL, CancelOrder(symbol=order.symbol, order=order)
         )
 
     def modify_order(
@@ -421,102 +888,179 @@ class TOB_Exchange(Exchange):
         """
 
         new_order = ModifyOrder(symbol=order.symbol, order=order)
+        instrument = self.instruments[order.symbol]
 
         # If there is a change in price, add the information to the new_order
         if price is not None:
-            new_order.new_price = price
+            new_order.new_price = instrument.price(instrument.ticks(price))
         # If there are no changes, keep the old price
         else:
             new_order.new_price = order.price
 
         # If there is a change in amount, add the information to the new_order
         if amount is not None:
-            new_order.new_amount = amount
+            new_order.new_amount = instrument.amount(instrument.lots(amount))
 
         else:
             new_order.new_amount = order.amount
 
         timestamp = self._add_latency(self.markets[order.symbol].timestamp)
 
-        # If there is already an event in the queue at that time, add it at the end
-        if timestamp not in self.live_events.keys():
-            self.live_events[timestamp] = deque()
+        # Add the modification to the queue
+        self._schedule(timestamp, EventKind.MODIFY, new_order)
 
-        self.live_events[timestamp].append(new_order)
+    def submit_orders(
+        self,
+        orders: List[tuple],
+        local_timestamp: int,
+        cancels: List[Order] = (),
+    ) -> List[Order]:
+        """
+        Send several orders, and optionally cancels, as one message. The message gets
+        a single latency and is applied at once when it arrives: first the cancels,
+        then the orders in the given sequence.
 
-    def _check_balance(self, order: Order) -> bool:
+        :param orders: (List[tuple]) (symbol, amount, price, side) per order, a price
+        of None sends a market order
+        :param cancels: (List[Order]) orders to cancel before the new ones are placed
+
+        :return: (List[Order]) the new orders
         """
-        Sanity check that we have enough balance to execute such an order
-        before we even place it.
+        timestamp = self._add_latency(local_timestamp)
+        new_orders = [
+            self._new_order(symbol, amount, price, side, local_timestamp, timestamp)
+            for symbol, amount, price, side in orders
+        ]
+
+        events = [
+            (EventKind.CANCEL, CancelOrder(symbol=order.symbol, order=order))
+            for order in cancels
+        ]
+        events.extend((EventKind.ORDER, order) for order in new_orders)
+        if len(events) > 0:
+            self._schedule(
+                timestamp,
+                EventKind.BATCH,
+                OrderBatch(symbol=events[0][1].symbol, events=events),
+            )
+        return new_orders
+
+    def cancel_all(self, symbol: str, side: Optional[bool] = None) -> None:
         """
-        # If it is a buy, check that we have enough quote currency
-        # available to buy the base
-        if self.exchange_type == "spot":
-            if order.side:
-                if (
-                    self.balances[self.market_map[order.symbol][1]]
-                    < order.amount * order.price
-                ):
-                    self.logger.warn(
-                        f"Buy Order couldnt be opened, not enough balance available \nOpened Amount: {order.amount * order.price}, Available Amount: {self.balances[self.market_map[order.symbol][1]]}"
-                    )
-                    return False
-            # else, check that we have enough base to sell it
-            else:
-                if self.balances[self.market_map[order.symbol][0]] < order.amount:
-                    self.logger.warn(
-                        f"Sell Order couldnt be opened, not enough balance available \nOpened Amount: {order.amount}, Available Amount: {self.balances[self.market_map[order.symbol][0]]}"
-                    )
-                    return False
-        elif self.exchange_type == "future":
-            if order.side:
-                if (
-                    self.balances[self.market_map[order.symbol][1]]
-                    < order.amount * order.price
-                ):
-                    self.logger.warn(
-                        f"Buy Order couldnt be opened, not enough balance available \nOpened Amount: {order.amount * order.price}, Available Amount: {self.balances[self.market_map[order.symbol][1]]}"
-                    )
-                    return False
+        Cancel all open orders of a symbol, or of one side of it, with one message.
 
-        return True
+        :param side: (bool) 1 for the buys, 0 for the sells, both if None
+        """
+        timestamp = self._add_latency(self.markets[symbol].timestamp)
+        self._schedule(
+            timestamp, EventKind.CANCEL_ALL, CancelAll(symbol=symbol, side=side)
+        )
+
+    def replace_order(
+        self,
+        order: Order,
+        price: Optional[float] = None,
+        amount: Optional[float] = None,
+    ) -> Order:
+        """
+        Cancel an order and place a new one with a new price and/or amount in one
+        message. Unlike modify_order the new order gets a new id. As for modify_order
+        the amount includes what the old order has filled when the message arrives, the
+        new order is placed with the rest. The replacement is atomic: if the order is
+        not open anymore when the message arrives, e.g. because it was filled, or
+        nothing of the new amount is left, the new order is not placed and the old one
+        is left as it is.
+
+        :return: (Order) the new order
+        """
+        local_timestamp = self.markets[order.symbol].timestamp
+        timestamp = self._add_latency(local_timestamp)
+        new_order = self._new_order(
+            order.symbol,
+            order.amount if amount is None else amount,
+            order.price if price is None else price,
+            order.side,
+            local_timestamp,
+            timestamp,
+        )
+        self._schedule(
+            timestamp,
+            EventKind.REPLACE,
+            ReplaceOrder(symbol=order.symbol, order=order, new_order=new_order),
+        )
+        return new_order
+
+    def _filled_lots(self, order: Order) -> int:
+        # Lots of an order that are already filled
+        return order.lots - self.instruments[order.symbol].lots(order.remainingAmount)
 
-    def _execute_modification(self, order: ModifyOrder) -> None:
+    def _execute_modification(self, order: ModifyOrder) -> bool:
         """
         function that finds the order by the order_id
         and replaces it by the new that is sent.
         The order_id is not updated so we can just look for it directly.
 
-        :param order: (Order)
+        :param order: (ModifyOrder)
+
+        :return: (bool) False if the order is not open anymore or the new amount is not
+        larger than the amount that is already filled
         """
-        orders = self.open_orders[order.symbol][order.side]
+        orders = self.open_orders[order.symbol][order.order.side]
+        o = orders.get(order.order.order_id)
+        if o is None:
+            return False
+
+        instrument = self.instruments[order.symbol]
+        tick = instrument.ticks(order.new_price)
+        lots = instrument.lots(order.new_amount)
+        # The new amount includes what is already filled, only the rest stays open
+        remaining = lots - self._filled_lots(o)
+        if remaining <= 0:
+            return False
+
+        # A new price or a larger amount puts the order at the end of the queue,
+        # reducing the amount keeps its place
+        if tick != o.tick or lots > o.lots:
+            orders.remove(o.order_id)
+            o.tick = tick
+            o.price = instrument.price(tick)
+        o.lots = lots
+        o.amount = instrument.amount(lots)
+        o.remainingAmount = instrument.amount(remaining)
+        if o.order_id not in orders:
+            orders.add(o)
 
-        # look for a match and update the new price and amounts
-        for o in orders:
-            if o.order_id == order.order_id:
-                o.price = order.new_price
-                o.amount = order.new_amount
+        return True
 
     def _execute_cancellation(self, order: CancelOrder, timestamp: float) -> None:
         """
         Actually cancel the order now that was in the queue. Since this order can also
-        be executed in the meantime,
-        we have to do a try:except.
+        be executed in the meantime, it is looked up by its id first.
         """
-        try:
-            cancelled_order = order.order
+        cancelled_order = self.open_orders[order.symbol][order.order.side].remove(
+            order.order.order_id
+        )
 
-            cancelled_order.status = OrderStatus.CANCELLED
-            cancelled_order.eventTime = timestamp
+        if cancelled_order is None:
+            if self.journal is not None:
+                self.journal.record(
+                    timestamp, JournalKind.CANCEL_FAILED, order.order.order_id, 0, 0
+                )
+            return
 
-            self.open_orders[cancelled_order.symbol][cancelled_order.side].pop(
-                cancelled_order.price
-            )
+        cancelled_order.status = OrderStatus.CANCELLED
+        cancelled_order.eventTime = timestamp
 
-            self.orders.append(cancelled_order)
+        self.orders.append(cancelled_order)
 
-        except Exception as e:
-            self.logger.warn(f"Cancellation failed, order {order} not open")
+        if self.journal is not None:
+            self.journal.record(
+                timestamp,
+                JournalKind.CANCEL,
+                cancelled_order.order_id,
+                cancelled_order.price,
+                cancelled_order.remainingAmount,
+            )
 
     def _execute_market(self, event: Order, timestamp: float) -> None:
         # We chose the Ask Price if we buy, the Bid Price if we sell
@@ -528,11 +1072,16 @@ class TOB_Exchange(Exchange):
 
         # Update the price of the Order event
         event.price = price
+        event.tick = self.instruments[event.symbol].ticks(price)
 
         # Double check that we have enough balance available to execute the order
         if self._check_balance(event):
             # Open the position if the balance is okay
             self.open_position(order=event, timestamp=timestamp)
+        elif self.journal is not None:
+            self.journal.record(
+                timestamp, JournalKind.REJECT, event.order_id, price, event.amount
+            )
 
     def _check_match_trades(self, trade: Trade, timestamp: float) -> None:
         """
@@ -548,36 +1097,34 @@ class TOB_Exchange(Exchange):
         # go through the sell orders
         # and see if one would have gotten hit by it.
         # public_price >= open_order
+        tick = self.instruments[trade.symbol].ticks(trade.price)
         if (trade.side == 1) and len(self.open_orders[trade.symbol][0]) > 0:
             # check the lowest value (0) in our open orders
             # and see if its below the buy order price
-            if self.open_orders[trade.symbol][0].peekitem(0)[1].price <= trade.price:
+            if self.open_orders[trade.symbol][0].peekitem(0)[0] <= tick:
                 # We have a match, pop the order out of the open orders
                 # and open the position
                 order = self.open_orders[trade.symbol][0].popitem(0)[1]
-                self.logger.info(f"Trade match found! Order {order} will be opened")
                 self.open_position(order=order, timestamp=timestamp)
 
         # else check if we have a open buy order and the public trade was a sell.
         elif (trade.side == 0) and len(self.open_orders[trade.symbol][1]) > 0:
-            # check the last value in the SortedDict (-1) which will be the highest buy
+            # check the last level in the open orders (-1) which will be the highest buy
             # price and look for a match
-            if self.open_orders[trade.symbol][1].peekitem(-1)[1].price >= trade.price:
+            if self.open_orders[trade.symbol][1].peekitem(-1)[0] >= tick:
                 # We have a match, pop the order out of the open orders
                 # and open the position
                 order = self.open_orders[trade.symbol][1].popitem(-1)[1]
-                self.logger.info(f"Trade match found! Order {order} will be opened")
                 self.open_position(order=order, timestamp=timestamp)
 
     def _check_match(self, symbol: str, timestamp: float) -> None:
+        instrument = self.instruments[symbol]
         # If there is a buy order and the price is above the current ask price,
         # we execute it
         if len(self.open_orders[symbol][1]) > 0:
-            while (
-                self.markets[symbol].ap
-                <= self.open_orders[symbol][1].peekitem(-1)[1].price
-            ):
-                order = self.open_orders[symbol][1].popitem(0)[1]
+            ask = instrument.ticks(self.markets[symbol].ap)
+            while ask <= self.open_orders[symbol][1].peekitem(-1)[0]:
+                order = self.open_orders[symbol][1].popitem(-1)[1]
                 # If the price moved in the meantime which leads to direct execution,
                 # it was a taker
                 if order.entryTime == timestamp:
@@ -585,19 +1132,15 @@ class TOB_Exchange(Exchange):
 
                 self.open_position(order=order, timestamp=timestamp)
 
-                self.logger.info(f"TOB match found! Order {order} will be opened")
-
                 if len(self.open_orders[symbol][1]) == 0:
                     break
 
         # If there is a sell order and the price is lower than the current best bid,
         # we execute it
         if len(self.open_orders[symbol][0]) > 0:
-            while (
-                self.markets[symbol].bp
-                >= self.open_orders[symbol][0].peekitem(0)[1].price
-            ):
-                order = self.open_orders[symbol][0].popitem(-1)[1]
+            bid = instrument.ticks(self.markets[symbol].bp)
+            while bid >= self.open_orders[symbol][0].peekitem(0)[0]:
+                order = self.open_orders[symbol][0].popitem(0)[1]
                 # If the price moved in the meantime which leads to direct execution,
                 # it was a taker
                 if order.entryTime == timestamp:
@@ -605,76 +1148,653 @@ class TOB_Exchange(Exchange):
 
                 self.open_position(order=order, timestamp=timestamp)
 
-                self.logger.info(f"TOB match found! Order {order} will be opened")
-
                 if len(self.open_orders[symbol][0]) == 0:
                     break
 
-    def _simulation_step(self) -> None:
-        # Select the current event and remove it from the Queue
-        ts = self.live_events.peekitem(0)[0]
-        event = self.live_events.peekitem(0)[1].popleft()
-
-        ##############################
-        ### Could be done by switch ##
-        ##############################
-
-        # If the update is a new TOB, change it
-        if type(event) == TOB:
-            self.markets[event.symbol] = TOB(
-                symbol=event.symbol,
-                timestamp=ts,
-                bq=event.bq,
-                bp=event.bp,
-                ap=event.ap,
-                aq=event.aq,
+    def _apply_tob(self, row: tuple, ts: int, symbol: str) -> None:
+        # Update the market state in place
+        market = self.markets[symbol]
+        market.timestamp = ts
+        market.bq = row[4]
+        market.bp = row[5]
+        market.ap = row[6]
+        market.aq = row[7]
+
+    def _apply_public_trade(self, row: tuple, ts: int, symbol: str) -> None:
+        # If there are open orders on the other side, check if it leads to execution
+        if len(self.open_orders[symbol][0 if row[3] else 1]) > 0:
+            trade = Trade(
+                symbol=symbol,
+                order_id=-1,
+                side=row[3],
+                taker=True,
+                amount=row[9],
+                price=row[8],
+                fees=0,
+                entryTime=ts,
+                eventTime=ts,
             )
-        # If the update is an order, execute the order
-        elif type(event) == Order:
-            # If its a market order, execute directly
-            if event.taker:
-                self._execute_market(event, ts)
-            # If its a limit order, put it into the open orders that wait for execution
+            self._check_match_trades(trade, ts)
+
+    def _apply_order(self, event: Order, ts: int, symbol: str) -> None:
+        # If its a market order, execute directly
+        if event.taker:
+            self._execute_market(event, ts)
+        # If its a limit order, put it into the open orders that wait for execution
+        else:
+            check = self._check_balance(event)
+            if check:
+                self.open_orders[symbol][event.side].add(event)
+                kind = JournalKind.OPEN
             else:
-                check = self._check_balance(event)
-                if check:
-                    self.logger.info(f"Order Opened. {event}")
-                    self.open_orders[event.symbol][event.side][event.price] = event
-
-        # If the event is a modification, change the order in question.
-        elif type(event) == ModifyOrder:
-            self._execute_modification(event)
-
-        # If the event is a cancellation, cancel the order
-        elif type(event) == CancelOrder:
-            self.logger.info(f"Order Cancelled. {event}")
-            self._execute_cancellation(event, ts)
-
-        # If the event is a public trade, check if it would lead to execution
-        elif type(event) == Trade:
-            self._check_match_trades(event, ts)
-
-        # Remove the event timestamp if there are no more in the queue at that time
-        if len(self.live_events.peekitem(0)[1]) == 0:
-            self.live_events.popitem(0)
-
-        # Finally, check for a match in the current pair
-        # event.symbol exists in all possible updates so we can safely call it
-        self._check_match(event.symbol, ts)
+                kind = JournalKind.REJECT
+
+            if self.journal is not None:
+                self.journal.record(ts, kind, event.order_id, event.price, event.amount)
+
+    def _apply_modification(self, event: ModifyOrder, ts: int, symbol: str) -> None:
+        modified = self._execute_modification(event)
+
+        if self.journal is not None:
+            self.journal.record(
+                ts,
+                JournalKind.MODIFY if modified else JournalKind.MODIFY_FAILED,
+                event.order.order_id,
+                event.order.price,
+                event.order.amount,
+            )
+
+    def _apply_cancellation(self, event: CancelOrder, ts: int, symbol: str) -> None:
+        self._execute_cancellation(event, ts)
+
+    def _apply_cancel_all(self, event: CancelAll, ts: int, symbol: str) -> None:
+        # Empty the sides at once instead of removing the orders one by one
+        for side in [1, 0] if event.side is None else [event.side]:
+            for order in self.open_orders[symbol][side].clear():
+                order.status = OrderStatus.CANCELLED
+                order.eventTime = ts
+                self.orders.append(order)
+                if self.journal is not None:
+                    self.journal.record(
+                        ts,
+                        JournalKind.CANCEL,
+                        order.order_id,
+                        order.price,
+                        order.remainingAmount,
+                    )
+
+    def _apply_replace(self, event: ReplaceOrder, ts: int, symbol: str) -> None:
+        new_order = event.new_order
+        if event.order.order_id in self.open_orders[symbol][event.order.side]:
+            # The new amount includes what the old order filled until now
+            lots = new_order.lots - self._filled_lots(event.order)
+            if lots > 0:
+                self._execute_cancellation(
+                    CancelOrder(symbol=symbol, order=event.order), ts
+                )
+                new_order.lots = lots
+                new_order.amount = self.instruments[symbol].amount(lots)
+                new_order.remainingAmount = new_order.amount
+                self._apply_order(new_order, ts, symbol)
+                return
+            # Nothing would be left to place, the old order stays open
+            failed = JournalKind.MODIFY_FAILED
+        else:
+            # The old order is gone, so the new one is not placed
+            failed = JournalKind.CANCEL_FAILED
+
+        new_order.status = OrderStatus.CANCELLED
+        if self.journal is not None:
+            self.journal.record(ts, failed, event.order.order_id, 0, 0)
+            self.journal.record(
+                ts,
+                JournalKind.REJECT,
+                event.new_order.order_id,
+                event.new_order.price,
+                event.new_order.amount,
+            )
+
+    def _apply_batch(self, event: OrderBatch, ts: int, symbol: str) -> None:
+        dispatch = self._dispatch
+        symbols = set()
+        for kind, single in event.events:
+            dispatch[kind](single, ts, single.symbol)
+            symbols.add(single.symbol)
+
+        # The simulation step checks the symbol of the batch, the others here
+        symbols.discard(symbol)
+        for other in symbols:
+            orders = self.open_orders[other]
+            if len(orders[0]) > 0 or len(orders[1]) > 0:
+                self._check_match(other, ts)
+
+    def _simulation_step(self) -> None:
+        # Select the next event. Market data comes from the cursor over the event
+        # store, user events from the live queue. On equal timestamps the market data
+        # goes first, as user events are always added after it.
+        cursor = self._cursor
+        live_events = self.live_events
+        row = cursor.head
+        if len(live_events) > 0 and (row is None or live_events[0][0] < row[0]):
+            ts, _, kind, event = heapq.heappop(live_events)
+            symbol = event.symbol
+            self._dispatch[kind](event, ts, symbol)
+
+        else:
+            cursor.advance()
+            ts = row[0]
+            symbol_id = row[1]
+            symbol = self.events.symbols[symbol_id]
+            self._dispatch[row[2]](row, ts, symbol)
+            features = self.features
+            if features is not None:
+                features.update(row, ts, symbol, self.markets[symbol])
+
+            # Without open orders, the following market data of the same symbol can
+            # not lead to an execution. Apply it in one go up to the next user event.
+            # Features have to see all of it.
+            orders = self.open_orders[symbol]
+            if (
+                self.batch_market_data
+                and len(orders[0]) == 0
+                and len(orders[1]) == 0
+                and (features is None or symbol not in features.symbols)
+            ):
+                limit = live_events[0][0] if len(live_events) > 0 else None
+                if self.horizon is not None and (limit is None or self.horizon < limit):
+                    limit = self.horizon
+                last_tob, last = cursor.skip_run(symbol_id, limit)
+                if last is not None:
+                    ts = last[0]
+                    # Public trades can't match, only the last TOB of the run matters
+                    if last_tob is not None:
+                        self._apply_tob(last_tob, last_tob[0], symbol)
+
+        # Finally, check for a match in the current pair if it has open orders
+        orders = self.open_orders[symbol]
+        if len(orders[0]) > 0 or len(orders[1]) > 0:
+            self._check_match(symbol, ts)
         self.last_timestamp = ts
-        # self.overview(event.symbol)
+        self.last_symbol = symbol
+
+    def _fill_mask(self, events: np.ndarray) -> np.ndarray:
+        """
+        Mask of the market data that could fill one of the open orders.
+        """
+        mask = np.zeros(len(events), dtype=bool)
+        for symbol, orders in self.open_orders.items():
+            if len(orders[0]) == 0 and len(orders[1]) == 0:
+                continue
+
+            own = events["symbol"] == self.events.symbol_ids[symbol]
+            tob = events["kind"] == EventKind.TOB
+            # The market data stays float, it is compared with the prices half a tick
+            # beyond the best order ticks instead of rounding every record to ticks.
+            # This selects every record that rounds to a crossing tick.
+            tick_size = self.instruments[symbol].tick_size
+            # The highest buy is hit by a lower ask or a sell trade below its price
+            if len(orders[1]) > 0:
+                buy = (orders[1].peekitem(-1)[0] + 0.5) * tick_size
+                mask |= own & (
+                    (tob & (events["ap"] <= buy))
+                    | (~tob & (events["side"] == 0) & (events["price"] <= buy))
+                )
+            # The lowest sell is hit by a higher bid or a buy trade above its price
+            if len(orders[0]) > 0:
+                sell = (orders[0].peekitem(0)[0] - 0.5) * tick_size
+                mask |= own & (
+                    (tob & (events["bp"] >= sell))
+                    | (~tob & (events["side"] == 1) & (events["price"] >= sell))
+                )
+        return mask
+
+    def fast_forward(self, conditions: List[WakeCondition]) -> int:
+        """
+        Skip the market data until the first event that satisfies one of the wake-up
+        conditions, could fill an open order or is followed by a user event. The skipped
+        events are found with vectorized scans, only the last TOB of every symbol is
+        applied. The next _simulation_step processes the event that stopped the scan.
+
+        :param conditions: (List[WakeCondition]) conditions of the strategy
+
+        :return: (int) the number of skipped events
+        """
+        cursor = self._cursor
+        if cursor.head is None:
+            return 0
+
+        now = cursor.head[0] if self.last_timestamp is None else self.last_timestamp
+        symbol_ids = self.events.symbol_ids
+        limit = self.live_events[0][0] if len(self.live_events) > 0 else None
+
+        def stop(events: np.ndarray) -> np.ndarray:
+            mask = self._fill_mask(events)
+            if limit is not None:
+                mask |= events["ts"] > limit
+            for condition in conditions:
+                mask |= condition.mask(events, symbol_ids, now)
+            if self.features is not None:
+                # The features of a symbol are updated by every event
+                ids = [symbol_ids[s] for s in self.features.symbols if s in symbol_ids]
+                mask |= np.isin(events["symbol"], ids)
+            return mask
+
+        skipped = cursor.skip_until(stop)
+        self._apply_skipped(skipped)
+
+        if len(skipped) > 0:
+            self.last_timestamp = int(skipped[-1]["ts"][-1])
+
+        return sum(len(events) for events in skipped)
+
+    def _apply_skipped(self, skipped: List[np.ndarray]) -> None:
+        # Apply the last TOB of every symbol, public trades could not match anything
+        for events in skipped:
+            tob = events["kind"] == EventKind.TOB
+            for symbol_id, symbol in enumerate(self.events.symbols):
+                own = tob & (events["symbol"] == symbol_id)
+                if own.any():
+                    row = events[len(own) - 1 - int(np.argmax(own[::-1]))].tolist()
+                    self._apply_tob(row, row[0], symbol)
+
+    def has_events(self) -> bool:
+        """
+        True as long as there is market data or a user event left to process.
+        """
+        return self._cursor.head is not None or len(self.live_events) > 0
 
     # def run_analytics(self):
     #     analytics = PostTrade(self.trades)
 
     def prepare_backtest(self):
-        # self.live_events = self.events.copy()
-        self.live_events = deepcopy(self.events)
+        """
+        Reset the exchange to the start of the loaded market data. The market data is
+        shared and never copied, a run only gets a new cursor and an empty queue for
+        its own events. The cost is independent of the size of the data.
+        """
+        for symbol in self.events.initial:
+            self._reset_market(symbol)
+
+        self.balances = self.initial_balances.copy()
+        if self.exchange_type == "future":
+            self.positions = {symbol: 0 for symbol in self.positions}
+
+        self.trades = []
+        self.orders = []
+        self.equity.reset()
+        self.last_timestamp = None
+        if self.journal is not None:
+            self.journal.clear()
+
+        # Start the replay at the beginning of the stored market data
+        self._cursor = self.events.cursor()
+        self.live_events = []
+
+        if self.columns is not None:
+            self.columns.start(self.events, self._cursor)
+
+        # The features start from the initial TOB
+        if self.features is not None:
+            self.features.reset()
+            for symbol in self.events.initial:
+                market = self.markets[symbol]
+                self.features.update_tob(symbol, market, market.timestamp)
 
     def run_simulation(self, strategy, symbol):
+        """
+        Run a strategy over the loaded market data. If the strategy has a method
+        wake_conditions returning a list of WakeCondition (or None to not skip), the
+        market data in between is fast-forwarded instead of calling it on every event.
+        """
         strat = strategy(symbol)
-        self.live_events = self.events.copy()
-        while len(self.live_events) > 0:
+        wake_conditions = getattr(strat, "wake_conditions", None)
+        self.prepare_backtest()
+        while self.has_events():
             strat.run_strategy()
+            if wake_conditions is not None:
+                conditions = wake_conditions()
+                if conditions is not None:
+                    self.fast_forward(conditions)
+                    if not self.has_events():
+                        break
             self._simulation_step()
             self._update_balance(symbol)
+
+
+class TickExchange(TOB_Exchange):
+    def __init__(
+        self,
+        fees: List[int] = [0, 2],
+        exchange_type: ExchangeType = "spot",
+        latency: Optional[Latency] = None,
+        name: str = "",
+        events: Optional[EventStore] = None,
+        journal: Optional[Journal] = None,
+        equity: Optional[EquityRecorder] = None,
+        features: Optional[FeaturePipeline] = None,
+    ):
+        """
+        Exchange that replays L2 order book updates, e.g. the incremental_book_L2 files
+        of Tardis, into a price ladder per symbol (see ladder.py). The TOB of a market
+        is kept up to date from the ladder, so the interface of the TOB_Exchange works
+        the same.
+
+        Market orders walk the book and take the liquidity of the levels they fill until
+        the next update of the level. Limit orders first take the liquidity up to their
+        price and rest in the book with the rest. A resting order keeps track of the
+        amount queued in front of it: the amount of its level when it arrives, reduced
+        by every public trade at its price and capped by the level when the level gets
+        smaller. It fills once the trades at its price exceed the amount in front of it,
+        or when the market trades through its price.
+
+        :param fees: (List[int]) fees defined as basispoints [maker, taker]
+        :param latency: (Latency) latency model, defaults to
+        LogNormalLatency(5000, 0.3, seed=0) in us. Pass a model with another seed, or
+        seed=None for fresh draws in every run, to change the latencies.
+        :param events: (EventStore) already loaded market data to share with other exchanges
+        :param journal: (Journal) records the orders and fills of a run
+        :param equity: (EquityRecorder) records the balances during a run
+        :param features: (FeaturePipeline) features updated by the market data, a book
+        update counts as a TOB update of its symbol
+        """
+        super().__init__(
+            fees=fees,
+            exchange_type=exchange_type,
+            latency=latency,
+            name=name,
+            events=events,
+            journal=journal,
+            equity=equity,
+            features=features,
+        )
+
+        self.books = {}
+        # Amount in front of every resting order in the queue of its price level
+        self.queue_ahead = {}
+        # True while the updates of a symbol are part of a snapshot
+        self._snapshot = {}
+
+        self._dispatch[EventKind.BOOK] = self._apply_book
+        self._dispatch[EventKind.BOOK_SNAPSHOT] = self._apply_snapshot
+
+    def add_market(
+        self,
+        symbol: str,
+        base: str,
+        quote: str,
+        tick_size: float,
+        lot_size: float = 1e-8,
+    ) -> None:
+        """
+        Adds a new market with an empty order book to the exchange.
+
+        :param tick_size: (float) price increment of the market
+        :param lot_size: (float) amount increment of the market
+        """
+        super().add_market(symbol, base, quote, tick_size, lot_size)
+        self.books[symbol] = BookLadder(tick_size)
+
+    def load_book(self, book_updates: List[float], symbol: str) -> None:
+        """
+        Load L2 book updates in the format [timestamp, side, price, amount, is_snapshot]
+        where side is either "bid" or "ask".
+        """
+        self.logger.info(f"Loading {len(book_updates)} book updates for {symbol}")
+        self.events.add_book(book_updates, symbol)
+        self._reset_market(symbol)
+
+    def book(self, symbol: str, levels: int = 10) -> tuple:
+        """
+        The best levels of the order book.
+
+        :return: (tuple) bids and asks as arrays of [price, amount], best first
+        """
+        book = self.books[symbol]
+        return book.depth(1, levels), book.depth(0, levels)
+
+    def _reset_market(self, symbol: str) -> None:
+        if symbol in self.events.initial:
+            super()._reset_market(symbol)
+        else:
+            self.open_orders[symbol] = {}
+            self.open_orders[symbol][1] = RestingOrders()
+            self.open_orders[symbol][0] = RestingOrders()
+            self.markets[symbol] = TOB(
+                symbol=symbol, timestamp=0, bq=0.0, bp=np.nan, ap=np.nan, aq=0.0
+            )
+
+        if symbol in self.books:
+            self.books[symbol].clear()
+            self._snapshot[symbol] = False
+
+    def prepare_backtest(self):
+        super().prepare_backtest()
+        self.queue_ahead = {}
+        for symbol in self.books:
+            self._reset_market(symbol)
+
+    def _update_top(self, symbol: str) -> None:
+        market = self.markets[symbol]
+        market.bq, market.bp, market.ap, market.aq = self.books[symbol].top()
+
+    def _apply_book(self, row: tuple, ts: int, symbol: str) -> None:
+        self._snapshot[symbol] = False
+        self._update_level(row, ts, symbol)
+
+    def _apply_snapshot(self, row: tuple, ts: int, symbol: str) -> None:
+        # The first update of a new snapshot replaces the book
+        if not self._snapshot[symbol]:
+            self.books[symbol].clear()
+            self._snapshot[symbol] = True
+        self._update_level(row, ts, symbol)
+
+    def _update_level(self, row: tuple, ts: int, symbol: str) -> None:
+        side = row[3]
+        price = row[8]
+        amount = row[9]
+
+        self.markets[symbol].timestamp = ts
+        if self.books[symbol].update(side, price, amount):
+            self._update_top(symbol)
+
+        # If the level got smaller than the amount in front of a resting order, the
+        # orders in front of it were cancelled
+        resting = self.open_orders[symbol][side]
+        if len(resting) > 0:
+            queue = resting.levels.get(self.books[symbol].tick(price))
+            if queue is not None:
+                for order_id in queue:
+                    if self.queue_ahead[order_id] > amount:
+                        self.queue_ahead[order_id] = amount
+
+    def _apply_public_trade(self, row: tuple, ts: int, symbol: str) -> None:
+        # A public buy fills our sells, a public sell our buys
+        side = 0 if row[3] else 1
+        resting = self.open_orders[symbol][side]
+        tick = self.books[symbol].tick(row[8])
+        volume = row[9]
+
+        while len(resting) > 0:
+            level, order = resting.peekitem(-1 if side else 0)
+            if level < tick if side else level > tick:
+                break
+
+            # The trade went through the price of the order
+            if level != tick:
+                self._fill(order, ts, order.remainingAmount)
+                continue
+
+            # The trade happened at the price of the orders, they fill with the volume
+            # that exceeds the amount queued in front of them
+            filled = 0
+            for order in list(resting.levels[level].values()):
+                ahead = self.queue_ahead[order.order_id] - volume
+                if ahead < 0:
+                    amount = min(order.remainingAmount, -ahead - filled)
+                    ahead = 0
+                    if amount > 0:
+                        filled += amount
+                        self._fill(order, ts, amount)
+                if order.order_id in self.queue_ahead:
+                    self.queue_ahead[order.order_id] = ahead
+            break
+
+    def _fill(
+        self, order: Order, timestamp: int, amount: float, price: float = None
+    ) -> None:
+        self.open_position(order, timestamp, amount, price)
+        if order.remainingAmount <= 0:
+            self.open_orders[order.symbol][order.side].remove(order.order_id)
+            self.queue_ahead.pop(order.order_id, None)
+
+    def _check_match(self, symbol: str, timestamp: float) -> None:
+        # Resting orders the market moved through are filled at their price, the best
+        # levels of the ladder are compared in ticks
+        book = self.books[symbol]
+
+        buys = self.open_orders[symbol][1]
+        if len(buys) > 0 and book.best_ask < len(book.asks):
+            ask = book.best_ask + book.offset
+            while len(buys) > 0 and buys.peekitem(-1)[0] >= ask:
+                order = buys.peekitem(-1)[1]
+                self._fill(order, timestamp, order.remainingAmount)
+
+        sells = self.open_orders[symbol][0]
+        if len(sells) == 0 or book.best_bid < 0:
+            return
+        bid = book.best_bid + book.offset
+        while len(sells) > 0 and sells.peekitem(0)[0] <= bid:
+            order = sells.peekitem(0)[1]
+            self._fill(order, timestamp, order.remainingAmount)
+
+    def _take(self, order: Order, timestamp: int, limit: int = None) -> None:
+        # Fill the order level by level with the liquidity of the book
+        book = self.books[order.symbol]
+        prices, amounts = book.take(order.side, order.remainingAmount, limit)
+        if len(prices) > 0:
+            taker = order.taker
+            order.taker = True
+            for price, amount in zip(prices.tolist(), amounts.tolist()):
+                self.open_position(order, timestamp, amount, price)
+            order.taker = taker
+            self._update_top(order.symbol)
+
+    def _execute_market(self, event: Order, timestamp: float) -> None:
+        market = self.markets[event.symbol]
+        event.price = market.ap if event.side else market.bp
+        if event.price == event.price:
+            event.tick = self.books[event.symbol].tick(event.price)
+
+        # The balance is checked with the best price, the book is empty if it is NaN
+        if event.price != event.price or not self._check_balance(event):
+            if self.journal is not None:
+                self.journal.record(
+                    timestamp, JournalKind.REJECT, event.order_id, 0, event.amount
+                )
+            return
+
+        self._take(event, timestamp)
+
+        # What the book could not fill is cancelled
+        if event.remainingAmount > 0:
+            if event.status == OrderStatus.PARTIALLY_FILLED:
+                self.orders.append(event)
+            if self.journal is not None:
+                self.journal.record(
+                    timestamp,
+                    JournalKind.CANCEL,
+                    event.order_id,
+                    0,
+                    event.remainingAmount,
+                )
+
+    def _apply_order(self, event: Order, ts: int, symbol: str) -> None:
+        if event.taker:
+            self._execute_market(event, ts)
+            return
+
+        book = self.books[symbol]
+
+        if not self._check_balance(event):
+            if self.journal is not None:
+                self.journal.record(
+                    ts, JournalKind.REJECT, event.order_id, event.price, event.amount
+                )
+            return
+
+        if self.journal is not None:
+            self.journal.record(
+                ts, JournalKind.OPEN, event.order_id, event.price, event.amount
+            )
+
+        # Take the liquidity up to the price of the order, the rest rests in the book
+        # at the end of the queue of its level
+        self._take(event, ts, limit=event.tick)
+        if event.remainingAmount > 0:
+            self.open_orders[symbol][event.side].add(event)
+            self.queue_ahead[event.order_id] = book.amount(event.side, event.price)
+
+    def _execute_modification(self, order: ModifyOrder) -> bool:
+        resting = order.order
+        instrument = self.instruments[order.symbol]
+        requeue = (
+            instrument.ticks(order.new_price) != resting.tick
+            or instrument.lots(order.new_amount) > resting.lots
+        )
+
+        modified = super()._execute_modification(order)
+        if modified and requeue:
+            self.queue_ahead[resting.order_id] = self.books[order.symbol].amount(
+                resting.side, resting.price
+            )
+        return modified
+
+    def _execute_cancellation(self, order: CancelOrder, timestamp: float) -> None:
+        super()._execute_cancellation(order, timestamp)
+        self.queue_ahead.pop(order.order.order_id, None)
+
+    def _apply_cancel_all(self, event: CancelAll, ts: int, symbol: str) -> None:
+        for side in [1, 0] if event.side is None else [event.side]:
+            for order in self.open_orders[symbol][side]:
+                self.queue_ahead.pop(order.order_id, None)
+        super()._apply_cancel_all(event, ts, symbol)
+
+    def _fill_mask(self, events: np.ndarray) -> np.ndarray:
+        # Crossing updates and trades are covered by the TOB_Exchange. In addition
+        # updates of the levels with resting orders change their queue position and
+        # snapshots are never skipped.
+        mask = super()._fill_mask(events)
+        mask |= events["kind"] == EventKind.BOOK_SNAPSHOT
+
+        book = events["kind"] == EventKind.BOOK
+        for symbol, orders in self.open_orders.items():
+            if len(orders[0]) == 0 and len(orders[1]) == 0:
+                continue
+            # Only the book updates of the symbol are rounded to ticks
+            own = np.flatnonzero(
+                book & (events["symbol"] == self.events.symbol_ids[symbol])
+            )
+            if len(own) == 0:
+                continue
+            ticks = np.rint(events["price"][own] / self.instruments[symbol].tick_size)
+            ticks = ticks.astype(np.int64)
+            sides = events["side"][own]
+            for side in [0, 1]:
+                if len(orders[side]) > 0:
+                    levels = np.fromiter(orders[side].levels.keys(), dtype=np.int64)
+                    mask[own[(sides == side) & np.isin(ticks, levels)]] = True
+        return mask
+
+    def _apply_skipped(self, skipped: List[np.ndarray]) -> None:
+        super()._apply_skipped(skipped)
+
+        # Apply the skipped book updates in one go per symbol
+        for events in skipped:
+            book = events[events["kind"] == EventKind.BOOK]
+            for symbol_id in np.unique(book["symbol"]).tolist():
+                symbol = self.events.symbols[symbol_id]
+                own = book[book["symbol"] == symbol_id]
+                self.books[symbol].update_many(own["side"], own["price"], own["amount"])
+                self._snapshot[symbol] = False
+                self._update_top(symbol)
+                self.markets[symbol].timestamp = int(own["ts"][-1])
@@ -0,0 +1,192 @@
+"""
+Feature columns that are computed once over the whole market data.
+
+Signals that only depend on the market data, not on the own orders and fills, do not
+have to be updated while the data is replayed. FeatureColumns computes the features of
+features.py vectorized over all TOB and trade records of an EventStore and keeps one
+value per replay position: row 0 is the state at the initial TOBs and row i + 1 the
+state after the i-th record of the store. During the replay the current row is the
+position of the cursor of the exchange, so reading a signal is an array lookup and
+fast-forwarding or batching market data does not skip any update.
+
+If the store was loaded from or saved to a cache file, the columns are written next to
+it as .npy files and memory-mapped again in later runs:
+
+    exchange.load_cache("btcusdt.events")
+    exchange.add_column(Microprice("BTCUSDT"))
+    exchange.add_column(EMA("BTCUSDT", lookback_us=60_000_000))
+    ...
+    # in the strategy
+    micro = exchange.columns["BTCUSDT_microprice"]
+    last_100 = exchange.columns.history("BTCUSDT_mid_ema_60000000", 100)
+
+Reads are only possible up to the current row, asking for a later row raises a
+LookAheadError.
+"""
+
+from typing import Dict, Optional
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+
+from .data_types import EventKind
+from .event_store import EVENT_DTYPE, EventStore, ReplayCursor
+from .features import Feature
+
+
+class LookAheadError(IndexError):
+    """
+    Raised when a strategy reads a feature column past the current replay position.
+    """
+
+
+def _spec(feature: Feature) -> str:
+    # Class and parameters of a feature, the key of its cached column
+    params = {
+        k: v
+        for k, v in vars(feature).items()
+        if not k.startswith("_") and isinstance(v, (str, int, float, bool))
+    }
+    return json.dumps([type(feature).__name__, params], sort_keys=True)
+
+
+def compute_column(feature: Feature, events: EventStore) -> np.ndarray:
+    """
+    Compute the values of a feature for every replay position of a store.
+
+    :return: (np.ndarray) len(events.data) + 1 values, NaN before the first update
+    """
+    data = events.data
+    if feature.symbol not in events.symbol_ids:
+        raise ValueError(f"No market data of {feature.symbol} is loaded")
+    own = data["symbol"] == events.symbol_ids[feature.symbol]
+
+    if feature.on_tob:
+        if feature.symbol not in events.initial:
+            raise ValueError(f"Feature columns of {feature.symbol} need TOB data")
+        initial = np.zeros(1, dtype=EVENT_DTYPE)
+        ts, bq, bp, ap, aq = events.initial[feature.symbol]
+        initial[["ts", "bq", "bp", "ap", "aq"]] = (ts, bq, bp, ap, aq)
+        records = np.flatnonzero(own & (data["kind"] == EventKind.TOB))
+        rows = np.concatenate([initial, data[records]])
+        # The initial TOB is the value of row 0
+        positions = np.concatenate([[0], records + 1])
+    else:
+        records = np.flatnonzero(own & (data["kind"] == EventKind.TRADE))
+        rows = data[records]
+        positions = records + 1
+
+    values = np.append(feature.column(rows), np.nan)
+    # Every row takes the value of the last update at or before it
+    last = np.searchsorted(positions, np.arange(len(data) + 1), side="right") - 1
+    return values[last]
+
+
+class FeatureColumns:
+    def __init__(self) -> None:
+        """
+        The precomputed features of an exchange, read at the current replay position.
+        """
+        self.features = {}
+        self._columns: Dict[str, np.ndarray] = {}
+        self._events = None
+        # Merged data of the store the columns were computed on
+        self._data = None
+        self._cursor: Optional[ReplayCursor] = None
+
+    def __len__(self) -> int:
+        return len(self.features)
+
+    def add(self, feature: Feature) -> str:
+        """
+        Register a feature, its column is computed by the next start.
+
+        :return: (str) name of the column
+        """
+        if feature.name in self.features:
+            raise ValueError(f"A column named {feature.name} is already registered")
+        self.features[feature.name] = feature
+        return feature.name
+
+    def _cache_path(self, feature: Feature) -> Optional[str]:
+        path = getattr(self._events, "path", None)
+        if path is None or not os.path.exists(path):
+            return None
+        # A column is valid for one version of the data file
+        key = json.dumps([_spec(feature), os.path.getmtime(path), len(self._events)])
+        digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+        return f"{path}.features{os.sep}{digest}.npy"
+
+    def start(self, events: EventStore, cursor: ReplayCursor) -> None:
+        """
+        Called by prepare_backtest. Computes or loads the missing columns and reads them
+        at the position of the new cursor from now on.
+        """
+        if not isinstance(events, EventStore):
+            raise TypeError("Feature columns need the market data in an EventStore")
+        data = events.data
+        # Recompute the columns if chunks were added to the store since the last start,
+        # merging them gives a new array
+        if events is not self._events or data is not self._data:
+            self._columns = {}
+            self._events = events
+            self._data = data
+        self._cursor = cursor
+
+        for name, feature in self.features.items():
+            if name in self._columns:
+                continue
+            path = self._cache_path(feature)
+            if path is not None and os.path.exists(path):
+                column = np.load(path, mmap_mode="r")
+            else:
+                column = compute_column(feature, events)
+                if path is not None:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    # Other processes may map the file, it only appears once complete
+                    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+                    with os.fdopen(fd, "wb") as f:
+                        np.save(f, column)
+                    os.replace(tmp, path)
+            column.flags.writeable = False
+            self._columns[name] = column
+
+    @property
+    def index(self) -> int:
+        """
+        The current row, the number of market data records replayed so far.
+        """
+        return self._cursor.position
+
+    def __getitem__(self, name: str) -> float:
+        return self._columns[name][self._cursor.position]
+
+    def at(self, name: str, index: int) -> float:
+        """
+        Value of a column at an earlier row. Rows are counted from the start of the
+        data, negative rows raise an IndexError instead of wrapping around to the end.
+        """
+        if index < 0:
+            raise IndexError(f"Row {index} of {name} is before the first row")
+        if index > self._cursor.position:
+            raise LookAheadError(
+                f"Row {index} of {name} is after the current row {self.index}"
+            )
+        return self._columns[name][index]
+
+    def history(self, name: str, n: int) -> np.ndarray:
+        """
+        The last n values of a column up to and including the current row, as a
+        read-only view.
+
+        :param n: (int) number of values, at least 1
+        """
+        if n < 1:
+            raise ValueError(f"The history of {name} needs at least one value, got {n}")
+        end = self._cursor.position + 1
+        return self._columns[name][max(end - n, 0) : end]
+
+    def to_dict(self) -> Dict[str, float]:
+        return {name: self[name] for name in self.features}
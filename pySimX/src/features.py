@@ -0,0 +1,455 @@
+"""
+Features of the market data that are updated while it is replayed.
+
+Instead of recomputing imbalance, microprice or trade flow from fetch_tob on every call,
+a strategy registers the features it needs on the exchange. Every feature is updated
+incrementally by the TOB and trade events of its symbol as the exchange applies them,
+and writes its current value into one column of a preallocated buffer, which strategies
+read without any computation:
+
+    exchange.add_feature(Microprice("BTCUSDT"))
+    ofi = exchange.add_feature(OrderFlowImbalance("BTCUSDT", halflife_us=1_000_000))
+    ...
+    values = exchange.features.values
+    if values[ofi] > 5:
+        ...
+
+An event only updates the features of its own symbol. Features see every event, so a
+symbol with features is neither batched nor fast-forwarded by the exchange.
+"""
+
+from typing import Dict, List, Tuple
+from collections import deque
+import numpy as np
+from sortedcontainers import SortedList
+
+from .data_types import TOB, EventKind
+from .utils.one_pass_calculations import _linear_scan, mean, var
+
+
+def _mid(market: TOB) -> float:
+    return (market.bp + market.ap) / 2
+
+
+def _microprice(market: TOB) -> float:
+    # Mid weighted towards the side with less quantity, where the price is more
+    # likely to move to
+    total = market.bq + market.aq
+    if total == 0:
+        return _mid(market)
+    return (market.bp * market.aq + market.ap * market.bq) / total
+
+
+def _imbalance(market: TOB) -> float:
+    total = market.bq + market.aq
+    return 0.0 if total == 0 else (market.bq - market.aq) / total
+
+
+# Values of a TOB that features can be computed on
+SOURCES = {
+    "mid": _mid,
+    "microprice": _microprice,
+    "imbalance": _imbalance,
+    "spread": lambda market: market.ap - market.bp,
+    "bid": lambda market: market.bp,
+    "ask": lambda market: market.ap,
+}
+
+
+def _microprice_column(rows: np.ndarray) -> np.ndarray:
+    total = rows["bq"] + rows["aq"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        micro = (rows["bp"] * rows["aq"] + rows["ap"] * rows["bq"]) / total
+    return np.where(total == 0, (rows["bp"] + rows["ap"]) / 2, micro)
+
+
+def _imbalance_column(rows: np.ndarray) -> np.ndarray:
+    total = rows["bq"] + rows["aq"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(total == 0, 0.0, (rows["bq"] - rows["aq"]) / total)
+
+
+# The same values computed over an array of TOB records at once
+SOURCE_COLUMNS = {
+    "mid": lambda rows: (rows["bp"] + rows["ap"]) / 2,
+    "microprice": _microprice_column,
+    "imbalance": _imbalance_column,
+    "spread": lambda rows: rows["ap"] - rows["bp"],
+    "bid": lambda rows: rows["bp"].astype(np.float64),
+    "ask": lambda rows: rows["ap"].astype(np.float64),
+}
+
+
+def _time_weights(ts: np.ndarray, lookback: int) -> np.ndarray:
+    # Weight of every update in one_pass_calculations.mean and var, the first update
+    # is weighted against timestamp 0
+    dt = np.diff(ts.astype(np.float64), prepend=0.0)
+    return np.minimum(dt / lookback, 1)
+
+
+class Feature:
+    """
+    Base of the features. A feature reacts to the TOB changes and/or the public trades
+    of one symbol and returns its new value on every update.
+    """
+
+    on_tob = False
+    on_trade = False
+
+    def __init__(self, symbol: str, name: str) -> None:
+        self.symbol = symbol
+        self.name = name
+
+    def reset(self) -> None:
+        """
+        Forget the state of a previous run.
+        """
+        pass
+
+    def update_tob(self, market: TOB, ts: int) -> float:
+        raise NotImplementedError
+
+    def update_trade(self, price: float, amount: float, side: int, ts: int) -> float:
+        raise NotImplementedError
+
+    def column(self, rows: np.ndarray) -> np.ndarray:
+        """
+        The values of all updates at once, see feature_columns.py.
+
+        :param rows: (np.ndarray) EVENT_DTYPE records of the symbol, the initial TOB
+        followed by the TOB updates for TOB features, the public trades otherwise
+        :return: (np.ndarray) the value after every record
+        """
+        raise NotImplementedError
+
+
+class TOBValue(Feature):
+    on_tob = True
+
+    def __init__(self, symbol: str, source: str = "mid", name: str = None) -> None:
+        """
+        A value of the current TOB, one of the SOURCES.
+        """
+        super().__init__(symbol, f"{symbol}_{source}" if name is None else name)
+        self.source = source
+        self._value = SOURCES[source]
+
+    def update_tob(self, market: TOB, ts: int) -> float:
+        return self._value(market)
+
+    def column(self, rows: np.ndarray) -> np.ndarray:
+        return SOURCE_COLUMNS[self.source](rows)
+
+
+class Microprice(TOBValue):
+    def __init__(self, symbol: str, name: str = None) -> None:
+        super().__init__(symbol, "microprice", name)
+
+
+class Spread(TOBValue):
+    def __init__(self, symbol: str, name: str = None) -> None:
+        super().__init__(symbol, "spread", name)
+
+
+class Imbalance(TOBValue):
+    def __init__(self, symbol: str, name: str = None) -> None:
+        """
+        (bid quantity - ask quantity) / (bid quantity + ask quantity)
+        """
+        super().__init__(symbol, "imbalance", name)
+
+
+class OrderFlowImbalance(Feature):
+    on_tob = True
+
+    def __init__(self, symbol: str, halflife_us: int, name: str = None) -> None:
+        """
+        Order flow imbalance of the TOB updates (Cont, Kukanov & Stoikov): quantity
+        added to the bid or removed from the ask counts as buying pressure, the
+        opposite as selling pressure. The flow of every update is summed with an
+        exponential decay.
+
+        :param halflife_us: (int) time after which the flow of an update counts half
+        """
+        super().__init__(symbol, f"{symbol}_ofi" if name is None else name)
+        self.halflife_us = halflife_us
+        self.reset()
+
+    def reset(self) -> None:
+        self._flow = 0.0
+        self._last = None
+        self._last_ts = 0
+
+    def update_tob(self, market: TOB, ts: int) -> float:
+        bq, bp, ap, aq = market.bq, market.bp, market.ap, market.aq
+        if self._last is not None:
+            last_bq, last_bp, last_ap, last_aq = self._last
+            flow = 0.0
+            if bp >= last_bp:
+                flow += bq
+            if bp <= last_bp:
+                flow -= last_bq
+            if ap <= last_ap:
+                flow -= aq
+            if ap >= last_ap:
+                flow += last_aq
+            decay = 0.5 ** ((ts - self._last_ts) / self.halflife_us)
+            self._flow = self._flow * decay + flow
+        self._last = (bq, bp, ap, aq)
+        self._last_ts = ts
+        return self._flow
+
+    def column(self, rows: np.ndarray) -> np.ndarray:
+        bq, bp, ap, aq = rows["bq"], rows["bp"], rows["ap"], rows["aq"]
+        flow = np.zeros(len(rows))
+        flow[1:] = (
+            np.where(bp[1:] >= bp[:-1], bq[1:], 0)
+            - np.where(bp[1:] <= bp[:-1], bq[:-1], 0)
+            - np.where(ap[1:] <= ap[:-1], aq[1:], 0)
+            + np.where(ap[1:] >= ap[:-1], aq[:-1], 0)
+        )
+        decay = 0.5 ** (np.diff(rows["ts"], prepend=rows["ts"][:1]) / self.halflife_us)
+        return _linear_scan(decay, flow, 0.0)
+
+
+class EMA(Feature):
+    on_tob = True
+
+    def __init__(
+        self, symbol: str, lookback_us: int, source: str = "mid", name: str = None
+    ) -> None:
+        """
+        Time weighted EMA of a TOB value, see one_pass_calculations.mean.
+        """
+        super().__init__(
+            symbol, f"{symbol}_{source}_ema_{lookback_us}" if name is None else name
+        )
+        self.lookback_us = lookback_us
+        self.source = source
+        self._value = SOURCES[source]
+        self.reset()
+
+    def reset(self) -> None:
+        self._mean = mean(self.lookback_us)
+
+    def update_tob(self, market: TOB, ts: int) -> float:
+        return self._mean.update(self._value(market), ts)
+
+    def column(self, rows: np.ndarray) -> np.ndarray:
+        x = SOURCE_COLUMNS[self.source](rows)
+        weight = _time_weights(rows["ts"], self.lookback_us)
+        # The first value is the start of the mean
+        return _linear_scan(1 - weight, weight * x, x[0])
+
+
+class Variance(Feature):
+    on_tob = True
+
+    def __init__(
+        self, symbol: str, lookback_us: int, source: str = "mid", name: str = None
+    ) -> None:
+        """
+        Time weighted variance of the returns of a TOB value, see
+        one_pass_calculations.var.
+        """
+        super().__init__(
+            symbol, f"{symbol}_{source}_var_{lookback_us}" if name is None else name
+        )
+        self.lookback_us = lookback_us
+        self.source = source
+        self._value = SOURCES[source]
+        self.reset()
+
+    def reset(self) -> None:
+        self._var = var(self.lookback_us, calculate_ema=True, calculate_pct_change=True)
+
+    def update_tob(self, market: TOB, ts: int) -> float:
+        return self._var.update(self._value(market), ts)
+
+    def column(self, rows: np.ndarray) -> np.ndarray:
+        x = SOURCE_COLUMNS[self.source](rows)
+        change = np.zeros(len(x))
+        change[1:] = x[1:] / x[:-1] - 1
+        weight = _time_weights(rows["ts"], self.lookback_us)
+        ema = _linear_scan(1 - weight, weight * change, 0.0)
+        # var starts at 1 like one_pass_calculations.var
+        return _linear_scan(1 - weight, weight * (change - ema) ** 2, 1.0)
+
+
+class TradeVolume(Feature):
+    on_trade = True
+
+    def __init__(
+        self, symbol: str, window_us: int, signed: bool = False, name: str = None
+    ) -> None:
+        """
+        Volume of the public trades of the last window_us.
+
+        :param signed: (bool) buys count positive and sells negative, i.e. the trade
+        flow of the window
+        """
+        kind = "flow" if signed else "volume"
+        super().__init__(
+            symbol, f"{symbol}_trade_{kind}_{window_us}" if name is None else name
+        )
+        self.window_us = window_us
+        self.signed = signed
+        self.reset()
+
+    def reset(self) -> None:
+        self._sum = 0.0
+        self._window = deque()
+
+    def update_trade(self, price: float, amount: float, side: int, ts: int) -> float:
+        if self.signed and not side:
+            amount = -amount
+        window = self._window
+        window.append((ts, amount))
+        self._sum += amount
+        # Every trade enters and leaves the window once
+        while window[0][0] <= ts - self.window_us:
+            self._sum -= window.popleft()[1]
+        return self._sum
+
+    def column(self, rows: np.ndarray) -> np.ndarray:
+        amount = rows["amount"].astype(np.float64)
+        if self.signed:
+            amount = np.where(rows["side"] == 1, amount, -amount)
+        total = np.concatenate([[0.0], np.cumsum(amount)])
+        # First trade that is still in the window of every trade
+        start = np.searchsorted(rows["ts"], rows["ts"] - self.window_us, side="right")
+        return total[1:] - total[start]
+
+
+class RollingQuantile(Feature):
+    on_tob = True
+    # Number of window values column partitions at once, bounds its memory
+    block = 1 << 22
+
+    def __init__(
+        self,
+        symbol: str,
+        q: float,
+        window: int,
+        source: str = "mid",
+        name: str = None,
+    ) -> None:
+        """
+        Quantile of a TOB value over the last `window` updates. The values of the window
+        are kept sorted, an update costs O(log window).
+
+        :param q: (float) quantile between 0 and 1
+        """
+        super().__init__(
+            symbol, f"{symbol}_{source}_q{q}_{window}" if name is None else name
+        )
+        self.q = q
+        self.window = window
+        self.source = source
+        self._value = SOURCES[source]
+        self.reset()
+
+    def reset(self) -> None:
+        self._sorted = SortedList()
+        self._values = deque()
+
+    def update_tob(self, market: TOB, ts: int) -> float:
+        value = self._value(market)
+        self._values.append(value)
+        self._sorted.add(value)
+        if len(self._values) > self.window:
+            self._sorted.remove(self._values.popleft())
+        return self._sorted[int(self.q * (len(self._sorted) - 1))]
+
+    def column(self, rows: np.ndarray) -> np.ndarray:
+        x = SOURCE_COLUMNS[self.source](rows)
+        out = np.zeros(len(x))
+        # The windows that are not full yet
+        head = SortedList()
+        for i in range(min(self.window - 1, len(x))):
+            head.add(x[i])
+            out[i] = head[int(self.q * i)]
+        if len(x) >= self.window:
+            k = int(self.q * (self.window - 1))
+            windows = np.lib.stride_tricks.sliding_window_view(x, self.window)
+            # np.partition copies the windows, a block of them at a time bounds the copy
+            # to about block values
+            step = max(self.block // self.window, 1)
+            for start in range(0, len(windows), step):
+                end = start + self.window - 1
+                out[end : end + step] = np.partition(
+                    windows[start : start + step], k, axis=1
+                )[:, k]
+        return out
+
+
+class FeaturePipeline:
+    def __init__(self) -> None:
+        """
+        The features of an exchange and the buffer with their current values.
+        """
+        self.features = []
+        # Current value of every feature, NaN until its first update
+        self.values = np.zeros(0, dtype=np.float64)
+        self.columns = {}
+        # symbol -> [(column, feature)] of the features updated by TOB / trades
+        self._tob: Dict[str, List[Tuple[int, Feature]]] = {}
+        self._trade: Dict[str, List[Tuple[int, Feature]]] = {}
+        # Symbols with at least one feature
+        self.symbols = set()
+
+    def __len__(self) -> int:
+        return len(self.features)
+
+    def __getitem__(self, name: str) -> float:
+        return self.values[self.columns[name]]
+
+    def add(self, feature: Feature) -> int:
+        """
+        Register a feature.
+
+        :return: (int) column of the feature in values
+        """
+        if feature.name in self.columns:
+            raise ValueError(f"A feature named {feature.name} is already registered")
+
+        column = len(self.features)
+        self.features.append(feature)
+        self.columns[feature.name] = column
+        self.values = np.append(self.values, np.nan)
+        self.symbols.add(feature.symbol)
+        if feature.on_tob:
+            self._tob.setdefault(feature.symbol, []).append((column, feature))
+        if feature.on_trade:
+            self._trade.setdefault(feature.symbol, []).append((column, feature))
+        return column
+
+    def reset(self) -> None:
+        self.values[:] = np.nan
+        for feature in self.features:
+            feature.reset()
+
+    def update_tob(self, symbol: str, market: TOB, ts: int) -> None:
+        features = self._tob.get(symbol)
+        # A book with an empty side has no TOB to update the features with
+        if features is not None and market.bp == market.bp and market.ap == market.ap:
+            values = self.values
+            for column, feature in features:
+                values[column] = feature.update_tob(market, ts)
+
+    def update(self, row: tuple, ts: int, symbol: str, market: TOB) -> None:
+        """
+        Called by the exchange after it applied a market data event.
+        """
+        if row[2] != EventKind.TRADE:
+            self.update_tob(symbol, market, ts)
+            return
+
+        features = self._trade.get(symbol)
+        if features is not None:
+            values = self.values
+            for column, feature in features:
+                values[column] = feature.update_trade(row[8], row[9], row[3], ts)
+
+    def to_dict(self) -> Dict[str, float]:
+        return {name: self.values[i] for name, i in self.columns.items()}
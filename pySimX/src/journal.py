@@ -0,0 +1,85 @@
+"""
+Structured journal of what happens to the orders of a backtest.
+
+Instead of formatting a log message for every order and trade, the exchange writes a
+fixed-size record into a preallocated ring buffer. If the exchange has no journal
+nothing is recorded at all. After the run, the records can be turned into a DataFrame
+or written to disk.
+"""
+
+from enum import IntEnum
+import numpy as np
+import pandas as pd
+
+
+class JournalKind(IntEnum):
+    OPEN = 0
+    MODIFY = 1
+    CANCEL = 2
+    CANCEL_FAILED = 3
+    REJECT = 4
+    FILL = 5
+    MODIFY_FAILED = 6
+
+
+JOURNAL_DTYPE = np.dtype(
+    [
+        ("ts", np.int64),
+        ("kind", np.int8),
+        ("order_id", np.int64),
+        ("price", np.float64),
+        ("amount", np.float64),
+    ]
+)
+
+
+class Journal:
+    def __init__(self, capacity: int = 1_000_000) -> None:
+        """
+        :param capacity: (int) number of records kept, the oldest records are
+        overwritten once the buffer is full.
+        """
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=JOURNAL_DTYPE)
+        self._count = 0
+
+    def __len__(self) -> int:
+        return min(self._count, self.capacity)
+
+    def record(
+        self, ts: int, kind: JournalKind, order_id: int, price: float, amount: float
+    ) -> None:
+        self._data[self._count % self.capacity] = (ts, kind, order_id, price, amount)
+        self._count += 1
+
+    def clear(self) -> None:
+        self._count = 0
+
+    @property
+    def dropped(self) -> int:
+        """
+        Number of records that were overwritten because the buffer was full.
+        """
+        return max(self._count - self.capacity, 0)
+
+    def to_numpy(self) -> np.ndarray:
+        """
+        The records in the order they were written.
+        """
+        if self._count <= self.capacity:
+            return self._data[: self._count].copy()
+        start = self._count % self.capacity
+        return np.concatenate([self._data[start:], self._data[:start]])
+
+    def to_dataframe(self) -> pd.DataFrame:
+        df = pd.DataFrame(self.to_numpy())
+        df["kind"] = pd.Categorical.from_codes(
+            df["kind"], categories=[kind.name for kind in JournalKind]
+        )
+        return df
+
+    def save(self, path: str) -> None:
+        """
+        Write the records to a .npy file.
+        """
+        np.save(path, self.to_numpy())
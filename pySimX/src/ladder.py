@@ -0,0 +1,250 @@
+"""
+Aggregated L2 depth of a market in a price ladder.
+
+The amount of every price level is stored in a NumPy array per side, indexed by the
+price in ticks relative to an offset. A book update is a single array write and the
+best bid and ask are kept as indices into the arrays, so replaying the updates does not
+allocate any python objects. The ladder starts around the first price it sees and grows
+when a price falls outside of it.
+"""
+
+from typing import Tuple
+from decimal import Decimal
+import math
+import numpy as np
+
+
+class BookLadder:
+    def __init__(self, tick_size: float, size: int = 4096) -> None:
+        """
+        :param tick_size: (float) price increment of the market
+        :param size: (int) initial number of ticks covered per side
+        """
+        self.tick_size = tick_size
+        self._inverse = 1 / tick_size
+        # Prices are rounded to the decimals of the tick size, so a price rebuilt from
+        # its tick is the same float as the one parsed from the data
+        self._decimals = max(0, -Decimal(str(tick_size)).as_tuple().exponent)
+        self.clear(size)
+
+    def clear(self, size: int = None) -> None:
+        """
+        Remove all levels.
+        """
+        size = len(self.bids) if size is None else size
+        self.bids = np.zeros(size, dtype=np.float64)
+        self.asks = np.zeros(size, dtype=np.float64)
+        self.offset = None
+        # Index of the best level, -1 and size if the side is empty
+        self.best_bid = -1
+        self.best_ask = size
+
+    def tick(self, price: float) -> int:
+        return int(round(price * self._inverse))
+
+    def price(self, index: int) -> float:
+        """
+        Price of the level at an index of the arrays.
+        """
+        return round((index + self.offset) * self.tick_size, self._decimals)
+
+    def round_price(self, price: float) -> float:
+        """
+        Round a price to the closest tick.
+        """
+        return round(self.tick(price) * self.tick_size, self._decimals)
+
+    def index(self, price: float) -> int:
+        """
+        Index of a price in the arrays, the ladder grows if the price is outside.
+        """
+        tick = self.tick(price)
+        if self.offset is None:
+            self.offset = tick - len(self.bids) // 2
+        i = tick - self.offset
+        if i < 0 or i >= len(self.bids):
+            self._grow(i)
+            i = tick - self.offset
+        return i
+
+    def _grow(self, i: int) -> None:
+        size = len(self.bids)
+        low = min(i, 0)
+        high = max(i + 1, size)
+        new_size = max(2 * size, 2 * (high - low))
+        shift = (new_size - (high - low)) // 2 - low
+
+        for name in ["bids", "asks"]:
+            grown = np.zeros(new_size, dtype=np.float64)
+            grown[shift : shift + size] = getattr(self, name)
+            setattr(self, name, grown)
+
+        self.offset -= shift
+        if self.best_bid >= 0:
+            self.best_bid += shift
+        self.best_ask = self.best_ask + shift if self.best_ask < size else new_size
+
+    def update(self, side: bool, price: float, amount: float) -> bool:
+        """
+        Set the total amount of a price level, 0 removes the level.
+
+        :param side: (bool) 1 for the bid, 0 for the ask
+        :return: (bool) True if the top of the book changed
+        """
+        i = self.index(price)
+        if side:
+            self.bids[i] = amount
+            if amount > 0:
+                if i >= self.best_bid:
+                    self.best_bid = i
+                    return True
+            elif i == self.best_bid:
+                self.best_bid = self._next_bid(i)
+                return True
+        else:
+            self.asks[i] = amount
+            if amount > 0:
+                if i <= self.best_ask:
+                    self.best_ask = i
+                    return True
+            elif i == self.best_ask:
+                self.best_ask = self._next_ask(i)
+                return True
+        return False
+
+    def update_many(
+        self, side: np.ndarray, price: np.ndarray, amount: np.ndarray
+    ) -> None:
+        """
+        Apply a batch of updates at once. If a level is updated several times, the last
+        update is the one that counts.
+        """
+        if len(price) == 0:
+            return
+        ticks = np.rint(price * self._inverse).astype(np.int64)
+        self.index(float(price[np.argmin(ticks)]))
+        self.index(float(price[np.argmax(ticks)]))
+        indices = ticks - self.offset
+
+        for value, levels in [(1, self.bids), (0, self.asks)]:
+            own = side == value
+            if not own.any():
+                continue
+            # The first occurrence in the reversed updates is the last update of a level
+            reversed_indices = indices[own][::-1]
+            unique, first = np.unique(reversed_indices, return_index=True)
+            levels[unique] = amount[own][::-1][first]
+
+        bids = np.flatnonzero(self.bids)
+        asks = np.flatnonzero(self.asks)
+        self.best_bid = int(bids[-1]) if len(bids) > 0 else -1
+        self.best_ask = int(asks[0]) if len(asks) > 0 else len(self.asks)
+
+    def _next_bid(self, i: int) -> int:
+        # Scan below the removed level in growing windows
+        window = 64
+        while i > 0:
+            start = max(i - window, 0)
+            levels = np.flatnonzero(self.bids[start:i])
+            if len(levels) > 0:
+                return start + int(levels[-1])
+            i = start
+            window *= 4
+        return -1
+
+    def _next_ask(self, i: int) -> int:
+        window = 64
+        size = len(self.asks)
+        i += 1
+        while i < size:
+            levels = np.flatnonzero(self.asks[i : i + window])
+            if len(levels) > 0:
+                return i + int(levels[0])
+            i += window
+            window *= 4
+        return size
+
+    def amount(self, side: bool, price: float) -> float:
+        """
+        Total amount of a price level.
+        """
+        if self.offset is None:
+            return 0.0
+        i = self.tick(price) - self.offset
+        if i < 0 or i >= len(self.bids):
+            return 0.0
+        return float(self.bids[i] if side else self.asks[i])
+
+    def top(self) -> Tuple[float, float, float, float]:
+        """
+        :return: (Tuple) bid amount, bid price, ask price and ask amount of the top of
+        the book, NaN for an empty side
+        """
+        if self.best_bid >= 0:
+            bq, bp = float(self.bids[self.best_bid]), self.price(self.best_bid)
+        else:
+            bq, bp = 0.0, math.nan
+        if self.best_ask < len(self.asks):
+            aq, ap = float(self.asks[self.best_ask]), self.price(self.best_ask)
+        else:
+            aq, ap = 0.0, math.nan
+        return bq, bp, ap, aq
+
+    def depth(self, side: bool, levels: int = 10) -> np.ndarray:
+        """
+        The best levels of a side.
+
+        :return: (np.ndarray) array of shape (levels, 2) with price and amount, best first
+        """
+        if side:
+            indices = np.flatnonzero(self.bids[: self.best_bid + 1])[::-1][:levels]
+            amounts = self.bids[indices]
+        else:
+            indices = np.flatnonzero(self.asks[self.best_ask :])[:levels]
+            indices = indices + self.best_ask
+            amounts = self.asks[indices]
+        if len(indices) == 0:
+            return np.zeros((0, 2))
+        prices = np.round((indices + self.offset) * self.tick_size, self._decimals)
+        return np.column_stack([prices, amounts])
+
+    def take(
+        self, side: bool, amount: float, limit: int = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Walk the book to fill an aggressive order and remove the liquidity it takes.
+        A buy takes from the asks, a sell from the bids.
+
+        :param side: (bool) side of the aggressive order, 1 for a buy
+        :param amount: (float) amount to fill
+        :param limit: (int) worst price the order accepts in ticks, no limit if None
+
+        :return: (Tuple[np.ndarray, np.ndarray]) prices and amounts filled per level,
+        they sum up to less than amount if the book is not deep enough
+        """
+        prices = []
+        amounts = []
+        while amount > 0:
+            if side:
+                i = self.best_ask
+                if i >= len(self.asks):
+                    break
+                levels = self.asks
+            else:
+                i = self.best_bid
+                if i < 0:
+                    break
+                levels = self.bids
+
+            tick = i + self.offset
+            if limit is not None and (tick > limit if side else tick < limit):
+                break
+
+            price = self.price(i)
+            filled = min(amount, float(levels[i]))
+            prices.append(price)
+            amounts.append(filled)
+            amount -= filled
+            self.update(not side, price, float(levels[i]) - filled)
+
+        return np.array(prices), np.array(amounts)
@@ -1,12 +1,44 @@
 import numpy as np
+from typing import Optional
 
 
 class Latency:
-    def __init__(self) -> None:
-        pass
+    def __init__(self, seed: Optional[int] = None, block_size: int = 65_536) -> None:
+        """
+        Base class of the latency models. Samples are drawn from a generator of the
+        model in blocks of block_size and handed out one at a time by estimate, so a
+        single message does not cost a full NumPy call.
+
+        :param seed: (int) seed of the generator, runs with the same seed are reproducible
+        :param block_size: (int) number of samples drawn at once
+        """
+        self.block_size = block_size
+        self.seed(seed)
+
+    def seed(self, seed: Optional[int] = None) -> None:
+        """
+        Reset the generator of the model with a new seed.
+        """
+        self.rng = np.random.default_rng(seed)
+        self._block = []
+        self._index = 0
+
+    def _sample(self, n: int) -> np.ndarray:
+        raise NotImplementedError
 
     def estimate(self) -> float:
-        pass
+        if self._index >= len(self._block):
+            self._block = self._sample(self.block_size).tolist()
+            self._index = 0
+        value = self._block[self._index]
+        self._index += 1
+        return value
+
+    def estimate_many(self, n: int) -> np.ndarray:
+        """
+        Draw n latencies at once.
+        """
+        return self._sample(n)
 
 
 class ConstantLatency(Latency):
@@ -14,16 +46,21 @@ class ConstantLatency(Latency):
         super().__init__()
         self.latency = latency
 
+    def _sample(self, n: int) -> np.ndarray:
+        return np.full(n, self.latency, dtype=np.float64)
+
     def estimate(self) -> float:
         return self.latency
 
 
 class LogNormalLatency(Latency):
-    def __init__(self, mean, sigma) -> None:
-        super().__init__()
+    def __init__(
+        self, mean, sigma, seed: Optional[int] = None, block_size: int = 65_536
+    ) -> None:
+        super().__init__(seed=seed, block_size=block_size)
 
         self.mean = mean
         self.sigma = sigma
 
-    def estimate(self) -> float:
-        return np.random.lognormal(0, self.sigma, 1)[0] * self.mean
+    def _sample(self, n: int) -> np.ndarray:
+        return self.rng.lognormal(0, self.sigma, n) * self.mean
@@ -1,5 +1,33 @@
-from sortedcontainers import SortedDict
-from .data_types import Order, Trade, Level, TOB
+"""
+Price-time priority matching engine.
+
+Prices are integer ticks. Every side of the book is a ladder indexed by the tick
+relative to an offset, which stores the first and last order of every level and the
+total amount resting on it. The orders of a level form an intrusive FIFO queue: the
+orders live in slots of a pool of parallel lists (next, previous, amount, ...) and a
+level only points to its first and last slot. Adding, cancelling and matching an order
+are O(1) apart from finding the next best level once one is emptied, which is a
+vectorized scan over an occupancy array.
+
+OrderBook.add and OrderBook.cancel are the low-level interface working with ids, sides,
+ticks and amounts. Fills are appended to OrderBook.fills as
+(maker_id, taker_id, tick, amount). add_order and cancel_order wrap them for Order
+objects and return Trades.
+
+The target of one million operations per second only holds for the low-level
+interface, and there only for adds: in the benchmark suite (python -m pySimX.benchmarks)
+add reaches 1.0-1.5M/s and cancel about 0.65M/s on one core, as a cancel touches the
+pool at a random slot. add_order and cancel_order also update the Orders and build the
+Trades, they reach about 0.5-0.6M/s and are not expected to meet the target.
+"""
+
+from typing import List, Optional
+from decimal import Decimal
+import numpy as np
+
+from .data_types import Order, OrderStatus, Trade, TOB
+
+EMPTY = -1
 
 
 class TOBMatcher:
@@ -7,114 +35,369 @@ class TOBMatcher:
         self.top_bid = tob.bp
         self.top_ask = tob.ap
 
-    def is_match_possible(self, order: Order):
-        if order.side and order.price >= self.top_ask:
-            print("executed maker")
-
-        elif not order.side and order.price <= self.top_bid:
-            print("executed")
+    def is_match_possible(self, order: Order) -> bool:
+        if order.side:
+            return order.price >= self.top_ask
+        return order.price <= self.top_bid
 
 
 class OrderBook:
-    def __init__(self):
-        self.bids = SortedDict()
-        self.asks = SortedDict()
-
-    def process_match(self, maker: Order, taker: Order):
-        # If the taker is bigger than the maker
-        if taker.remainingAmount > maker.remainingAmount:
-            # Notify maker trade
-            maker_trade = Trade(
-                maker.order_id,
-                maker.side,
-                False,
-                maker.remainingAmount,
-                maker.price,
-                maker.entryTime,
-                10,
-            )
-            # Notify Taker Trade
-            taker_trade = Trade(
-                taker.order_id,
-                taker.side,
-                True,
-                maker.remainingAmount,
-                maker.price,
-                taker.entryTime,
-                10,
-            )
+    def __init__(
+        self, tick_size: float = 0.01, size: int = 4096, capacity: int = 1024
+    ) -> None:
+        """
+        :param tick_size: (float) price increment, used to convert prices of Orders
+        :param size: (int) initial number of ticks covered by the ladder
+        :param capacity: (int) initial number of order slots
+        """
+        self.tick_size = tick_size
+        self._decimals = max(0, -Decimal(str(tick_size)).as_tuple().exponent)
+        self.size = size
+        self.offset = None
 
-            print(f"Trade executed: {maker_trade}")
-            print(f"Trade executed: {taker_trade}")
+        # Ladder per side (0 ask, 1 bid): first and last slot and total amount of every
+        # level, plus an occupancy bytearray that is scanned through a NumPy view to
+        # find the next best level
+        self._head = [[EMPTY] * size, [EMPTY] * size]
+        self._tail = [[EMPTY] * size, [EMPTY] * size]
+        self._total = [[0.0] * size, [0.0] * size]
+        self._used = [bytearray(size), bytearray(size)]
 
-            # Adjust the order size of the taker
-            taker.remainingAmount -= maker.remainingAmount
-            # And remove the maker
-            self.cancel_order(maker)
+        # Index of the best level, size and -1 if the side is empty
+        self._best = [size, EMPTY]
 
-        # if the taker cannot knock-out the maker
-        else:
-            # Adjust the amount of the maker
-            maker.remainingAmount -= taker.remainingAmount
-            # Put the taker to 0. No need to remove since its not added
-            taker.remainingAmount = 0
-            # If the amounts were exactly equal, we remove the maker
-            if maker.remainingAmount == 0:
-                self.cancel_order(maker)
-
-    def add_order(self, order: Order) -> None:
-        # Define the base tree where the order belongs to and the opposite one
-        tree = self.bids if order.side else self.asks
-        o_tree = self.asks if order.side else self.bids
-
-        # if we have an open amount, the side is not empty and our order price is more competitive than the tob
-        while order.remainingAmount > 0 and o_tree and self.is_match_possible(order):
-            # Get the Level information of the top level from the opposite side
-            tob = o_tree.peekitem(0)[1] if order.side else o_tree.peekitem(-1)[1]
-
-            # Get order_id and the order of the top level
-            matching_order_id, matching_order = next(iter(tob.orders.items()))
-
-            self.process_match(matching_order, order)
-
-        # If the order still has a amount left over, add it to the orderbook
-        if order.remainingAmount > 0:
-            print(
-                f"Adding order {order.order_id}. {order.remainingAmount}@{order.price}"
+        # Pool of order slots
+        self._next = [EMPTY] * capacity
+        self._prev = [EMPTY] * capacity
+        self._amount = [0.0] * capacity
+        self._index = [0] * capacity
+        self._side = [0] * capacity
+        self._id = [0] * capacity
+        self._order = [None] * capacity
+        self._free = list(range(capacity - 1, -1, -1))
+        self._slots = {}
+
+        self.fills = []
+        self._makers = []
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def tick(self, price: float) -> int:
+        return int(round(price / self.tick_size))
+
+    def price(self, tick: int) -> float:
+        return round(tick * self.tick_size, self._decimals)
+
+    def _level(self, tick: int) -> int:
+        # Index of a tick in the ladder, recenter the ladder if it is outside
+        if self.offset is None:
+            self.offset = tick - self.size // 2
+        i = tick - self.offset
+        if i < 0 or i >= self.size:
+            self._grow(i)
+            i = tick - self.offset
+        return i
+
+    def _grow(self, i: int) -> None:
+        size = self.size
+        low = min(i, 0)
+        high = max(i + 1, size)
+        new_size = max(2 * size, 2 * (high - low))
+        shift = (new_size - (high - low)) // 2 - low
+        before = [EMPTY] * shift
+        after = [EMPTY] * (new_size - size - shift)
+
+        for side in [0, 1]:
+            self._head[side] = before + self._head[side] + after
+            self._tail[side] = before + self._tail[side] + after
+            self._total[side] = [0.0] * shift + self._total[side] + [0.0] * len(after)
+            self._used[side] = (
+                bytearray(shift) + self._used[side] + bytearray(len(after))
             )
-            # Add a level. Setdefault already checks if it exists or not.
-            limit_level = tree.setdefault(order.price, Level(order.price))
-            # Add one to the size of how many orders are there and the amount on the level
-            limit_level.size += 1
-            limit_level.totalAmount += order.remainingAmount
-            # Finally we add the order by the order_id to the level
-            limit_level.orders[order.order_id] = order
-            # the level here is then the limit_level under which the order is
-            order.parentLevel = limit_level
-
-    def is_match_possible(self, order: Order):
-        # If the order is a bid, check if the price is higher or equal the top ask
-        if order.side:
-            return order.price >= self.best_ask()
+
+        for slot in self._slots.values():
+            self._index[slot] += shift
+
+        self.offset -= shift
+        self._best[0] = self._best[0] + shift if self._best[0] < size else new_size
+        if self._best[1] != EMPTY:
+            self._best[1] += shift
+        self.size = new_size
+
+    def _next_level(self, side: int, i: int) -> int:
+        # Scan away from the emptied level in growing windows
+        used = np.frombuffer(self._used[side], dtype=np.uint8)
+        window = 64
+        if side:
+            while i > 0:
+                start = max(i - window, 0)
+                levels = np.flatnonzero(used[start:i])
+                if len(levels) > 0:
+                    return start + int(levels[-1])
+                i = start
+                window *= 4
+            return EMPTY
+        i += 1
+        while i < self.size:
+            levels = np.flatnonzero(used[i : i + window])
+            if len(levels) > 0:
+                return i + int(levels[0])
+            i += window
+            window *= 4
+        return self.size
+
+    def _allocate(self) -> int:
+        if not self._free:
+            n = len(self._next)
+            self._next.extend([EMPTY] * n)
+            self._prev.extend([EMPTY] * n)
+            self._amount.extend([0.0] * n)
+            self._index.extend([0] * n)
+            self._side.extend([0] * n)
+            self._id.extend([0] * n)
+            self._order.extend([None] * n)
+            self._free.extend(range(2 * n - 1, n - 1, -1))
+        return self._free.pop()
+
+    def _unlink(self, slot: int) -> None:
+        # Remove a slot from the queue of its level and free it, the caller removes it
+        # from self._slots
+        side = self._side[slot]
+        i = self._index[slot]
+        prev = self._prev[slot]
+        following = self._next[slot]
+
+        if prev == EMPTY:
+            if following == EMPTY:
+                # Last order of the level
+                self._head[side][i] = EMPTY
+                self._tail[side][i] = EMPTY
+                self._total[side][i] = 0.0
+                self._used[side][i] = 0
+                if self._best[side] == i:
+                    self._best[side] = self._next_level(side, i)
+            else:
+                self._head[side][i] = following
+                self._prev[following] = EMPTY
+                self._total[side][i] -= self._amount[slot]
         else:
-            return order.price <= self.best_bid()
-
-    def cancel_order(self, order: Order):
-        tree = self.bids if order.side else self.asks
-        limit_level = tree[order.price]
-        del limit_level.orders[order.order_id]
-        limit_level.size -= 1
-        if limit_level.size == 0:
-            del tree[order.price]
-
-    def best_bid(self):
-        if self.bids:
-            return self.bids.peekitem(-1)[0]
+            self._next[prev] = following
+            if following == EMPTY:
+                self._tail[side][i] = prev
+            else:
+                self._prev[following] = prev
+            self._total[side][i] -= self._amount[slot]
+
+        # The Order of the slot is only released when the slot is reused, clearing it
+        # costs another random memory access per cancel
+        self._free.append(slot)
+
+    def _match(
+        self, order_id: int, side: int, i: int, amount: float, order: Optional[Order]
+    ) -> float:
+        # Take the liquidity of the opposite side as long as the price allows it. For
+        # an Order the filled makers are collected in self._makers.
+        other = 1 - side
+        best = self._best[other]
+        head = self._head[other]
+        amounts = self._amount
+        fills = self.fills
+        makers = self._makers = []
+        while amount > 0 and (best <= i if side else best != EMPTY and best >= i):
+            slot = head[best]
+            maker = amounts[slot]
+            if order is not None:
+                makers.append(self._order[slot])
+            if maker <= amount:
+                amount -= maker
+                fills.append((self._id[slot], order_id, best + self.offset, maker))
+                del self._slots[self._id[slot]]
+                self._unlink(slot)
+                best = self._best[other]
+            else:
+                amounts[slot] = maker - amount
+                self._total[other][best] -= amount
+                fills.append((self._id[slot], order_id, best + self.offset, amount))
+                amount = 0.0
+        return amount
+
+    def add(
+        self,
+        order_id: int,
+        side: int,
+        tick: int,
+        amount: float,
+        order: Optional[Order] = None,
+    ) -> float:
+        """
+        Match an order against the opposite side and rest what is left.
+
+        :param order_id: (int) unique id of the order
+        :param side: (int) 1 for a buy, 0 for a sell
+        :param tick: (int) limit price in ticks
+        :param amount: (float) amount of the order
+        :param order: (Order) the Order the id belongs to, if any
+
+        :return: (float) the amount that was not filled and rests in the book
+        """
+        i = EMPTY if self.offset is None else tick - self.offset
+        if i < 0 or i >= self.size:
+            i = self._level(tick)
+
+        best = self._best
+        if best[0] <= i if side else best[1] != EMPTY and best[1] >= i:
+            amount = self._match(order_id, side, i, amount, order)
+            if amount <= 0:
+                return amount
+
+        # Rest what is left at the end of the queue of the level
+        slot = self._free.pop() if self._free else self._allocate()
+        self._slots[order_id] = slot
+        self._id[slot] = order_id
+        self._order[slot] = order
+        self._side[slot] = side
+        self._index[slot] = i
+        self._amount[slot] = amount
+        self._next[slot] = EMPTY
+
+        tails = self._tail[side]
+        tail = tails[i]
+        self._prev[slot] = tail
+        tails[i] = slot
+        if tail == EMPTY:
+            self._head[side][i] = slot
+            self._total[side][i] = amount
+            self._used[side][i] = 1
+            if i > best[1] if side else i < best[0]:
+                best[side] = i
         else:
+            self._next[tail] = slot
+            self._total[side][i] += amount
+        return amount
+
+    def cancel(self, order_id: int) -> bool:
+        """
+        Remove a resting order.
+
+        :return: (bool) False if the order is not in the book
+        """
+        slot = self._slots.pop(order_id, None)
+        if slot is None:
+            return False
+        self._unlink(slot)
+        return True
+
+    def amount(self, order_id: int) -> float:
+        """
+        Remaining amount of a resting order, 0 if it is not in the book.
+        """
+        slot = self._slots.get(order_id)
+        return 0.0 if slot is None else self._amount[slot]
+
+    def best_bid(self) -> Optional[float]:
+        if self._best[1] == EMPTY:
             return None
+        return self.price(self._best[1] + self.offset)
 
-    def best_ask(self):
-        if self.asks:
-            return self.asks.peekitem(0)[0]
-        else:
+    def best_ask(self) -> Optional[float]:
+        if self._best[0] >= self.size:
             return None
+        return self.price(self._best[0] + self.offset)
+
+    def depth(self, side: int, levels: int = 10) -> np.ndarray:
+        """
+        The best levels of a side.
+
+        :return: (np.ndarray) array of shape (levels, 2) with price and amount, best first
+        """
+        used = np.flatnonzero(np.frombuffer(self._used[side], dtype=np.uint8))
+        used = used[::-1][:levels] if side else used[:levels]
+        total = self._total[side]
+        return np.array(
+            [[self.price(i + self.offset), total[i]] for i in used.tolist()]
+        ).reshape(-1, 2)
+
+    def add_order(self, order: Order) -> List[Trade]:
+        """
+        Match an Order against the book and rest what is left of it. A market order
+        (price None) takes liquidity at any price, what it cannot fill is cancelled.
+
+        :return: (List[Trade]) a maker and a taker trade for every fill
+        """
+        fills = self.fills
+        start = len(fills)
+        if order.price is not None:
+            order.remainingAmount = self.add(
+                order.order_id,
+                order.side,
+                round(order.price / self.tick_size),
+                order.remainingAmount,
+                order,
+            )
+        elif self.offset is not None:
+            # The last level of the ladder for buys and the first one for sells, the
+            # whole opposite side is in reach
+            order.remainingAmount = self._match(
+                order.order_id,
+                order.side,
+                self.size - 1 if order.side else 0,
+                order.remainingAmount,
+                order,
+            )
+        # Most orders do not cross, they rest without building any trades
+        if len(fills) == start:
+            if order.price is None:
+                order.status = OrderStatus.CANCELLED
+            return []
+
+        trades = []
+        makers = self._makers
+        for k in range(start, len(fills)):
+            maker = makers[k - start]
+            _, _, tick, amount = fills[k]
+            maker.remainingAmount -= amount
+            maker.status = (
+                OrderStatus.PARTIALLY_FILLED
+                if maker.remainingAmount > 0
+                else OrderStatus.FILLED
+            )
+
+            price = self.price(tick)
+            for o, taker in [(maker, False), (order, True)]:
+                trades.append(
+                    Trade(
+                        symbol=o.symbol,
+                        order_id=o.order_id,
+                        side=o.side,
+                        taker=taker,
+                        amount=amount,
+                        price=price,
+                        fees=0,
+                        entryTime=o.entryTime,
+                        eventTime=order.entryTime,
+                    )
+                )
+
+        if order.remainingAmount <= 0:
+            order.status = OrderStatus.FILLED
+        elif order.price is None:
+            order.status = OrderStatus.CANCELLED
+        else:
+            order.status = OrderStatus.PARTIALLY_FILLED
+        # The fills are handed out as trades, no need to keep them
+        del fills[start:]
+        return trades
+
+    def cancel_order(self, order: Order) -> bool:
+        """
+        Remove a resting Order from the book.
+
+        :return: (bool) False if the order is not in the book
+        """
+        slot = self._slots.pop(order.order_id, None)
+        if slot is None:
+            return False
+        self._unlink(slot)
+        order.status = OrderStatus.CANCELLED
+        return True
@@ -0,0 +1,122 @@
+"""
+Vectorized backtest on OHLCV bars.
+
+The strategy is given as an array of target positions: target[t] is the position in
+the base asset it wants to hold after the close of bar t. The orders to get there are
+executed on the next bar, in one of two ways:
+
+- "next_open": a market order at the open of the next bar, paying the taker fee.
+- "limit": a limit order at limit[t] that lives for the next bar only. A buy fills if
+  the low of the bar reaches its price, a sell if the high does, at the limit price or
+  the open if the bar opens through it. It pays the maker fee. If it does not fill, the
+  order of the next bar is sent from the same position again.
+
+The accounting is the one of the Exchange: every fill moves amount * price plus the
+fees out of the quote balance and the amount into the position. Shorts are negative
+positions, like on a futures exchange. The OHLCExchange fills orders the same way bar
+by bar, for strategies that are easier to write event-driven. Its limit orders stay
+open until they are filled or cancelled, a strategy that sends them with
+limit_order(..., bars=1) gets the fills of "limit".
+
+A target of shape (bars, configs) runs many configurations at once, every column is an
+independent backtest on the same bars.
+"""
+
+from dataclasses import dataclass
+from typing import List, Literal, Optional
+import numpy as np
+
+OHLC_COLUMNS = ["timestamp", "open", "high", "low", "close"]
+
+
+@dataclass(slots=True)
+class BarResult:
+    position: np.ndarray
+    trades: np.ndarray
+    price: np.ndarray
+    fees: np.ndarray
+    quote: np.ndarray
+    equity: np.ndarray
+
+
+def simulate_bars(
+    open: np.ndarray,
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    target: np.ndarray,
+    fees: List[int] = [0, 2],
+    initial_quote: float = 10_000,
+    fill: Literal["next_open", "limit"] = "next_open",
+    limit: Optional[np.ndarray] = None,
+) -> BarResult:
+    """
+    :param open, high, low, close: (np.ndarray) prices of the bars
+    :param target: (np.ndarray) position after the close of every bar, shape (bars,)
+    or (bars, configs)
+    :param fees: (List[int]) maker and taker fees in basispoints
+    :param initial_quote: (float) quote balance at the start
+    :param fill: (str) "next_open" or "limit", see the module docstring
+    :param limit: (np.ndarray) price of the limit order sent after every bar, same
+    shape as target. Required for "limit", a NaN price does not fill.
+
+    :return: (BarResult) arrays of the same shape as target: the position, the traded
+    amount (negative for sells), fill price (NaN without a fill), fees, quote balance and
+    equity valued at the close of every bar
+    """
+    target = np.asarray(target, dtype=np.float64)
+    # Bars as columns so they broadcast against several configurations
+    shape = (-1,) + (1,) * (target.ndim - 1)
+    open, high, low, close = (
+        np.asarray(prices, dtype=np.float64).reshape(shape)
+        for prices in [open, high, low, close]
+    )
+
+    position = np.zeros_like(target)
+    price = np.full_like(target, np.nan)
+
+    if fill == "next_open":
+        fee = fees[1] / 10_000
+        position[1:] = target[:-1]
+        price[1:] = np.broadcast_to(open[1:], target[1:].shape)
+    elif fill == "limit":
+        if limit is None:
+            raise ValueError("limit fills need the limit prices")
+        fee = fees[0] / 10_000
+        limit = np.broadcast_to(np.asarray(limit, dtype=np.float64), target.shape)
+        # Whether an order fills depends on its side and so on the position it was
+        # sent from, the bars are walked one by one, all configurations at once
+        current = position[0]
+        for t in range(1, len(target)):
+            wanted = target[t - 1]
+            buy = wanted > current
+            filled = np.where(buy, low[t] <= limit[t - 1], high[t] >= limit[t - 1])
+            filled &= wanted != current
+            current = np.where(filled, wanted, current)
+            position[t] = current
+            price[t] = np.where(
+                filled,
+                np.where(
+                    buy,
+                    np.minimum(open[t], limit[t - 1]),
+                    np.maximum(open[t], limit[t - 1]),
+                ),
+                np.nan,
+            )
+    else:
+        raise ValueError(f"Unknown fill {fill}")
+
+    trades = np.diff(position, axis=0, prepend=position[:1])
+    price[trades == 0] = np.nan
+    value = np.where(trades != 0, trades * price, 0.0)
+    paid = np.abs(value) * fee
+    quote = initial_quote - np.cumsum(value + paid, axis=0)
+
+    return BarResult(
+        position=position,
+        trades=trades,
+        price=price,
+        fees=paid,
+        quote=quote,
+        equity=quote + position * close,
+    )
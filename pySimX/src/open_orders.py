@@ -0,0 +1,94 @@
+"""
+Resting orders of one side of a market.
+
+The orders are kept in a sorted map of price in integer ticks -> FIFO queue of orders,
+together with an index of order_id -> order. Orders at the same price queue behind each other instead of
+replacing one another, and cancels and modifications find their order through the index.
+Every operation costs O(log levels), independent of the number of resting orders.
+
+The interface follows the SortedDict that was used before: len() is the number of
+orders, peekitem and popitem take the index of the price level (0 lowest, -1 highest)
+and return (tick, order) of the first order in its queue.
+"""
+
+from typing import Iterator, List, Optional, Tuple
+from collections import OrderedDict
+from sortedcontainers import SortedDict
+
+from .data_types import Order
+
+
+class RestingOrders:
+    def __init__(self) -> None:
+        self.levels = SortedDict()
+        self.index = {}
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, order_id: int) -> bool:
+        return order_id in self.index
+
+    def __iter__(self) -> Iterator[Order]:
+        """
+        The orders from the lowest to the highest price, in queue order per price.
+        """
+        for queue in self.levels.values():
+            yield from queue.values()
+
+    def get(self, order_id: int) -> Optional[Order]:
+        return self.index.get(order_id)
+
+    def add(self, order: Order) -> None:
+        """
+        Put the order at the end of the queue of its price, given by order.tick.
+        """
+        queue = self.levels.get(order.tick)
+        if queue is None:
+            queue = self.levels[order.tick] = OrderedDict()
+        queue[order.order_id] = order
+        self.index[order.order_id] = order
+
+    def remove(self, order_id: int) -> Optional[Order]:
+        """
+        Remove an order by its id.
+
+        :return: (Order) the removed order, None if it is not resting
+        """
+        order = self.index.pop(order_id, None)
+        if order is not None:
+            queue = self.levels[order.tick]
+            del queue[order_id]
+            if len(queue) == 0:
+                del self.levels[order.tick]
+        return order
+
+    def clear(self) -> List[Order]:
+        """
+        Remove all orders.
+
+        :return: (List[Order]) the removed orders, in the order of __iter__
+        """
+        orders = list(self)
+        self.levels.clear()
+        self.index.clear()
+        return orders
+
+    def peekitem(self, index: int = -1) -> Tuple[int, Order]:
+        """
+        :param index: (int) index of the price level, 0 is the lowest, -1 the highest
+        :return: (Tuple[int, Order]) tick and first order in the queue of the level
+        """
+        tick, queue = self.levels.peekitem(index)
+        return tick, next(iter(queue.values()))
+
+    def popitem(self, index: int = -1) -> Tuple[int, Order]:
+        """
+        Remove the first order in the queue of the price level at index.
+        """
+        tick, queue = self.levels.peekitem(index)
+        _, order = queue.popitem(last=False)
+        if len(queue) == 0:
+            del self.levels[tick]
+        del self.index[order.order_id]
+        return tick, order
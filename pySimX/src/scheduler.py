@@ -0,0 +1,109 @@
+"""
+Replay of several exchanges on one simulation clock.
+
+Every exchange replays its own market data and user events. The Scheduler keeps a heap
+of (next event time, exchange) and always advances the exchange with the globally
+earliest event, so the events of all venues are processed in time order and the
+strategy sees one clock, Scheduler.now. An order sent to an exchange can move its next
+event to an earlier time, the exchange tells the scheduler about it and gets a new
+entry in the heap. Entries that no longer match the next event of their exchange are
+dropped when they come up.
+
+Example:
+
+    scheduler = Scheduler({"origin": origin, "hedging": hedging})
+    scheduler.prepare_backtest()
+    while scheduler.has_events():
+        strategy.run_strategy()  # uses scheduler.now as its local timestamp
+        scheduler.step()
+"""
+
+from typing import Dict, Optional
+import heapq
+
+from .exchange import TOB_Exchange
+
+
+class Scheduler:
+    def __init__(self, exchanges: Dict[str, TOB_Exchange]) -> None:
+        """
+        :param exchanges: (Dict[str, TOB_Exchange]) the venues by name
+        """
+        self.exchanges = exchanges
+        self._venues = list(exchanges.values())
+        self._index = {id(exchange): i for i, exchange in enumerate(self._venues)}
+        for exchange in self._venues:
+            exchange.scheduler = self
+
+        self.now = None
+        self._heap = []
+
+    def prepare_backtest(self) -> None:
+        """
+        Reset all exchanges to the start of their market data.
+        """
+        self._heap = []
+        for exchange in self._venues:
+            exchange.prepare_backtest()
+        for i in range(len(self._venues)):
+            self._push(i)
+        self.now = self._heap[0][0] if len(self._heap) > 0 else None
+
+    def _push(self, i: int) -> None:
+        ts = self._venues[i].next_timestamp()
+        if ts is not None:
+            heapq.heappush(self._heap, (ts, i))
+
+    def wake(self, exchange: TOB_Exchange, timestamp: int) -> None:
+        """
+        Called by an exchange when a user event is scheduled at timestamp.
+        """
+        heapq.heappush(self._heap, (timestamp, self._index[id(exchange)]))
+
+    def has_events(self) -> bool:
+        return any(exchange.has_events() for exchange in self._venues)
+
+    def next_timestamp(self) -> Optional[int]:
+        """
+        Timestamp of the next event over all exchanges, None if all are done.
+        """
+        heap = self._heap
+        while len(heap) > 0:
+            ts, i = heap[0]
+            if self._venues[i].next_timestamp() == ts:
+                return ts
+            # Drop stale entries, the exchange moved on since they were pushed
+            heapq.heappop(heap)
+        return None
+
+    def step(self) -> Optional[TOB_Exchange]:
+        """
+        Process the next event over all exchanges.
+
+        :return: (TOB_Exchange) the exchange that was advanced, None if all are done
+        """
+        if self.next_timestamp() is None:
+            return None
+        heap = self._heap
+        _, i = heapq.heappop(heap)
+        exchange = self._venues[i]
+
+        # Batched market data of the exchange must stop before the other venues, only
+        # during this step so the exchange can be replayed on its own later
+        exchange.horizon = heap[0][0] if len(heap) > 0 else None
+        exchange._simulation_step()
+        exchange.horizon = None
+        self.now = exchange.last_timestamp
+        self._push(i)
+        return exchange
+
+    def run_simulation(self, strategy) -> None:
+        """
+        Run a strategy that trades on several of the exchanges, it is called before
+        every event.
+        """
+        self.prepare_backtest()
+        while self.has_events():
+            strategy.run_strategy()
+            if self.step() is None:
+                break
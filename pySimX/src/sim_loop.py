@@ -0,0 +1,290 @@
+"""
+Coroutine strategies on simulated time.
+
+Instead of a run_strategy that is polled on every event, a strategy is an async
+function that awaits what it reacts to: a fill, a change of the TOB of a symbol or a
+point in simulated time, on any of the exchanges of a Scheduler. The SimLoop replays the
+exchanges and resumes a coroutine only when its wait is over, so waiting coroutines
+cost nothing: they sit in a timer heap or in a list of waiters per (exchange, symbol)
+or exchange, and only the waiters of the exchange and symbol of an event are looked at.
+
+The loop is not an asyncio event loop, the awaitables below are the only things a
+strategy can await. Coroutines are resumed right at the event that woke them, so
+orders they send use SimLoop.now as their local timestamp.
+
+Example:
+
+    async def quote(loop, exchange, symbol):
+        while True:
+            tob = await next_tob(exchange, symbol)
+            order = exchange.limit_order(symbol, 0.1, tob.bp, 1, loop.now)
+            which, value = await any_of(next_fill(exchange, order), sleep(1_000_000))
+            if which == 1:
+                exchange.cancel_order(order)
+
+    loop = SimLoop(Scheduler({"binance": binance, "okx": okx}))
+    for symbol in symbols:
+        loop.spawn(quote(loop, binance, symbol))
+    loop.run()
+"""
+
+from typing import Any, Coroutine, List, Optional
+from itertools import count
+import heapq
+
+from .data_types import Order
+from .exchange import TOB_Exchange
+from .scheduler import Scheduler
+
+
+class Wait:
+    """
+    Base of the awaitables, awaiting one suspends the coroutine until the loop resumes
+    it with the result of the wait.
+    """
+
+    __slots__ = ()
+
+    def __await__(self):
+        return (yield self)
+
+
+class sleep(Wait):
+    """
+    Wait for a duration in the time unit of the market data.
+    """
+
+    __slots__ = ("duration",)
+
+    def __init__(self, duration: int) -> None:
+        self.duration = duration
+
+
+class sleep_until(Wait):
+    """
+    Wait until a timestamp, returns right away if it is in the past.
+    """
+
+    __slots__ = ("timestamp",)
+
+    def __init__(self, timestamp: int) -> None:
+        self.timestamp = timestamp
+
+
+class next_tob(Wait):
+    """
+    Wait until the TOB of a symbol on an exchange changes, returns the TOB.
+    """
+
+    __slots__ = ("exchange", "symbol")
+
+    def __init__(self, exchange: TOB_Exchange, symbol: str) -> None:
+        self.exchange = exchange
+        self.symbol = symbol
+
+
+class next_fill(Wait):
+    """
+    Wait for the next fill on an exchange, of one order if it is given. Returns the
+    Trade of the fill.
+    """
+
+    __slots__ = ("exchange", "order_id")
+
+    def __init__(self, exchange: TOB_Exchange, order: Optional[Order] = None) -> None:
+        self.exchange = exchange
+        self.order_id = None if order is None else order.order_id
+
+
+class any_of(Wait):
+    """
+    Wait for the first of several waits, returns (index of the wait, its result).
+    """
+
+    __slots__ = ("waits",)
+
+    def __init__(self, *waits: Wait) -> None:
+        self.waits = waits
+
+
+class Task:
+    __slots__ = ("coro", "token", "done", "result")
+
+    def __init__(self, coro: Coroutine) -> None:
+        self.coro = coro
+        # Incremented on every resume, registrations of older waits are stale
+        self.token = 0
+        self.done = False
+        self.result = None
+
+
+class SimLoop:
+    def __init__(self, scheduler: Scheduler) -> None:
+        """
+        :param scheduler: (Scheduler) the exchanges to replay, a single exchange is
+        wrapped with Scheduler({"": exchange})
+        """
+        self.scheduler = scheduler
+        self.tasks = []
+        self._running = False
+        # Number of tasks that are not done
+        self._live = 0
+        # Number of trades of every exchange that were already handed out
+        self._seen = {}
+        self._sequence = count()
+        # (timestamp, sequence, task, token, index)
+        self._timers = []
+        # (id(exchange), symbol) -> [(task, token, index, tob)]
+        self._tob = {}
+        # id(exchange) -> [(task, token, index, order_id)]
+        self._fills = {}
+
+    @property
+    def now(self) -> Optional[int]:
+        return self.scheduler.now
+
+    def spawn(self, coro: Coroutine) -> Task:
+        """
+        Add a coroutine, it starts when the loop runs or right away if it is running.
+        """
+        task = Task(coro)
+        self.tasks.append(task)
+        self._live += 1
+        if self._running:
+            self._resume(task, None)
+        return task
+
+    def _resume(self, task: Task, value: Any) -> None:
+        task.token += 1
+        try:
+            wait = task.coro.send(value)
+        except StopIteration as stop:
+            task.done = True
+            task.result = stop.value
+            self._live -= 1
+            return
+
+        if isinstance(wait, any_of):
+            for index, single in enumerate(wait.waits):
+                self._register(task, single, index)
+        else:
+            self._register(task, wait, None)
+
+    def _register(self, task: Task, wait: Wait, index: Optional[int]) -> None:
+        token = task.token
+        now = 0 if self.now is None else self.now
+        if isinstance(wait, sleep):
+            timestamp = now + wait.duration
+        elif isinstance(wait, sleep_until):
+            timestamp = max(wait.timestamp, now)
+        elif isinstance(wait, next_tob):
+            market = wait.exchange.markets[wait.symbol]
+            state = (market.bq, market.bp, market.ap, market.aq)
+            key = (id(wait.exchange), wait.symbol)
+            self._tob.setdefault(key, []).append((task, token, index, state))
+            return
+        elif isinstance(wait, next_fill):
+            self._fills.setdefault(id(wait.exchange), []).append(
+                (task, token, index, wait.order_id)
+            )
+            return
+        else:
+            raise TypeError(f"Can not await {wait!r} on the SimLoop")
+        heapq.heappush(
+            self._timers, (timestamp, next(self._sequence), task, token, index)
+        )
+
+    def _wake(self, task: Task, token: int, index: Optional[int], value: Any) -> None:
+        # Resume a task if the registration is still the current wait of the task
+        if task.token == token and not task.done:
+            self._resume(task, value if index is None else (index, value))
+
+    def _fire_timers(self, until: Optional[int]) -> None:
+        scheduler = self.scheduler
+        timers = self._timers
+        while len(timers) > 0 and (until is None or timers[0][0] <= until):
+            timestamp, _, task, token, index = heapq.heappop(timers)
+            if task.token == token and not task.done:
+                if scheduler.now is None or timestamp > scheduler.now:
+                    scheduler.now = timestamp
+                self._wake(task, token, index, timestamp)
+
+    def _after_step(self, exchange: TOB_Exchange) -> None:
+        # Fills of the event
+        seen = self._seen.get(id(exchange), 0)
+        if len(exchange.trades) > seen:
+            self._seen[id(exchange)] = len(exchange.trades)
+            waiters = self._fills.pop(id(exchange), None)
+            if waiters is not None:
+                for trade in exchange.trades[seen:]:
+                    pending = []
+                    for waiter in waiters:
+                        task, token, index, order_id = waiter
+                        if task.token != token:
+                            continue
+                        if order_id is None or order_id == trade.order_id:
+                            self._wake(task, token, index, trade)
+                        else:
+                            pending.append(waiter)
+                    waiters = pending
+                if len(waiters) > 0:
+                    self._fills.setdefault(id(exchange), []).extend(waiters)
+
+        # TOB of the symbol of the event
+        key = (id(exchange), exchange.last_symbol)
+        waiters = self._tob.pop(key, None)
+        if waiters is not None:
+            market = exchange.markets[exchange.last_symbol]
+            state = (market.bq, market.bp, market.ap, market.aq)
+            pending = []
+            for waiter in waiters:
+                task, token, index, seen = waiter
+                if seen != state:
+                    self._wake(task, token, index, market)
+                elif task.token == token:
+                    pending.append(waiter)
+            if len(pending) > 0:
+                self._tob.setdefault(key, []).extend(pending)
+
+    def run(self, until: Optional[int] = None) -> None:
+        """
+        Replay the exchanges from the start and run the coroutines until all of them
+        are done or the market data ends. Timers after the last event do not fire.
+
+        :param until: (int) stop at this timestamp, no limit if None
+        """
+        scheduler = self.scheduler
+        scheduler.prepare_backtest()
+        self._timers = []
+        self._tob = {}
+        self._fills = {}
+        self._seen = {}
+        self._running = True
+        for task in list(self.tasks):
+            if task.token == 0:
+                self._resume(task, None)
+
+        while self._live > 0:
+            ts = scheduler.next_timestamp()
+            if ts is None:
+                break
+            if until is not None and ts > until:
+                # Only timers can still wake a coroutine
+                self._fire_timers(until)
+                break
+
+            # Timers that are due go before the event
+            if len(self._timers) > 0 and self._timers[0][0] <= ts:
+                self._fire_timers(ts)
+                continue
+
+            self._after_step(scheduler.step())
+        self._running = False
+
+    def run_tasks(self, coros: List[Coroutine], until: Optional[int] = None) -> list:
+        """
+        Spawn the coroutines, run the loop and return their results.
+        """
+        tasks = [self.spawn(coro) for coro in coros]
+        self.run(until)
+        return [task.result for task in tasks]
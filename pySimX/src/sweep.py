@@ -0,0 +1,154 @@
+"""
+Parameter sweeps over strategies, run in parallel on a process pool.
+
+Every run builds its exchanges on top of the same market data. The data is handed to
+each worker process once, when the worker starts. With the fork start method (default
+on linux) an already loaded EventStore is inherited without copying, a cache file from
+EventStore.save is memory-mapped by every worker and shared through the OS page cache.
+
+Example:
+
+    def build(events, seed):
+        latency = LogNormalLatency(50_000, 0.3, seed=seed)
+        origin = TOB_Exchange(events=events["origin"], latency=latency)
+        hedging = TOB_Exchange(events=events["hedging"], latency=latency)
+        ...
+        return {"origin": origin, "hedging": hedging, "initial_quote": 30_000}
+
+    results = run_sweep(
+        cross_exchange,
+        grid={"distance": [0.005, 0.01], "sensitivity": [0.001, 0.002]},
+        build=build,
+        data={"origin": origin_store, "hedging": hedging_store},
+    )
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+import multiprocessing
+import numpy as np
+import pandas as pd
+
+from .event_store import EventStore
+from .exchange import Exchange
+
+# Market data of the current worker process, set once by _init_worker
+_worker_data = None
+
+
+def _init_worker(data: Any) -> None:
+    global _worker_data
+    _worker_data = data
+
+
+def _merge_stores(data: Any) -> None:
+    # Merge the records of every EventStore in data before the workers fork, otherwise
+    # each worker would concatenate and sort its own copy on first access
+    if isinstance(data, EventStore):
+        data.data
+    elif isinstance(data, dict):
+        for value in data.values():
+            _merge_stores(value)
+    elif isinstance(data, (list, tuple)):
+        for value in data:
+            _merge_stores(value)
+
+
+def parameter_grid(grid: Dict[str, List[Any]]) -> List[dict]:
+    """
+    All combinations of the values in the grid, e.g.
+    {"a": [1, 2], "b": [3]} -> [{"a": 1, "b": 3}, {"a": 2, "b": 3}]
+    """
+    keys = list(grid.keys())
+    return [dict(zip(keys, values)) for values in product(*grid.values())]
+
+
+def exchange_metrics(strategy: Any) -> dict:
+    """
+    Default metrics of a run: the final balances and the number of trades of every
+    exchange the strategy holds as an attribute, prefixed by the attribute name.
+    """
+    out = {}
+    for name, value in vars(strategy).items():
+        if isinstance(value, Exchange):
+            for asset, balance in value.balances.items():
+                out[f"{name}_{asset}"] = balance
+            out[f"{name}_trades"] = len(value.trades)
+    return out
+
+
+def _run_one(
+    strategy: type,
+    params: dict,
+    build: Callable[[Any, int], dict],
+    metrics: Callable[[Any], dict],
+    seed: int,
+) -> dict:
+    # Seed the global generator as well, for code that does not take a seed
+    np.random.seed(seed)
+
+    strat = strategy(**build(_worker_data, seed), **params)
+    strat.run_simulation()
+
+    return {**params, "seed": seed, **metrics(strat)}
+
+
+def run_sweep(
+    strategy: type,
+    grid: Dict[str, List[Any]],
+    build: Callable[[Any, int], dict],
+    data: Any = None,
+    metrics: Callable[[Any], dict] = exchange_metrics,
+    max_workers: Optional[int] = None,
+    seed: int = 0,
+) -> pd.DataFrame:
+    """
+    Run a strategy for every combination of parameters in the grid.
+
+    Each run calls build(data, seed) to get the keyword arguments of the strategy, such
+    as fresh exchanges on top of the shared market data, and adds the parameters of the
+    grid. Then strategy(**kwargs).run_simulation() is executed and metrics(strategy)
+    summarizes the run. build, metrics and the strategy must be defined at module level
+    so they can be sent to the worker processes.
+
+    :param strategy: (type) strategy class
+    :param grid: (Dict[str, List[Any]]) values to try for each keyword argument
+    :param build: (Callable) build(data, seed) -> dict of keyword arguments
+    :param data: (Any) market data shared by all runs, e.g. an EventStore
+    :param metrics: (Callable) metrics(strategy) -> dict of results of a run
+    :param max_workers: (int) number of processes, 1 runs everything in this process
+    :param seed: (int) seed from which a deterministic seed per run is derived
+
+    :return: (pd.DataFrame) one row per run with the parameters, seed and metrics
+    """
+    runs = parameter_grid(grid)
+    seeds = [
+        int(s.generate_state(1)[0])
+        for s in np.random.SeedSequence(seed).spawn(len(runs))
+    ]
+
+    if max_workers == 1:
+        _init_worker(data)
+        results = [
+            _run_one(strategy, params, build, metrics, s)
+            for params, s in zip(runs, seeds)
+        ]
+    else:
+        # Fork the workers where available so the data is inherited instead of pickled
+        _merge_stores(data)
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else None)
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(data,),
+        ) as pool:
+            futures = [
+                pool.submit(_run_one, strategy, params, build, metrics, s)
+                for params, s in zip(runs, seeds)
+            ]
+            results = [future.result() for future in futures]
+
+    return pd.DataFrame(results)
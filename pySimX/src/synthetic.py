@@ -0,0 +1,294 @@
+"""
+Synthetic TOB and trade streams for testing without downloaded market data.
+
+The order flow of every market is a self-exciting (Hawkes) process simulated through
+its branching structure: exogenous traders arrive at a constant rate, and every trade
+triggers on average `branching` follow-up trades of herding traders after an
+exponentially distributed delay, which repeat its side with probability
+`persistence`. This gives the clustered arrivals and the autocorrelated trade signs of
+real markets. Market makers refresh the quotes at a constant rate and after every
+trade. A trade moves the price one tick in its direction with probability `impact`,
+and quote updates add the random moves needed to reach the configured volatility.
+Prices stay on the tick grid and the spread is one tick plus a Poisson number of ticks.
+
+Everything is generated vectorized, one chunk of simulated time at a time, directly as
+EVENT_DTYPE records. synthetic_stream generates the chunks lazily during the replay,
+so the number of events is only limited by time, not by memory:
+
+    markets = [
+        SyntheticMarket("BTCUSDT", price=30_000, tick_size=0.1, trade_rate=50),
+        SyntheticMarket("ETHUSDT", price=2_000, tick_size=0.01, volatility=0.03),
+    ]
+    exchange = TOB_Exchange(events=synthetic_stream(markets, duration_us=86_400e6))
+    exchange.add_market("BTCUSDT", "BTC", "USDT", tick_size=0.1)
+    ...
+"""
+
+from dataclasses import dataclass
+from functools import partial
+from typing import Iterator, List
+import numpy as np
+
+from .data_types import EventKind
+from .event_store import EVENT_DTYPE, EventStore, EventStream, merge_chunks
+
+
+@dataclass
+class SyntheticMarket:
+    """
+    Parameters of a synthetic market. Rates are per second, times in microseconds.
+
+    :param trade_rate: (float) rate of the exogenous trades, the total rate of trades
+    is trade_rate / (1 - branching)
+    :param quote_rate: (float) rate of the quote updates that are not caused by trades
+    :param volatility: (float) standard deviation of the daily returns, approximately
+    :param spread: (float) average spread in ticks, at least one tick
+    :param size: (float) average trade amount
+    :param depth: (float) average amount at the best bid and ask
+    :param branching: (float) average number of trades triggered by a trade, below 1
+    :param decay_us: (float) average delay of a triggered trade
+    :param persistence: (float) probability that a triggered trade has the same side
+    :param impact: (float) probability that a trade moves the price by one tick
+    """
+
+    symbol: str
+    price: float = 100.0
+    tick_size: float = 0.01
+    trade_rate: float = 10.0
+    quote_rate: float = 50.0
+    volatility: float = 0.02
+    spread: float = 1.5
+    size: float = 1.0
+    depth: float = 10.0
+    branching: float = 0.6
+    decay_us: float = 50_000.0
+    persistence: float = 0.8
+    impact: float = 0.1
+
+    def __post_init__(self) -> None:
+        if not 0 <= self.branching < 1:
+            raise ValueError("branching has to be in [0, 1) for a stationary process")
+        if self.spread < 1:
+            raise ValueError("The spread is at least one tick")
+
+    def initial(self, start_us: int) -> tuple:
+        """
+        The initial TOB as (ts, bq, bp, ap, aq).
+        """
+        bid = np.round(self.price / self.tick_size)
+        ask = bid + max(int(round(self.spread)), 1)
+        return (
+            int(start_us),
+            self.depth,
+            bid * self.tick_size,
+            ask * self.tick_size,
+            self.depth,
+        )
+
+    def price_moves(self) -> tuple:
+        """
+        How the price moves to reach the volatility: the probability that a trade moves
+        it by one tick, lowered from impact if the trades alone would move it too much,
+        and the mean number of ticks of a quote update move, a Poisson number of ticks
+        in a random direction.
+        """
+        # Variance of the price in ticks² per second
+        target = (self.volatility * self.price / self.tick_size) ** 2 / 86_400
+        trades = self.trade_rate / (1 - self.branching)
+        impact = min(self.impact, target / trades) if trades > 0 else 0.0
+        if self.quote_rate == 0:
+            return impact, 0.0
+        # E[ticks²] = lam + lam² of the quote updates makes up the rest
+        rest = max(target - trades * impact, 0) / self.quote_rate
+        return impact, float(np.sqrt(1 + 4 * rest) - 1) / 2
+
+
+def _hawkes(
+    rng: np.random.Generator,
+    market: SyntheticMarket,
+    start: int,
+    end: int,
+    carry: tuple,
+) -> tuple:
+    """
+    Trades in [start, end): the exogenous trades of the window, the triggered trades
+    carried over from earlier windows and all trades triggered by them.
+
+    :return: (tuple) times and sides of the trades in the window sorted by time, and
+    the times and sides of the trades after end to carry over
+    """
+    n = rng.poisson(market.trade_rate * (end - start) / 1e6)
+    times = [rng.uniform(start, end, n), carry[0]]
+    sides = [rng.random(n) < 0.5, carry[1]]
+
+    # Every generation of triggered trades at once
+    parents, parent_sides = times[0], sides[0]
+    while len(parents) > 0:
+        children = rng.poisson(market.branching, len(parents))
+        parents = np.repeat(parents, children)
+        parents = parents + rng.exponential(market.decay_us, len(parents))
+        same = rng.random(len(parents)) < market.persistence
+        parent_sides = np.repeat(parent_sides, children) == same
+        times.append(parents)
+        sides.append(parent_sides)
+
+    times = np.concatenate(times)
+    sides = np.concatenate(sides)
+    later = times >= end
+    order = np.argsort(times[~later], kind="stable")
+    return (
+        times[~later][order].astype(np.int64),
+        sides[~later][order],
+        (times[later], sides[later]),
+    )
+
+
+def synthetic_chunks(
+    market: SyntheticMarket,
+    symbol_id: int,
+    start_us: int,
+    duration_us: int,
+    chunk_us: int = 60_000_000,
+    seed: int = 0,
+) -> Iterator[np.ndarray]:
+    """
+    Generate the events of a market chunk by chunk of simulated time.
+
+    :param symbol_id: (int) id of the symbol in the records
+    :param start_us: (int) timestamp of the initial TOB, the events start after it
+    :param duration_us: (int) length of the generated period
+    :param chunk_us: (int) period generated at once, bounds the memory
+    :param seed: (int) the same seed always gives the same events
+
+    :return: (Iterator[np.ndarray]) EVENT_DTYPE chunks sorted by timestamp
+    """
+    rng = np.random.default_rng(seed)
+    impact, quote_ticks = market.price_moves()
+    extra_spread = market.spread - 1
+
+    _, _, bp, ap, _ = market.initial(start_us)
+    bid = int(np.round(bp / market.tick_size))
+    spread = int(np.round((ap - bp) / market.tick_size))
+    carry = (np.zeros(0), np.zeros(0, dtype=bool))
+
+    end_us = start_us + duration_us
+    for start in range(int(start_us) + 1, int(end_us) + 1, int(chunk_us)):
+        end = min(start + int(chunk_us), int(end_us) + 1)
+        trade_ts, trade_side, carry = _hawkes(rng, market, start, end, carry)
+        quote_ts = np.sort(
+            rng.integers(
+                start, end, rng.poisson(market.quote_rate * (end - start) / 1e6)
+            )
+        )
+
+        # Trades and quote updates in time order, a trade before a quote update at the
+        # same time
+        ts = np.concatenate([trade_ts, quote_ts])
+        trade = np.concatenate(
+            [np.ones(len(trade_ts), dtype=bool), np.zeros(len(quote_ts), dtype=bool)]
+        )
+        side = np.concatenate([trade_side, np.zeros(len(quote_ts), dtype=bool)])
+        order = np.argsort(ts, kind="stable")
+        ts, trade, side = ts[order], trade[order], side[order]
+        n = len(ts)
+        if n == 0:
+            continue
+
+        # Price moves in ticks: trades in their direction, quote updates at random
+        direction = np.where(trade, np.where(side, 1, -1), rng.choice([-1, 1], n))
+        ticks = np.where(trade, rng.random(n) < impact, rng.poisson(quote_ticks, n))
+        bids = bid + np.cumsum(direction * ticks)
+        spreads = 1 + rng.poisson(extra_spread, n)
+
+        # Trades happen at the quotes before their own move
+        before_bid = np.concatenate([[bid], bids[:-1]])
+        before_ask = before_bid + np.concatenate([[spread], spreads[:-1]])
+        bid, spread = int(bids[-1]), int(spreads[-1])
+
+        # Every event is a TOB record, a trade is preceded by its trade record
+        position = np.arange(n) + np.cumsum(trade)
+        chunk = np.zeros(n + int(trade.sum()), dtype=EVENT_DTYPE)
+        chunk["symbol"] = symbol_id
+
+        chunk["ts"][position] = ts
+        chunk["kind"][position] = EventKind.TOB
+        chunk["bq"][position] = rng.exponential(market.depth, n)
+        chunk["bp"][position] = bids * market.tick_size
+        chunk["ap"][position] = (bids + spreads) * market.tick_size
+        chunk["aq"][position] = rng.exponential(market.depth, n)
+
+        rows = position[trade] - 1
+        price = np.where(side, before_ask, before_bid)[trade]
+        chunk["ts"][rows] = ts[trade]
+        chunk["kind"][rows] = EventKind.TRADE
+        chunk["side"][rows] = side[trade]
+        chunk["price"][rows] = price * market.tick_size
+        chunk["amount"][rows] = rng.exponential(market.size, len(rows))
+
+        yield chunk
+
+
+def _seeds(markets: List[SyntheticMarket], seed: int) -> List[int]:
+    # Independent seeds per market, the same for the same seed and markets
+    sequences = np.random.SeedSequence(seed).spawn(len(markets))
+    return [int(s.generate_state(1)[0]) for s in sequences]
+
+
+def synthetic_stream(
+    markets: List[SyntheticMarket],
+    duration_us: int,
+    start_us: int = 0,
+    chunk_us: int = 60_000_000,
+    seed: int = 0,
+) -> EventStream:
+    """
+    Synthetic market data that is generated while it is replayed, only one chunk of
+    every market is in memory at a time.
+
+    :return: (EventStream) can be passed to TOB_Exchange(events=...)
+    """
+    stream = EventStream()
+    for market, market_seed in zip(markets, _seeds(markets, seed)):
+        stream.initial[market.symbol] = market.initial(start_us)
+        stream.add_source(
+            partial(
+                synthetic_chunks,
+                market,
+                stream.symbol_id(market.symbol),
+                start_us,
+                duration_us,
+                chunk_us,
+                market_seed,
+            )
+        )
+    return stream
+
+
+def synthetic_store(
+    markets: List[SyntheticMarket],
+    duration_us: int,
+    start_us: int = 0,
+    chunk_us: int = 60_000_000,
+    seed: int = 0,
+) -> EventStore:
+    """
+    The same data as synthetic_stream in an EventStore, e.g. to save it as a cache
+    file or to share it with several exchanges.
+    """
+    store = EventStore()
+    sources = []
+    for market, market_seed in zip(markets, _seeds(markets, seed)):
+        store.initial[market.symbol] = market.initial(start_us)
+        sources.append(
+            synthetic_chunks(
+                market,
+                store.symbol_id(market.symbol),
+                start_us,
+                duration_us,
+                chunk_us,
+                market_seed,
+            )
+        )
+    for chunk in merge_chunks(sources):
+        store.add_chunk(chunk)
+    return store
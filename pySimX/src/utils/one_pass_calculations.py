@@ -89,6 +89,263 @@ class var:
         return self.var
 
 
+class vector_mean:
+    def __init__(self, n: int, lookback_us: int) -> None:
+        """
+        The mean of n series at once, every update gives the same values as n mean
+        objects. A NaN in the input leaves its series unchanged.
+
+        :param n: (int) number of series
+        :param lookback_us: (int) lookback in the unit of the timestamps
+        """
+        self.lookback_us = lookback_us
+        self.last_ts = np.zeros(n)
+        self.ema = np.full(n, np.nan)
+
+    def update(self, x_t: np.ndarray, ts: int) -> np.ndarray:
+        """
+        Update all series with the values of one timestamp.
+        """
+        x_t = np.asarray(x_t, dtype=np.float64)
+        weight = np.minimum((ts - self.last_ts) / self.lookback_us, 1)
+        ema = self.ema
+        if np.isnan(ema).any():
+            # The first value of a series is its mean
+            ema = np.where(np.isnan(ema), x_t, ema)
+
+        ema = weight * x_t + (1 - weight) * ema
+        if np.isnan(x_t).any():
+            valid = ~np.isnan(x_t)
+            self.ema = np.where(valid, ema, self.ema)
+            self.last_ts = np.where(valid, ts, self.last_ts)
+        else:
+            self.ema = ema
+            self.last_ts = np.full(len(ema), ts, dtype=np.float64)
+        return self.ema
+
+    def update_block(self, x: np.ndarray, ts: np.ndarray) -> np.ndarray:
+        """
+        Update all series with a block of timestamps, e.g. to warm up.
+
+        :param x: (np.ndarray) values of shape (timestamps, n)
+        :param ts: (np.ndarray) the timestamps
+
+        :return: (np.ndarray) the mean after every timestamp, shape (timestamps, n)
+        """
+        x = np.asarray(x, dtype=np.float64)
+        if len(x) == 0:
+            return np.empty(x.shape)
+        valid = ~np.isnan(x)
+        weight, keep = _block_weights(self.last_ts, ts, self.lookback_us, valid)
+
+        # A NaN keeps the mean of its series, the first value of a series is its mean
+        a = np.where(valid, keep, 1.0)
+        b = np.where(valid, weight * x, 0.0)
+        fresh = np.isnan(self.ema)
+        unseen = None
+        if fresh.any():
+            seen = np.cumsum(valid, axis=0)
+            first = fresh & valid & (seen == 1)
+            a[first] = 0.0
+            b[first] = x[first]
+            unseen = fresh & (seen == 0)
+        out = _linear_scan(a, b, np.where(fresh, 0.0, self.ema))
+        if unseen is not None:
+            out[unseen] = np.nan
+
+        self.ema = out[-1].copy()
+        self.last_ts = _last_valid(
+            np.broadcast_to(np.asarray(ts, dtype=np.float64)[:, None], x.shape),
+            valid,
+            self.last_ts,
+        )
+        return out
+
+
+class vector_var:
+    def __init__(
+        self,
+        n: int,
+        lookback: int,
+        calculate_ema: bool = False,
+        calculate_pct_change: bool = False,
+    ) -> None:
+        """
+        The variance of n series at once, every update gives the same values as n var
+        objects. A NaN in the input leaves its series unchanged.
+
+        :param n: (int) number of series
+        :param lookback: (int) the maximum historical timewindow, see var
+        :param calculate_ema: (bool) maintain the EMAs in a vector_mean, otherwise
+        they have to be provided in the update.
+        :param calculate_pct_change: (bool) use the percentage changes of the values
+        """
+        self.lookback = lookback
+        self.last_ts = np.zeros(n)
+        self.var = np.ones(n)
+
+        self.calculate_ema = calculate_ema
+        self.calculate_pct_change = calculate_pct_change
+
+        if calculate_pct_change:
+            self.last_value = np.zeros(n)
+
+        if calculate_ema:
+            self.ema = vector_mean(n, lookback)
+
+    def update(
+        self, x_t: np.ndarray, ts: int, ema: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Update all series with the values of one timestamp.
+        """
+        x_t = np.asarray(x_t, dtype=np.float64)
+        valid = None if not np.isnan(x_t).any() else ~np.isnan(x_t)
+
+        if self.calculate_pct_change:
+            # The first value of a series counts as a change of zero
+            with np.errstate(divide="ignore", invalid="ignore"):
+                change = np.where(self.last_value == 0, 0.0, x_t / self.last_value - 1)
+            if valid is None:
+                self.last_value = x_t
+                x_t = change
+            else:
+                self.last_value = np.where(valid, x_t, self.last_value)
+                x_t = np.where(valid, change, np.nan)
+
+        if self.calculate_ema:
+            ema = self.ema.update(x_t, ts)
+
+        weight = np.minimum((ts - self.last_ts) / self.lookback, 1)
+
+        var = weight * (x_t - ema) ** 2 + (1 - weight) * self.var
+        if valid is None:
+            self.var = var
+            self.last_ts = np.full(len(var), ts, dtype=np.float64)
+        else:
+            self.var = np.where(valid, var, self.var)
+            self.last_ts = np.where(valid, ts, self.last_ts)
+        return self.var
+
+    def update_block(
+        self, x: np.ndarray, ts: np.ndarray, ema: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Update all series with a block of timestamps, e.g. to warm up.
+
+        :param x: (np.ndarray) values of shape (timestamps, n)
+        :param ts: (np.ndarray) the timestamps
+        :param ema: (np.ndarray) EMAs of shape (timestamps, n) if they are not
+        calculated here
+
+        :return: (np.ndarray) the variance after every timestamp, shape (timestamps, n)
+        """
+        x = np.asarray(x, dtype=np.float64)
+        if len(x) == 0:
+            return np.empty(x.shape)
+        valid = ~np.isnan(x)
+
+        if self.calculate_pct_change:
+            # The change to the previous value, zero for the first value of a series
+            previous = _previous_valid(x, valid, self.last_value)
+            self.last_value = _last_valid(x, valid, self.last_value)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                x = np.where(previous == 0, 0.0, x / previous - 1)
+            x[~valid] = np.nan
+
+        if self.calculate_ema:
+            ema = self.ema.update_block(x, ts)
+
+        # A NaN keeps the variance of its series
+        weight, keep = _block_weights(self.last_ts, ts, self.lookback, valid)
+        a = np.where(valid, keep, 1.0)
+        with np.errstate(invalid="ignore"):
+            b = np.where(valid, weight * (x - ema) ** 2, 0.0)
+        out = _linear_scan(a, b, self.var)
+
+        self.var = out[-1].copy()
+        self.last_ts = _last_valid(
+            np.broadcast_to(np.asarray(ts, dtype=np.float64)[:, None], x.shape),
+            valid,
+            self.last_ts,
+        )
+        return out
+
+
+def _linear_scan(a: np.ndarray, b: np.ndarray, init: float) -> np.ndarray:
+    """
+    y[i] = a[i] * y[i - 1] + b[i] with y[-1] = init for all i at once. With 2d arrays
+    every column is a series and init has one value per column.
+
+    The pairs (a, b) are combined over doubling distances within blocks of 16 rows,
+    4 vectorized passes. The ends of the blocks are scanned the same way, recursively,
+    and carried into the blocks in one more pass.
+    """
+    a = np.array(a, dtype=np.float64)
+    b = np.array(b, dtype=np.float64)
+    n = len(a)
+    block = 16 if n > 64 else max(n, 1)
+    # Pad to whole blocks with rows that keep the value
+    pad = -n % block
+    if pad > 0:
+        a = np.concatenate([a, np.ones((pad,) + a.shape[1:])])
+        b = np.concatenate([b, np.zeros((pad,) + b.shape[1:])])
+    a = a.reshape((-1, block) + a.shape[1:])
+    b = b.reshape((-1, block) + b.shape[1:])
+
+    shift = 1
+    while shift < block:
+        b[:, shift:] += a[:, shift:] * b[:, :-shift]
+        a[:, shift:] *= a[:, :-shift].copy()
+        shift *= 2
+
+    init = np.broadcast_to(np.asarray(init, dtype=np.float64), a.shape[2:])
+    carry = init[None]
+    if len(a) > 1:
+        # The value before every block is the end of the block before it
+        ends = _linear_scan(a[:-1, -1], b[:-1, -1], init)
+        carry = np.concatenate([carry, ends])
+    y = a * carry[:, None] + b
+    return y.reshape((-1,) + y.shape[2:])[:n]
+
+
+def _previous_valid(
+    values: np.ndarray, valid: np.ndarray, initial: np.ndarray
+) -> np.ndarray:
+    # Value of the last valid row before every row of every series, initial if there
+    # is none
+    if valid.all():
+        return np.concatenate(
+            [np.asarray(initial, dtype=np.float64)[None], values[:-1]]
+        )
+    rows = np.where(valid, np.arange(len(values))[:, None], -1)
+    last = np.maximum.accumulate(rows, axis=0)
+    previous = np.vstack([np.full((1, values.shape[1]), -1), last[:-1]])
+    taken = values[np.maximum(previous, 0), np.arange(values.shape[1])]
+    return np.where(previous >= 0, taken, initial)
+
+
+def _last_valid(values: np.ndarray, valid: np.ndarray, initial: np.ndarray):
+    # Value of the last valid row of every series, initial if there is none
+    if valid[-1].all():
+        return values[-1].copy()
+    last = len(values) - 1 - np.argmax(valid[::-1], axis=0)
+    taken = values[last, np.arange(values.shape[1])]
+    return np.where(valid.any(axis=0), taken, initial)
+
+
+def _block_weights(
+    last_ts: np.ndarray, ts: np.ndarray, lookback: int, valid: np.ndarray
+) -> tuple:
+    # Weights of a block of updates of all series and one minus them, shape
+    # (timestamps, n). Every update is weighted from the last valid timestamp of its
+    # series, the one before the block for the first.
+    ts = np.broadcast_to(np.asarray(ts, dtype=np.float64)[:, None], valid.shape)
+    previous = _previous_valid(ts, valid, last_ts)
+    weight = np.minimum((ts - previous) / lookback, 1)
+    return weight, 1 - weight
+
+
 # class lin_reg:
 #     def __init__(self, alpha: float) -> None:
 #         self.alpha = alpha
@@ -111,20 +368,121 @@ class lin_reg:
 
 class ExpL2Regression:
     # https://osquant.com/papers/recursive-least-squares-linear-regression/#fn:1
-    def __init__(self, num_features: int, lam: float, halflife: float):
+    def __init__(
+        self,
+        num_features: int,
+        lam: float,
+        halflife: float,
+        num_targets: Optional[int] = None,
+    ):
+        """
+        :param num_features: (int) number of features of a sample
+        :param lam: (float) initial diagonal of P, the L2 penalty is 1 / lam
+        :param halflife: (float) half life of a sample in number of samples
+        :param num_targets: (int) fit several targets on the same features, they share
+        P and w has one column per target. A single target if None.
+        """
         self.n = num_features
         self._lambda = lam
         self.beta = np.exp(np.log(0.5) / halflife)
-        self.w = np.zeros(self.n)
+        self.w = np.zeros(self.n if num_targets is None else (self.n, num_targets))
         self.P = np.diag(np.ones(self.n) * self._lambda)
 
-    def update(self, x: np.ndarray, y: float) -> None:
+    def update(self, x: np.ndarray, y) -> None:
         r = 1 + (x.T @ self.P @ x) / self.beta
         k = (self.P @ x) / (r * self.beta)
         e = y - x @ self.w
-        self.w = self.w + k * e
+        self.w = self.w + np.multiply.outer(k, e)
         k = k.reshape(-1, 1)
         self.P = self.P / self.beta - (k @ k.T) * r
 
-    def predict(self, x: np.ndarray) -> float:
-        return self.w @ x
+    def update_block(self, X: np.ndarray, Y: np.ndarray) -> None:
+        """
+        Update with m samples in one call, same result as m calls of update.
+
+        :param X: (np.ndarray) samples of shape (m, num_features)
+        :param Y: (np.ndarray) targets of shape (m,) or (m, num_targets)
+        """
+        X = np.asarray(X, dtype=np.float64)
+        Y = np.asarray(Y, dtype=np.float64)
+        m = len(X)
+        if m == 0:
+            return
+        # The newest sample has weight 1, the oldest beta ** (m - 1) and the state
+        # beta ** m. Solved in information form, A = inv(P) and A @ w = b.
+        decay = self.beta ** np.arange(m - 1, -1, -1, dtype=np.float64)
+        A = np.linalg.inv(self.P)
+        b = A @ self.w
+        XD = X.T * decay
+        A = self.beta**m * A + XD @ X
+        b = self.beta**m * b + XD @ Y
+
+        # Cholesky of A gives w and a symmetric P
+        L_inv = np.linalg.inv(np.linalg.cholesky(A))
+        self.P = L_inv.T @ L_inv
+        self.w = self.P @ b
+
+    def predict(self, x: np.ndarray):
+        return x @ self.w
+
+
+class SqrtExpL2Regression:
+    """
+    Square-root form of ExpL2Regression for long runs. It keeps the upper triangular
+    R with inv(P) = R.T @ R and z = R @ w, which are updated with a QR decomposition
+    instead of subtracting from P. P stays positive definite and symmetric however many
+    updates are made, which the rank-1 updates of P do not guarantee.
+    """
+
+    def __init__(
+        self,
+        num_features: int,
+        lam: float,
+        halflife: float,
+        num_targets: Optional[int] = None,
+    ):
+        """
+        Same parameters as ExpL2Regression.
+        """
+        self.n = num_features
+        self._lambda = lam
+        self.beta = np.exp(np.log(0.5) / halflife)
+        self._single = num_targets is None
+        self.R = np.eye(self.n) / np.sqrt(self._lambda)
+        self.z = np.zeros((self.n, 1 if num_targets is None else num_targets))
+
+    @property
+    def w(self) -> np.ndarray:
+        w = np.linalg.solve(self.R, self.z)
+        return w[:, 0] if self._single else w
+
+    @property
+    def P(self) -> np.ndarray:
+        R_inv = np.linalg.inv(self.R)
+        return R_inv @ R_inv.T
+
+    def update(self, x: np.ndarray, y) -> None:
+        self.update_block(np.reshape(x, (1, -1)), np.reshape(y, (1, -1)))
+
+    def update_block(self, X: np.ndarray, Y: np.ndarray) -> None:
+        """
+        Update with m samples in one call, see ExpL2Regression.update_block.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        Y = np.asarray(Y, dtype=np.float64).reshape(len(X), -1)
+        m = len(X)
+        if m == 0:
+            return
+        scale = np.sqrt(self.beta ** np.arange(m - 1, -1, -1, dtype=np.float64))
+        stacked = np.vstack(
+            [
+                np.sqrt(self.beta**m) * np.hstack([self.R, self.z]),
+                scale[:, None] * np.hstack([X, Y]),
+            ]
+        )
+        Rz = np.linalg.qr(stacked, mode="r")
+        self.R = Rz[: self.n, : self.n]
+        self.z = Rz[: self.n, self.n :]
+
+    def predict(self, x: np.ndarray):
+        return x @ self.w
@@ -0,0 +1,114 @@
+"""
+Wake-up conditions for strategies that only react to specific market situations.
+
+A strategy declares the conditions under which it wants to be called again, and the
+exchange skips all market data in between with vectorized scans over the event store
+(see TOB_Exchange.fast_forward). Every condition maps an array of events to a boolean
+mask that is True where the strategy has to wake up.
+
+Events that could fill an open order and user events are never skipped, so a change
+in the state of an order always wakes the strategy.
+"""
+
+from typing import Optional
+import numpy as np
+
+from .data_types import EventKind
+
+
+class WakeCondition:
+    def mask(self, events: np.ndarray, symbol_ids: dict, now: int) -> np.ndarray:
+        """
+        :param events: (np.ndarray) records with dtype EVENT_DTYPE
+        :param symbol_ids: (dict) symbol -> id of the event store
+        :param now: (int) timestamp at which the condition was declared
+
+        :return: (np.ndarray) boolean mask, True where the strategy wakes up
+        """
+        raise NotImplementedError
+
+
+def _between(
+    values: np.ndarray, above: Optional[float], below: Optional[float]
+) -> np.ndarray:
+    mask = np.zeros(len(values), dtype=bool)
+    if above is not None:
+        mask |= values >= above
+    if below is not None:
+        mask |= values <= below
+    return mask
+
+
+class PriceCross(WakeCondition):
+    def __init__(
+        self,
+        symbol: str,
+        above: Optional[float] = None,
+        below: Optional[float] = None,
+        price: str = "mid",
+    ) -> None:
+        """
+        Wake up on the first TOB of the symbol where the price is at or above `above`,
+        or at or below `below`.
+
+        :param price: (str) "mid", "bid" or "ask"
+        """
+        self.symbol = symbol
+        self.above = above
+        self.below = below
+        self.price = price
+
+    def mask(self, events: np.ndarray, symbol_ids: dict, now: int) -> np.ndarray:
+        if self.price == "bid":
+            values = events["bp"]
+        elif self.price == "ask":
+            values = events["ap"]
+        else:
+            values = (events["bp"] + events["ap"]) / 2
+
+        tob = (events["symbol"] == symbol_ids[self.symbol]) & (
+            events["kind"] == EventKind.TOB
+        )
+        return tob & _between(values, self.above, self.below)
+
+
+class Spread(WakeCondition):
+    def __init__(
+        self, symbol: str, above: Optional[float] = None, below: Optional[float] = None
+    ) -> None:
+        """
+        Wake up on the first TOB of the symbol where the spread (ask - bid) is at or
+        above `above`, or at or below `below`.
+        """
+        self.symbol = symbol
+        self.above = above
+        self.below = below
+
+    def mask(self, events: np.ndarray, symbol_ids: dict, now: int) -> np.ndarray:
+        tob = (events["symbol"] == symbol_ids[self.symbol]) & (
+            events["kind"] == EventKind.TOB
+        )
+        return tob & _between(events["ap"] - events["bp"], self.above, self.below)
+
+
+class At(WakeCondition):
+    def __init__(self, timestamp: int) -> None:
+        """
+        Wake up on the first event at or after the timestamp.
+        """
+        self.timestamp = timestamp
+
+    def mask(self, events: np.ndarray, symbol_ids: dict, now: int) -> np.ndarray:
+        return events["ts"] >= self.timestamp
+
+
+class Elapsed(WakeCondition):
+    def __init__(self, duration: int) -> None:
+        """
+        Wake up on the first event after `duration` (us) has passed since the
+        condition was declared.
+        """
+        self.duration = duration
+
+    def mask(self, events: np.ndarray, symbol_ids: dict, now: int) -> np.ndarray:
+        return events["ts"] >= now + self.duration
@@ -0,0 +1,50 @@
+import json
+
+import numpy as np
+
+from pySimX.benchmarks.data import synthetic_tob, synthetic_trades
+from pySimX.benchmarks.suite import compare, run_suite
+
+
+def test_synthetic_data_is_seeded():
+    assert np.array_equal(synthetic_tob(100, seed=1), synthetic_tob(100, seed=1))
+    assert not np.array_equal(synthetic_tob(100, seed=1), synthetic_tob(100, seed=2))
+    tob = synthetic_tob(100)
+    assert (tob[:, 3] > tob[:, 2]).all()
+    assert (np.diff(synthetic_trades(100)[:, 0].astype(int)) > 0).all()
+
+
+def test_suite_results_and_regressions():
+    results = run_suite(
+        events=2_000,
+        orders=500,
+        samples=1_000,
+        memory_events=1_000,
+        open_orders=[0, 10],
+        repeat=1,
+    )
+    results = json.loads(json.dumps(results))
+
+    assert set(results["results"]) == {
+        "load_tob",
+        "load_trades",
+        "simulation_step_0_orders",
+        "simulation_step_10_orders",
+        "order_book_add_order",
+        "order_book_cancel_order",
+        "order_book_add",
+        "order_book_cancel",
+        "latency_estimate",
+        "latency_estimate_many",
+    }
+    assert results["results"]["load_tob"]["events"] == 2_000
+    assert results["memory"]["load_tob_mb_per_million"] > 0
+    assert compare(results, results) == []
+
+    slower = json.loads(json.dumps(results))
+    slower["results"]["load_tob"]["events_per_s"] /= 2
+    slower["memory"]["replay_peak_mb"] *= 2
+    assert [line.split(":")[0] for line in compare(slower, results)] == [
+        "load_tob",
+        "replay_peak_mb",
+    ]
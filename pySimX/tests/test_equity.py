@@ -0,0 +1,76 @@
+import numpy as np
+
+from pySimX.src.equity import EquityRecorder
+from pySimX.src.exchange import TOB_Exchange
+from pySimX.src.latency_models import ConstantLatency
+
+SYMBOL = "BTCUSDT"
+
+# [timestamp, bid_amount, bid_price, ask_price, ask_amount]
+TOB_UPDATES = [
+    [0, 1.0, 99.0, 101.0, 1.0],
+    [10, 1.0, 99.5, 100.5, 1.0],
+    [20, 1.0, 98.0, 99.0, 1.0],
+    [30, 1.0, 100.0, 102.0, 1.0],
+]
+
+
+class BuyOnce:
+    def __init__(self, exchange: TOB_Exchange):
+        self.exchange = exchange
+        self.sent = False
+
+    def __call__(self, symbol: str):
+        return self
+
+    def run_strategy(self):
+        if not self.sent:
+            self.exchange.limit_order(SYMBOL, 0.1, 99.2, 1, 0)
+            self.sent = True
+
+
+def run(equity: EquityRecorder) -> TOB_Exchange:
+    exchange = TOB_Exchange(fees=[0, 0], latency=ConstantLatency(1), equity=equity)
+    exchange.add_market(SYMBOL, "BTC", "USDT")
+    exchange.add_balance("BTC", 1)
+    exchange.add_balance("USDT", 1_000)
+    exchange.load_tob([list(i) for i in TOB_UPDATES], SYMBOL)
+    exchange.run_simulation(BuyOnce(exchange), SYMBOL)
+    return exchange
+
+
+def test_every_event():
+    df = run(EquityRecorder()).historical_balance
+
+    assert list(df.columns) == ["BTC", "USDT", "BTCUSDT_mid", "ts"]
+    assert df["ts"].tolist() == [0, 10, 20, 30]
+    assert df["BTC"].tolist() == [1, 1, 1.1, 1.1]
+    assert np.allclose(df["USDT"], [1_000, 1_000, 990.08, 990.08])
+
+
+def test_sampling_conditions():
+    assert run(EquityRecorder(every_events=2)).historical_balance["ts"].tolist() == [
+        10,
+        30,
+    ]
+
+    by_time = EquityRecorder(every_events=None, every_us=15)
+    assert run(by_time).historical_balance["ts"].tolist() == [0, 20]
+
+    on_fills = EquityRecorder(every_events=None, on_fills=True)
+    assert run(on_fills).historical_balance["ts"].tolist() == [20]
+
+
+def test_columns_grow_and_late_columns():
+    recorder = EquityRecorder(capacity=2)
+    for i in range(5):
+        recorder.record(i, {"USDT": float(i)}, "A_mid", 1.0)
+    recorder.record(5, {"USDT": 5.0, "BTC": 1.0}, "A_mid", 1.0)
+
+    df = recorder.to_dataframe()
+    assert df["ts"].tolist() == list(range(6))
+    assert df["USDT"].tolist() == [0, 1, 2, 3, 4, 5]
+    assert df["BTC"].isna().sum() == 5
+
+    recorder.reset()
+    assert len(recorder) == 0
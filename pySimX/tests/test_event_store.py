@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+
+from pySimX.src.event_store import EventStore, StreamCursor, merge_chunks
+from pySimX.src.data_loader import convert_tardis, read_tardis, stream_tardis
+from pySimX.src.exchange import TOB_Exchange
+from pySimX.src.latency_models import ConstantLatency
+from pySimX.src.data_types import EventKind
+
+
+def make_store() -> EventStore:
+    store = EventStore()
+    store.add_tob([[0, 1, 99, 101, 1], [20, 2, 98, 102, 2]], "BTCUSDT")
+    store.add_tob([[5, 1, 9, 11, 1], [10, 3, 8, 12, 3]], "ETHUSDT")
+    store.add_trades([[10, 1, "buy", 101, 0.5]], "BTCUSDT")
+    return store
+
+
+def test_events_sorted_and_stable():
+    data = make_store().data
+
+    assert data["ts"].tolist() == [10, 10, 20]
+    # On equal timestamps the load order is kept
+    assert data["kind"].tolist() == [EventKind.TOB, EventKind.TRADE, EventKind.TOB]
+    assert data["symbol"].tolist() == [1, 0, 0]
+
+
+def test_cache_roundtrip(tmp_path):
+    store = make_store()
+    path = str(tmp_path / "events.psx")
+    store.save(path)
+
+    loaded = EventStore.load(path)
+
+    assert isinstance(loaded.data, np.memmap)
+    assert np.array_equal(loaded.data, store.data)
+    assert loaded.symbols == store.symbols
+    assert loaded.initial == store.initial
+    assert loaded.time_range == (10, 20)
+
+
+def write_tardis_files(tmp_path) -> tuple:
+    quotes = tmp_path / "binance_quotes_2023-07-01_BTCUSDT.csv.gz"
+    trades = tmp_path / "binance_trades_2023-07-01_BTCUSDT.csv.gz"
+    pd.DataFrame(
+        {
+            "exchange": "binance",
+            "symbol": "BTCUSDT",
+            "timestamp": [0, 10, 30],
+            "local_timestamp": [1, 11, 31],
+            "ask_amount": [1.0, 2.0, 3.0],
+            "ask_price": [101.0, 102.0, 103.0],
+            "bid_price": [99.0, 98.0, 97.0],
+            "bid_amount": [4.0, 5.0, 6.0],
+        }
+    ).to_csv(quotes, index=False)
+    pd.DataFrame(
+        {
+            "exchange": "binance",
+            "symbol": "BTCUSDT",
+            "timestamp": [20],
+            "local_timestamp": [21],
+            "id": [1],
+            "side": ["sell"],
+            "price": [98.0],
+            "amount": [0.1],
+        }
+    ).to_csv(trades, index=False)
+
+    return str(quotes), str(trades)
+
+
+def test_convert_tardis(tmp_path):
+    quotes, trades = write_tardis_files(tmp_path)
+
+    path = str(tmp_path / "events.psx")
+    convert_tardis([quotes], [trades], path)
+
+    exchange = TOB_Exchange(latency=ConstantLatency(1))
+    exchange.load_cache(path)
+    exchange.prepare_backtest()
+
+    assert exchange.markets["BTCUSDT"].bq == 4.0
+    assert exchange.markets["BTCUSDT"].ap == 101.0
+
+    while exchange.has_events():
+        exchange._simulation_step()
+
+    assert exchange.last_timestamp == 30
+    assert exchange.markets["BTCUSDT"].bp == 97.0
+
+
+def test_merge_chunks_matches_sort():
+    rng = np.random.default_rng(0)
+    store = EventStore()
+    streams = []
+    for symbol in ["A", "B", "C"]:
+        ts = np.sort(rng.integers(0, 50, 200))
+        values = np.column_stack([ts, np.ones((200, 4))])
+        store.add_tob(np.vstack([[0, 1, 1, 1, 1], values]), symbol)
+        chunks = np.array_split(store._chunks[-1], [7, 30, 31, 120])
+        streams.append(chunks)
+
+    merged = np.concatenate(list(merge_chunks(streams)))
+
+    assert np.array_equal(merged, store.data)
+
+
+def test_stream_tardis_matches_store(tmp_path):
+    quotes, trades = write_tardis_files(tmp_path)
+    store = read_tardis([quotes], [trades])
+    stream = stream_tardis([quotes], [trades], chunk_size=1)
+
+    cursor = stream.cursor()
+    rows = []
+    while cursor.head is not None:
+        rows.append(cursor.head)
+        cursor.advance()
+
+    assert stream.initial == store.initial
+    assert rows == store.data.tolist()
+
+    exchange = TOB_Exchange(latency=ConstantLatency(1), events=stream)
+    exchange.prepare_backtest()
+    while exchange.has_events():
+        exchange._simulation_step()
+
+    assert exchange.markets["BTCUSDT"].ap == 103.0
+
+
+def test_skip_run_stream_and_replay_cursor():
+    store = EventStore()
+    store.add_tob([[t, 1, 1, 2, 1] for t in range(0, 300)], "A")
+    store.add_tob([[0, 1, 1, 2, 1], [150, 1, 1, 2, 1]], "B")
+    store.add_trades([[160, 1, "buy", 2, 1], [170, 1, "buy", 2, 1]], "A")
+    data = store.data
+    stream = [data[i : i + 10] for i in range(0, len(data), 10)]
+
+    for cursor in [store.cursor(block_size=16), StreamCursor(stream)]:
+        last_tob, last = cursor.skip_run(0)
+        assert last_tob[0] == 150 and last == last_tob
+        assert cursor.head[1] == 1
+
+        cursor.advance()
+        last_tob, last = cursor.skip_run(0, limit=165)
+        assert last_tob[0] == 165
+        assert cursor.head[0] == 166
+
+        assert cursor.skip_run(1) == (None, None)
@@ -0,0 +1,300 @@
+import numpy as np
+
+from pySimX.src.exchange import TOB_Exchange
+from pySimX.src.latency_models import ConstantLatency
+from pySimX.src.data_types import OrderStatus
+
+SYMBOL = "BTCUSDT"
+
+# [timestamp, bid_amount, bid_price, ask_price, ask_amount]
+TOB_UPDATES = [
+    [0, 1.0, 99.0, 101.0, 1.0],
+    [10, 1.0, 99.5, 100.5, 1.0],
+    [20, 1.0, 98.0, 99.0, 1.0],
+    [30, 1.0, 100.0, 102.0, 1.0],
+]
+
+# [timestamp, id, side, price, amount]
+TRADES = [
+    [15, 1, "sell", 99.5, 0.5],
+    [25, 2, "buy", 99.0, 0.1],
+]
+
+
+def make_exchange(latency: int = 1) -> TOB_Exchange:
+    exchange = TOB_Exchange(fees=[0, 0], latency=ConstantLatency(latency))
+    exchange.add_market(SYMBOL, "BTC", "USDT")
+    exchange.add_balance("BTC", 1)
+    exchange.add_balance("USDT", 1_000)
+    exchange.load_tob([list(i) for i in TOB_UPDATES], SYMBOL)
+    exchange.load_trades([list(i) for i in TRADES], SYMBOL)
+    exchange.prepare_backtest()
+    return exchange
+
+
+def test_replay_in_timestamp_order():
+    exchange = make_exchange()
+    timestamps = []
+    while exchange.has_events():
+        exchange._simulation_step()
+        timestamps.append(exchange.last_timestamp)
+
+    assert timestamps == [10, 15, 20, 25, 30]
+    assert exchange.markets[SYMBOL].bp == 100.0
+    assert exchange.markets[SYMBOL].ap == 102.0
+
+
+def test_loading_does_not_mutate_input():
+    updates = [[1.5, 1.0, 99.0, 101.0, 1.0], [2.5, 1.0, 99.0, 101.0, 1.0]]
+    exchange = TOB_Exchange()
+    exchange.load_tob(updates, SYMBOL)
+
+    assert updates[1][0] == 2.5
+    assert exchange.events.data["ts"].tolist() == [2]
+
+
+def test_limit_order_filled_by_tob():
+    exchange = make_exchange()
+    exchange.limit_order(SYMBOL, 0.1, 99.2, 1, 0)
+
+    while exchange.has_events():
+        exchange._simulation_step()
+
+    assert len(exchange.trades) == 1
+    assert exchange.trades[0].eventTime == 20
+    assert exchange.orders[0].status == OrderStatus.FILLED
+    assert exchange.balances["BTC"] == 1.1
+
+
+def test_limit_order_filled_by_public_trade():
+    exchange = make_exchange()
+    exchange.limit_order(SYMBOL, 0.1, 99.5, 1, 0)
+
+    while exchange.has_events():
+        exchange._simulation_step()
+
+    assert len(exchange.trades) == 1
+    assert exchange.trades[0].eventTime == 15
+    assert exchange.trades[0].price == 99.5
+
+
+def test_user_event_after_market_data_on_same_timestamp():
+    exchange = make_exchange(latency=10)
+    exchange.market_order(SYMBOL, 0.1, 1, 0)
+
+    exchange._simulation_step()
+
+    # The order arrives at 10, together with the TOB update which is applied first
+    assert exchange.last_timestamp == 10
+    assert len(exchange.trades) == 0
+
+    exchange._simulation_step()
+
+    assert exchange.trades[0].price == 100.5
+
+
+def test_prepare_backtest_resets_run():
+    exchange = make_exchange()
+    exchange.limit_order(SYMBOL, 0.1, 99.2, 1, 0)
+    while exchange.has_events():
+        exchange._simulation_step()
+
+    exchange.prepare_backtest()
+
+    assert exchange.trades == []
+    assert exchange.balances == {"BTC": 1, "USDT": 1_000}
+    assert exchange.markets[SYMBOL].bp == 99.0
+    assert len(exchange.open_orders[SYMBOL][1]) == 0
+
+
+def test_spot_fees_paid_on_both_sides():
+    exchange = make_exchange()
+    exchange.taker_fee = 10 / 10_000
+    exchange.market_order(SYMBOL, 0.1, 1, 0)
+    exchange.market_order(SYMBOL, 0.1, 0, 0)
+    while exchange.has_events():
+        exchange._simulation_step()
+
+    # Bought at 101 and sold at 99, both pay 0.1% of their notional
+    assert [(t.side, t.price) for t in exchange.trades] == [(1, 101.0), (0, 99.0)]
+    assert exchange.balances["BTC"] == 1
+    assert np.isclose(exchange.balances["USDT"], 1_000 - 10.1 * 1.001 + 9.9 * 0.999)
+
+
+def test_exchanges_share_event_store():
+    exchange = make_exchange()
+    other = TOB_Exchange(latency=ConstantLatency(1), events=exchange.events)
+    other.prepare_backtest()
+
+    assert other.events.data is exchange.events.data
+    assert not exchange.events.data.flags.writeable
+
+    while other.has_events():
+        other._simulation_step()
+
+    # The replay of the second exchange does not move the cursor of the first one
+    assert other.markets[SYMBOL].ap == 102.0
+    assert exchange.markets[SYMBOL].ap == 101.0
+    assert len(exchange._cursor) == 5
+
+
+def test_tob_updated_in_place():
+    exchange = make_exchange()
+    market = exchange.markets[SYMBOL]
+
+    exchange._simulation_step()
+
+    assert exchange.markets[SYMBOL] is market
+    assert market.timestamp == 10
+    assert market.ap == 100.5
+    assert not hasattr(market, "__dict__")
+
+
+def test_batched_market_data_gives_same_fills():
+    results = []
+    for batch in [False, True]:
+        exchange = TOB_Exchange(
+            fees=[0, 0], latency=ConstantLatency(5), batch_market_data=batch
+        )
+        exchange.add_market(SYMBOL, "BTC", "USDT")
+        exchange.add_balance("BTC", 10)
+        exchange.add_balance("USDT", 10_000)
+        mids = [100 + (i % 20) / 10 for i in range(200)]
+        exchange.load_tob(
+            [[i, 1, m - 0.05, m + 0.05, 1] for i, m in enumerate(mids)], SYMBOL
+        )
+        exchange.load_trades(
+            [[i + 0.5, i, "sell", mids[i] - 1, 1] for i in range(0, 200, 7)], SYMBOL
+        )
+        exchange.prepare_backtest()
+
+        # Orders are sent independent of what the strategy observes
+        for i in range(0, 200, 30):
+            exchange.limit_order(SYMBOL, 0.1, 100.0 + i / 200, 1, i)
+            exchange.limit_order(SYMBOL, 0.1, 101.5 + i / 200, 0, i)
+
+        steps = 0
+        while exchange.has_events():
+            exchange._simulation_step()
+            steps += 1
+
+        results.append((steps, [(t.eventTime, t.price) for t in exchange.trades]))
+
+    assert len(results[0][1]) > 0
+    assert results[0][1] == results[1][1]
+    assert results[1][0] < results[0][0]
+
+
+def test_orders_at_same_price_queue_up():
+    exchange = make_exchange()
+    exchange.limit_order(SYMBOL, 0.1, 99.2, 1, 0)
+    exchange.limit_order(SYMBOL, 0.2, 99.2, 1, 0)
+    exchange._simulation_step()
+    exchange._simulation_step()
+
+    assert len(exchange.open_orders[SYMBOL][1]) == 2
+
+    while exchange.has_events():
+        exchange._simulation_step()
+
+    assert [t.amount for t in exchange.trades] == [0.1, 0.2]
+
+
+def test_prices_and_amounts_on_the_grid():
+    exchange = make_exchange()
+    # 99.1 + 0.1 is 99.19999999999999 as a float, it queues at the level of 99.2
+    exchange.limit_order(SYMBOL, 0.1, 99.2, 1, 0)
+    exchange.limit_order(SYMBOL, 0.1 + 0.2, 99.1 + 0.1, 1, 0)
+    exchange._simulation_step()
+    exchange._simulation_step()
+
+    orders = exchange.open_orders[SYMBOL][1]
+    assert len(orders.levels) == 1
+    assert [(o.price, o.amount) for o in orders] == [(99.2, 0.1), (99.2, 0.3)]
+
+
+def test_tob_fills_best_price_first():
+    exchange = make_exchange()
+    exchange.limit_order(SYMBOL, 0.1, 99.1, 1, 0)
+    exchange.limit_order(SYMBOL, 0.1, 99.3, 1, 0)
+    exchange.limit_order(SYMBOL, 0.1, 99.4, 0, 0)
+    exchange.limit_order(SYMBOL, 0.1, 99.3, 0, 0)
+
+    while exchange.has_events():
+        exchange._simulation_step()
+
+    assert [(t.side, t.price) for t in exchange.trades] == [
+        (0, 99.3),
+        (0, 99.4),
+        (1, 99.3),
+        (1, 99.1),
+    ]
+
+
+def test_cancel_and_modify_by_order_id():
+    exchange = make_exchange()
+    exchange.limit_order(SYMBOL, 0.1, 99.2, 1, 0)
+    exchange.limit_order(SYMBOL, 0.2, 99.2, 1, 0)
+    exchange.limit_order(SYMBOL, 0.3, 90.0, 1, 0)
+    for _ in range(3):
+        exchange._simulation_step()
+
+    tick = exchange.instruments[SYMBOL].ticks(99.2)
+    first, second = exchange.open_orders[SYMBOL][1].levels[tick].values()
+    low = exchange.open_orders[SYMBOL][1].peekitem(0)[1]
+    exchange.cancel_order(first)
+    exchange.modify_order(low, price=99.0)
+
+    while exchange.has_events():
+        exchange._simulation_step()
+
+    assert first.status == OrderStatus.CANCELLED
+    assert [(t.order_id, t.price) for t in exchange.trades] == [
+        (second.order_id, 99.2),
+        (low.order_id, 99.0),
+    ]
+    assert len(exchange.open_orders[SYMBOL][1]) == 0
+
+
+def test_submit_orders_and_cancel_all_as_one_message():
+    exchange = make_exchange()
+    first = exchange.limit_order(SYMBOL, 0.1, 95.0, 1, 0)
+    exchange._simulation_step()
+
+    orders = exchange.submit_orders(
+        [(SYMBOL, 0.1, 98.0, 1), (SYMBOL, 0.2, 97.0, 1), (SYMBOL, 0.1, 103.0, 0)],
+        1,
+        cancels=[first],
+    )
+    assert len(exchange.live_events) == 1
+    exchange._simulation_step()
+
+    assert first.status == OrderStatus.CANCELLED
+    assert list(exchange.open_orders[SYMBOL][1]) == [orders[1], orders[0]]
+    assert list(exchange.open_orders[SYMBOL][0]) == [orders[2]]
+
+    exchange.cancel_all(SYMBOL, side=1)
+    exchange._simulation_step()
+
+    assert len(exchange.open_orders[SYMBOL][1]) == 0
+    assert len(exchange.open_orders[SYMBOL][0]) == 1
+    assert all(o.status == OrderStatus.CANCELLED for o in orders[:2])
+
+
+def test_replace_order_is_atomic():
+    exchange = make_exchange()
+    resting = exchange.limit_order(SYMBOL, 0.1, 95.0, 1, 0)
+    filled = exchange.limit_order(SYMBOL, 0.1, 99.5, 1, 0)
+    while exchange.last_timestamp != 15:
+        exchange._simulation_step()
+    assert filled.status == OrderStatus.FILLED
+
+    replaced = exchange.replace_order(resting, price=96.0)
+    not_placed = exchange.replace_order(filled, price=97.0)
+    exchange._simulation_step()
+    exchange._simulation_step()
+
+    assert resting.status == OrderStatus.CANCELLED
+    assert not_placed.status == OrderStatus.CANCELLED
+    assert list(exchange.open_orders[SYMBOL][1]) == [replaced]
+    assert (replaced.price, replaced.amount) == (96.0, 0.1)
@@ -0,0 +1,139 @@
+import os
+
+import numpy as np
+import pytest
+
+from pySimX.src.exchange import TOB_Exchange
+from pySimX.src.feature_columns import LookAheadError
+from pySimX.src.features import (
+    EMA,
+    Imbalance,
+    Microprice,
+    OrderFlowImbalance,
+    RollingQuantile,
+    TradeVolume,
+    Variance,
+)
+from pySimX.src.latency_models import ConstantLatency
+
+SYMBOL = "BTCUSDT"
+
+
+def features():
+    return [
+        Microprice(SYMBOL),
+        Imbalance(SYMBOL),
+        OrderFlowImbalance(SYMBOL, halflife_us=50),
+        EMA(SYMBOL, lookback_us=100),
+        Variance(SYMBOL, lookback_us=100),
+        RollingQuantile(SYMBOL, 0.25, window=10),
+        TradeVolume(SYMBOL, window_us=40, signed=True),
+    ]
+
+
+def make_exchange() -> TOB_Exchange:
+    rng = np.random.default_rng(3)
+    n = 500
+    ts = np.cumsum(rng.integers(1, 20, n))
+    mid = 100 + np.cumsum(rng.choice([-0.5, 0, 0.5], n))
+    tob = np.column_stack(
+        [ts, rng.integers(1, 5, n), mid - 0.5, mid + 0.5, rng.integers(1, 5, n)]
+    )
+    trades = [
+        [t, i, "buy" if rng.random() < 0.5 else "sell", 100.0, rng.random()]
+        for i, t in enumerate(np.sort(rng.integers(0, ts[-1], 200)).tolist())
+    ]
+
+    exchange = TOB_Exchange(fees=[0, 0], latency=ConstantLatency(1))
+    exchange.add_market(SYMBOL, "BTC", "USDT")
+    exchange.add_balance("BTC", 1)
+    exchange.add_balance("USDT", 1_000)
+    exchange.load_tob(tob, SYMBOL)
+    exchange.load_trades(trades, SYMBOL)
+    return exchange
+
+
+def test_columns_match_incremental_features():
+    exchange = make_exchange()
+    names = [exchange.add_column(feature) for feature in features()]
+    for feature in features():
+        exchange.add_feature(feature)
+
+    exchange.prepare_backtest()
+    while True:
+        for name in names:
+            assert np.allclose(
+                exchange.columns[name], exchange.features[name], equal_nan=True
+            )
+        if not exchange.has_events():
+            break
+        exchange._simulation_step()
+
+    assert exchange.columns.index == len(exchange.events.data)
+
+
+def test_no_reads_past_the_current_row():
+    exchange = make_exchange()
+    name = exchange.add_column(Microprice(SYMBOL))
+    exchange.prepare_backtest()
+    for _ in range(5):
+        exchange._simulation_step()
+
+    assert exchange.columns.at(name, 5) == exchange.columns[name]
+    assert len(exchange.columns.history(name, 100)) == 6
+    with pytest.raises(LookAheadError):
+        exchange.columns.at(name, 6)
+    # A negative row would wrap around to the last row of the data
+    with pytest.raises(IndexError):
+        exchange.columns.at(name, -1)
+    with pytest.raises(ValueError):
+        exchange.columns.history(name, 0)
+    with pytest.raises(ValueError):
+        exchange.columns.history(name, 1)[0] = 0
+
+
+def test_columns_cached_next_to_the_data(tmp_path):
+    path = str(tmp_path / "events.cache")
+    make_exchange().events.save(path)
+
+    exchange = TOB_Exchange(fees=[0, 0], latency=ConstantLatency(1))
+    exchange.load_cache(path)
+    name = exchange.add_column(EMA(SYMBOL, lookback_us=100))
+    exchange.prepare_backtest()
+    expected = exchange.columns.history(name, 1_000).copy()
+    files = os.listdir(path + ".features")
+    assert len(files) == 1
+
+    # A new exchange memory-maps the cached column instead of computing it
+    other = TOB_Exchange(fees=[0, 0], latency=ConstantLatency(1))
+    other.load_cache(path)
+    other.add_column(EMA(SYMBOL, lookback_us=100))
+    other.prepare_backtest()
+    column = other.columns._columns[name]
+    assert isinstance(column, np.memmap)
+    assert np.array_equal(column, exchange.columns._columns[name], equal_nan=True)
+    assert np.array_equal(other.columns.history(name, 1_000), expected)
+
+
+def test_rolling_quantile_in_blocks():
+    rows = make_exchange().events.data
+    rows = rows[rows["kind"] == 0]
+    feature = RollingQuantile(SYMBOL, 0.25, window=10)
+    expected = feature.column(rows)
+    # Three windows per block
+    feature.block = 30
+    assert np.array_equal(feature.column(rows), expected)
+
+
+def test_columns_recomputed_for_new_data():
+    exchange = make_exchange()
+    name = exchange.add_column(Microprice(SYMBOL))
+    exchange.prepare_backtest()
+
+    exchange.events.add_tob([[10_000, 1, 200.0, 201.0, 3]], SYMBOL)
+    exchange.prepare_backtest()
+    while exchange.has_events():
+        exchange._simulation_step()
+
+    assert len(exchange.columns._columns[name]) == len(exchange.events.data) + 1
+    assert exchange.columns[name] == 200.25
@@ -0,0 +1,92 @@
+import numpy as np
+
+from pySimX.src.exchange import TOB_Exchange
+from pySimX.src.features import (
+    EMA,
+    Imbalance,
+    Microprice,
+    OrderFlowImbalance,
+    RollingQuantile,
+    TradeVolume,
+)
+from pySimX.src.latency_models import ConstantLatency
+from pySimX.src.wakeup import PriceCross
+
+SYMBOL = "BTCUSDT"
+
+# [timestamp, bid_amount, bid_price, ask_price, ask_amount]
+TOB_UPDATES = [
+    [0, 1.0, 99.0, 101.0, 1.0],
+    [10, 3.0, 99.0, 101.0, 1.0],
+    [20, 3.0, 100.0, 101.0, 2.0],
+    [30, 1.0, 98.0, 99.0, 1.0],
+]
+
+# [timestamp, id, side, price, amount]
+TRADES = [
+    [5, 1, "buy", 101.0, 0.5],
+    [15, 2, "sell", 99.0, 0.2],
+    [25, 3, "buy", 101.0, 1.0],
+]
+
+
+def make_exchange(batch=False) -> TOB_Exchange:
+    exchange = TOB_Exchange(
+        fees=[0, 0], latency=ConstantLatency(1), batch_market_data=batch
+    )
+    exchange.add_market(SYMBOL, "BTC", "USDT")
+    exchange.add_balance("BTC", 1)
+    exchange.add_balance("USDT", 1_000)
+    exchange.load_tob([list(i) for i in TOB_UPDATES], SYMBOL)
+    exchange.load_trades([list(i) for i in TRADES], SYMBOL)
+    return exchange
+
+
+def run(exchange) -> list:
+    exchange.prepare_backtest()
+    rows = [exchange.features.values.copy()]
+    while exchange.has_events():
+        exchange._simulation_step()
+        rows.append(exchange.features.values.copy())
+    return rows
+
+
+def test_features_follow_the_market_data():
+    exchange = make_exchange()
+    micro = exchange.add_feature(Microprice(SYMBOL))
+    imbalance = exchange.add_feature(Imbalance(SYMBOL))
+    ofi = exchange.add_feature(OrderFlowImbalance(SYMBOL, halflife_us=10))
+    flow = exchange.add_feature(TradeVolume(SYMBOL, window_us=12, signed=True))
+    rows = np.array(run(exchange))
+
+    # The initial TOB, then the events at 5, 10, 15, 20, 25 and 30
+    assert rows[:, micro].tolist() == [100, 100, 100.5, 100.5, 100.6, 100.6, 98.5]
+    assert rows[-1, imbalance] == 0
+    assert np.isnan(rows[0, flow])
+    assert rows[1:, flow].tolist() == [0.5, 0.5, 0.3, 0.3, 0.8, 0.8]
+    # 2 more on the bid at 10, then the bid moves up with 3 and the ask grows by 1
+    assert rows[2, ofi] == 2
+    assert rows[4, ofi] == 2 * 0.5 + 3 - 1
+    assert exchange.features[f"{SYMBOL}_ofi"] == rows[-1, ofi]
+
+
+def test_features_are_reset_and_not_batched():
+    exchange = make_exchange(batch=True)
+    ema = exchange.add_feature(EMA(SYMBOL, lookback_us=20))
+    median = exchange.add_feature(RollingQuantile(SYMBOL, 0.5, window=3))
+    first = run(exchange)
+    second = run(exchange)
+
+    # Every event is applied on its own, batching would skip the TOB at 10 and 20
+    assert len(first) == len(TOB_UPDATES) + len(TRADES)
+    assert np.array_equal(first, second)
+    assert first[-1][median] == 100
+    assert first[-1][ema] == (100 * 0.5 + 100.5 * 0.5) * 0.5 + 98.5 * 0.5
+
+
+def test_fast_forward_stops_at_symbols_with_features():
+    exchange = make_exchange()
+    exchange.add_feature(Microprice(SYMBOL))
+    exchange.prepare_backtest()
+
+    assert exchange.fast_forward([PriceCross(SYMBOL, below=50)]) == 0
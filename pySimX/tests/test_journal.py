@@ -0,0 +1,76 @@
+import numpy as np
+
+from pySimX.src.exchange import TOB_Exchange
+from pySimX.src.journal import Journal, JournalKind
+from pySimX.src.latency_models import ConstantLatency
+
+SYMBOL = "BTCUSDT"
+
+# [timestamp, bid_amount, bid_price, ask_price, ask_amount]
+TOB_UPDATES = [
+    [0, 1.0, 99.0, 101.0, 1.0],
+    [10, 1.0, 99.5, 100.5, 1.0],
+    [20, 1.0, 98.0, 99.0, 1.0],
+    [30, 1.0, 100.0, 102.0, 1.0],
+]
+
+
+def make_exchange(journal: Journal) -> TOB_Exchange:
+    exchange = TOB_Exchange(fees=[0, 0], latency=ConstantLatency(1), journal=journal)
+    exchange.add_market(SYMBOL, "BTC", "USDT")
+    exchange.add_balance("BTC", 1)
+    exchange.add_balance("USDT", 1_000)
+    exchange.load_tob([list(i) for i in TOB_UPDATES], SYMBOL)
+    exchange.prepare_backtest()
+    return exchange
+
+
+def test_ring_buffer_keeps_latest_records():
+    journal = Journal(capacity=3)
+    for i in range(5):
+        journal.record(i, JournalKind.OPEN, i, 1.0, 1.0)
+
+    assert len(journal) == 3
+    assert journal.dropped == 2
+    assert journal.to_numpy()["ts"].tolist() == [2, 3, 4]
+
+    journal.clear()
+    assert len(journal) == 0
+
+
+def test_exchange_records_orders_and_fills():
+    journal = Journal()
+    exchange = make_exchange(journal)
+
+    exchange.limit_order(SYMBOL, 0.1, 99.2, 1, 0)
+    exchange.limit_order(SYMBOL, 100, 99.2, 1, 0)
+
+    while exchange.has_events():
+        exchange._simulation_step()
+
+    df = journal.to_dataframe()
+    assert df["kind"].tolist() == ["OPEN", "REJECT", "FILL"]
+    assert df["ts"].tolist() == [1, 1, 20]
+    assert np.allclose(df["price"], [99.2, 99.2, 99.2])
+
+
+def test_journal_cleared_on_rerun():
+    journal = Journal()
+    exchange = make_exchange(journal)
+    exchange.limit_order(SYMBOL, 0.1, 90, 1, 0)
+    exchange._simulation_step()
+
+    exchange.prepare_backtest()
+
+    assert len(journal) == 0
+
+
+def test_no_journal_by_default():
+    exchange = make_exchange(None)
+    exchange.limit_order(SYMBOL, 0.1, 99.2, 1, 0)
+
+    while exchange.has_events():
+        exchange._simulation_step()
+
+    assert exchange.journal is None
+    assert len(exchange.trades) == 1
@@ -0,0 +1,42 @@
+import numpy as np
+
+from pySimX.src.exchange import TOB_Exchange
+from pySimX.src.latency_models import ConstantLatency, LogNormalLatency
+
+
+def test_lognormal_reproducible():
+    a = LogNormalLatency(5000, 0.3, seed=1, block_size=16)
+    b = LogNormalLatency(5000, 0.3, seed=1, block_size=16)
+
+    samples = [a.estimate() for _ in range(40)]
+
+    assert samples == [b.estimate() for _ in range(40)]
+    assert all(isinstance(i, float) and i > 0 for i in samples)
+
+
+def test_lognormal_reseed():
+    model = LogNormalLatency(5000, 0.3, seed=1)
+    first = [model.estimate() for _ in range(5)]
+
+    model.seed(1)
+
+    assert [model.estimate() for _ in range(5)] == first
+
+
+def test_estimate_many():
+    model = LogNormalLatency(5000, 0.3, seed=2)
+    samples = model.estimate_many(100_000)
+
+    assert samples.shape == (100_000,)
+    assert abs(np.median(samples) / 5000 - 1) < 0.01
+
+    assert np.array_equal(ConstantLatency(10).estimate_many(3), [10, 10, 10])
+
+
+def test_default_exchange_latency_is_seeded():
+    first, second = TOB_Exchange(), TOB_Exchange()
+
+    assert first.latency is not second.latency
+    assert [first.latency.estimate() for _ in range(5)] == [
+        second.latency.estimate() for _ in range(5)
+    ]
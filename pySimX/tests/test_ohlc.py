@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+
+from pySimX.src.backtest import backtest
+from pySimX.src.exchange import OHLCExchange
+from pySimX.src.ohlc import simulate_bars
+
+SYMBOL = "BTCUSDT"
+
+OHLC = pd.DataFrame(
+    {
+        "timestamp": [0, 60, 120, 180, 240],
+        "open": [100.0, 101.0, 103.0, 99.0, 98.0],
+        "high": [102.0, 104.0, 104.0, 100.0, 101.0],
+        "low": [99.0, 100.0, 98.0, 97.0, 97.5],
+        "close": [101.0, 103.0, 99.0, 98.0, 100.0],
+    }
+)
+
+TARGET = np.array([1.0, 1.0, 0.0, 2.0, 2.0])
+
+
+class FollowTarget:
+    def __init__(self, exchange):
+        self.exchange = exchange
+        self.position = 0.0
+
+    def run_strategy(self):
+        t = len(self.exchange.ohlc(SYMBOL)["close"]) - 1
+        delta = TARGET[t] - self.position
+        if delta != 0:
+            self.exchange.market_order(SYMBOL, abs(delta), int(delta > 0))
+            self.position = TARGET[t]
+
+
+def test_next_open_fills():
+    result = backtest(OHLC).run(TARGET, fees=[0, 10], initial_quote=1_000)
+
+    assert result.position.tolist() == [0, 1, 1, 0, 2]
+    assert np.array_equal(result.price, [np.nan, 101.0, np.nan, 99.0, 98.0], True)
+    assert np.allclose(result.fees, [0, 0.101, 0, 0.099, 0.196])
+    assert np.isclose(result.equity[-1], 1_000 - 101 + 99 - 196 + 200 - 0.396)
+
+
+def test_limit_fills():
+    limit = np.array([100.5, 99.0, 98.5, 97.0, np.nan])
+    result = simulate_bars(
+        OHLC["open"],
+        OHLC["high"],
+        OHLC["low"],
+        OHLC["close"],
+        TARGET,
+        fill="limit",
+        limit=limit,
+    )
+
+    # The buy at 100.5 fills on the second bar, the sell at 98.5 on the fourth bar at
+    # its open of 99 and the buy at 97 is not reached by the last bar
+    assert result.position.tolist() == [0, 1, 1, 0, 0]
+    assert np.array_equal(result.price, [np.nan, 100.5, np.nan, 99.0, np.nan], True)
+    assert result.fees.sum() == 0
+
+
+def test_configs_run_as_columns():
+    targets = np.column_stack([TARGET, np.zeros(5), TARGET * 2])
+    result = backtest(OHLC).run(targets)
+
+    for i in range(targets.shape[1]):
+        single = backtest(OHLC).run(targets[:, i])
+        assert np.allclose(result.equity[:, i], single.equity)
+
+
+def test_event_driven_matches_vectorized():
+    vectorized = backtest(OHLC).run(TARGET, fees=[0, 10], initial_quote=1_000)
+    exchange = backtest(OHLC).run_events(
+        FollowTarget, SYMBOL, "BTC", "USDT", fees=[0, 10], initial_quote=1_000
+    )
+
+    assert [t.price for t in exchange.trades] == [101.0, 99.0, 98.0]
+    assert exchange.balances["BTC"] == vectorized.position[-1]
+    assert np.isclose(exchange.balances["USDT"], vectorized.quote[-1])
+
+    df = exchange.historical_balance
+    assert np.allclose(df["USDT"] + df["BTC"] * df["BTCUSDT_mid"], vectorized.equity)
+
+
+def test_event_driven_limit_orders():
+    exchange = OHLCExchange(fees=[0, 0])
+    exchange.add_market(SYMBOL, "BTC", "USDT")
+    exchange.add_balance("BTC", 0)
+    exchange.add_balance("USDT", 1_000)
+    exchange.load_ohlc(OHLC, SYMBOL)
+    exchange.prepare_backtest()
+    exchange._simulation_step()
+    buy = exchange.limit_order(SYMBOL, 1, 99.5, 1)
+    sell = exchange.limit_order(SYMBOL, 1, 110, 0)
+
+    while exchange.has_events():
+        exchange._simulation_step()
+
+    # The buy rests until the third bar reaches it, the sell without base is rejected
+    assert [(t.price, t.eventTime, t.taker) for t in exchange.trades] == [
+        (99.5, 120, False)
+    ]
+    assert sell.order_id not in exchange.open_orders[SYMBOL][0]
+    assert buy.remainingAmount == 0
+
+
+class LimitTarget:
+    limit = np.array([99.5, 99.0, 98.5, 97.0, np.nan])
+
+    def __init__(self, exchange, bars):
+        self.exchange = exchange
+        self.bars = bars
+
+    def run_strategy(self):
+        t = len(self.exchange.ohlc(SYMBOL)["close"]) - 1
+        delta = TARGET[t] - self.exchange.balances["BTC"]
+        if delta != 0 and not np.isnan(self.limit[t]):
+            self.exchange.limit_order(
+                SYMBOL, abs(delta), self.limit[t], int(delta > 0), bars=self.bars
+            )
+
+
+def test_limit_orders_live_for_one_bar_like_vectorized():
+    vectorized = backtest(OHLC).run(
+        TARGET, fees=[0, 0], fill="limit", limit=LimitTarget.limit
+    )
+    one_bar = backtest(OHLC).run_events(
+        lambda exchange: LimitTarget(exchange, bars=1), SYMBOL, "BTC", "USDT"
+    )
+    resting = backtest(OHLC).run_events(
+        lambda exchange: LimitTarget(exchange, bars=None), SYMBOL, "BTC", "USDT"
+    )
+
+    # The buy at 99.5 is not reached by the second bar and expires, the buy at 99 of
+    # the next close fills on the third bar
+    assert vectorized.position.tolist() == [0, 0, 1, 0, 0]
+    assert [(t.eventTime, t.price) for t in one_bar.trades] == [
+        (120, 99.0),
+        (180, 99.0),
+    ]
+    assert np.isclose(one_bar.balances["USDT"], vectorized.quote[-1])
+
+    # Resting orders are not replaced, both buys fill on the third bar
+    assert [(t.eventTime, t.price) for t in resting.trades][:2] == [
+        (120, 99.5),
+        (120, 99.0),
+    ]
@@ -0,0 +1,125 @@
+import numpy as np
+
+from pySimX.src.utils.one_pass_calculations import (
+    ExpL2Regression,
+    SqrtExpL2Regression,
+    mean,
+    var,
+    vector_mean,
+    vector_var,
+)
+
+N = 5
+TS = np.cumsum(np.random.default_rng(0).integers(1, 50, 200))
+X = 100 + np.cumsum(np.random.default_rng(1).normal(size=(200, N)), axis=0)
+
+
+def scalar_run(make, update):
+    objects = [make() for _ in range(N)]
+    return np.array(
+        [[update(o, x, t) for o, x in zip(objects, row)] for row, t in zip(X, TS)]
+    )
+
+
+def test_vector_mean_matches_scalar():
+    expected = scalar_run(lambda: mean(100), lambda o, x, t: o.update(x, t))
+
+    single = vector_mean(N, 100)
+    assert np.array_equal(
+        [single.update(row, t).copy() for row, t in zip(X, TS)], expected
+    )
+
+    # A warm-up block followed by single updates
+    block = vector_mean(N, 100)
+    assert np.allclose(block.update_block(X[:150], TS[:150]), expected[:150])
+    assert np.allclose(block.update(X[150], TS[150]), expected[150])
+
+
+def test_vector_var_matches_scalar():
+    expected = scalar_run(
+        lambda: var(100, calculate_ema=True, calculate_pct_change=True),
+        lambda o, x, t: o.update(x, t),
+    )
+
+    single = vector_var(N, 100, calculate_ema=True, calculate_pct_change=True)
+    assert np.array_equal(
+        [single.update(row, t).copy() for row, t in zip(X, TS)], expected
+    )
+
+    block = vector_var(N, 100, calculate_ema=True, calculate_pct_change=True)
+    assert np.allclose(block.update_block(X[:150], TS[:150]), expected[:150])
+    assert np.allclose(block.update_block(X[150:], TS[150:]), expected[150:])
+
+
+def test_nan_leaves_series_unchanged():
+    m = vector_mean(2, 100)
+    m.update([1.0, np.nan], 10)
+    m.update([np.nan, 5.0], 20)
+    out = m.update_block([[3.0, np.nan]], [60])
+
+    assert np.array_equal(out, [[2.0, 5.0]])
+    assert m.last_ts.tolist() == [60, 20]
+
+
+def test_block_with_nan_matches_single_updates():
+    rng = np.random.default_rng(3)
+    x = np.where(rng.random(X.shape) < 0.3, np.nan, X)
+    x[:20, 0] = np.nan
+
+    for make in [
+        lambda: vector_mean(N, 100),
+        lambda: vector_var(N, 100, calculate_ema=True, calculate_pct_change=True),
+    ]:
+        single = make()
+        expected = [single.update(row, t).copy() for row, t in zip(x, TS)]
+        block = make()
+        out = np.vstack(
+            [block.update_block(x[:90], TS[:90]), block.update_block(x[90:], TS[90:])]
+        )
+        assert np.allclose(out, expected, equal_nan=True)
+        assert np.array_equal(block.last_ts, single.last_ts)
+
+
+def regression_data(m=300, targets=4):
+    rng = np.random.default_rng(2)
+    X = np.column_stack([np.ones(m), rng.normal(size=(m, 2))])
+    Y = X @ rng.normal(size=(3, targets)) + 0.1 * rng.normal(size=(m, targets))
+    return X, Y
+
+
+def test_regression_block_matches_single_updates():
+    X, Y = regression_data()
+    single = ExpL2Regression(3, 10, 50)
+    for x, y in zip(X, Y[:, 0]):
+        single.update(x, y)
+
+    block = ExpL2Regression(3, 10, 50)
+    block.update_block(X[:200], Y[:200, 0])
+    block.update_block(X[200:], Y[200:, 0])
+    assert block.w.shape == (3,)
+    assert np.allclose(block.w, single.w)
+    assert np.allclose(block.P, single.P)
+
+    sqrt = SqrtExpL2Regression(3, 10, 50)
+    sqrt.update_block(X[:200], Y[:200, 0])
+    for x, y in zip(X[200:], Y[200:, 0]):
+        sqrt.update(x, y)
+    assert np.allclose(sqrt.w, single.w)
+    assert np.allclose(sqrt.P, single.P)
+    assert np.isclose(sqrt.predict(X[0]), single.predict(X[0]))
+
+
+def test_regression_targets_share_p():
+    X, Y = regression_data()
+    multi = ExpL2Regression(3, 10, 50, num_targets=4)
+    multi.update_block(X, Y)
+    sqrt = SqrtExpL2Regression(3, 10, 50, num_targets=4)
+    sqrt.update_block(X, Y)
+
+    for i in range(4):
+        single = ExpL2Regression(3, 10, 50)
+        for x, y in zip(X, Y[:, i]):
+            single.update(x, y)
+        assert np.allclose(multi.w[:, i], single.w)
+        assert np.allclose(sqrt.w[:, i], single.w)
+    assert multi.predict(X[:2]).shape == (2, 4)
@@ -0,0 +1,46 @@
+from pySimX.src.data_types import Order
+from pySimX.src.open_orders import RestingOrders
+
+
+def make_order(tick: int, amount: float = 1.0) -> Order:
+    return Order(
+        symbol="BTCUSDT",
+        side=1,
+        taker=False,
+        amount=amount,
+        price=tick / 100,
+        entryTime=0,
+        tick=tick,
+    )
+
+
+def test_fifo_per_price_level():
+    orders = RestingOrders()
+    a, b, c = make_order(100), make_order(100), make_order(101)
+    for order in [a, b, c]:
+        orders.add(order)
+
+    assert len(orders) == 3
+    assert orders.peekitem(0) == (100, a)
+    assert orders.peekitem(-1) == (101, c)
+    assert list(orders) == [a, b, c]
+
+    assert orders.popitem(0) == (100, a)
+    assert orders.popitem(0) == (100, b)
+    assert list(orders.levels) == [101]
+
+
+def test_remove_by_order_id():
+    orders = RestingOrders()
+    a, b = make_order(100), make_order(100)
+    orders.add(a)
+    orders.add(b)
+
+    assert orders.remove(a.order_id) is a
+    assert orders.remove(a.order_id) is None
+    assert a.order_id not in orders
+    assert orders.get(b.order_id) is b
+
+    orders.remove(b.order_id)
+    assert len(orders) == 0
+    assert len(orders.levels) == 0
@@ -1,7 +1,7 @@
-from matching_engine import OrderBook
-from data_types import Order
+from pySimX.src.matching_engine import OrderBook
+from pySimX.src.data_types import Order, OrderStatus
 
-# order_id: int, side: bool, amount: float, price: float, entryTime: int
+# side: bool, amount: float, price: float, entryTime: int
 orders = [
     [0, 12.5, 1.01, 1],
     [1, 12.5, 0.99, 1],
@@ -11,8 +11,122 @@ orders = [
     [1, 30, 0.99, 2],
 ]
 
-o = [Order(*i) for i in orders]
 
-ob = OrderBook()
-for order in o:
-    ob.add_order(order)
+def make_order(side: bool, amount: float, price: float, entryTime: int) -> Order:
+    return Order(
+        symbol="BTCUSDT",
+        side=side,
+        taker=False,
+        amount=amount,
+        price=price,
+        entryTime=entryTime,
+    )
+
+
+def test_resting_orders():
+    ob = OrderBook()
+    o = [make_order(*i) for i in orders]
+    for order in o:
+        assert ob.add_order(order) == []
+
+    assert len(ob) == 6
+    assert ob.best_bid() == 0.99
+    assert ob.best_ask() == 1.01
+    assert ob.depth(1).tolist() == [[0.99, 42.5], [0.98, 25]]
+    assert ob.depth(0).tolist() == [[1.01, 42.5], [1.02, 25]]
+
+
+def test_price_time_priority():
+    ob = OrderBook()
+    o = [make_order(*i) for i in orders]
+    for order in o:
+        ob.add_order(order)
+
+    # Takes the first order at 1.01 completely and part of the second one
+    taker = make_order(1, 20, 1.01, 3)
+    trades = ob.add_order(taker)
+
+    assert [(t.order_id, t.taker, t.amount, t.price) for t in trades] == [
+        (o[0].order_id, False, 12.5, 1.01),
+        (taker.order_id, True, 12.5, 1.01),
+        (o[4].order_id, False, 7.5, 1.01),
+        (taker.order_id, True, 7.5, 1.01),
+    ]
+    assert o[0].status == OrderStatus.FILLED
+    assert o[4].status == OrderStatus.PARTIALLY_FILLED
+    assert o[4].remainingAmount == 22.5
+    assert taker.status == OrderStatus.FILLED
+    assert ob.depth(0, 1).tolist() == [[1.01, 22.5]]
+
+
+def test_sweep_levels_and_rest():
+    ob = OrderBook()
+    o = [make_order(*i) for i in orders]
+    for order in o:
+        ob.add_order(order)
+
+    taker = make_order(0, 100, 0.98, 3)
+    trades = ob.add_order(taker)
+
+    assert [t.price for t in trades if t.taker] == [0.99, 0.99, 0.98]
+    assert taker.remainingAmount == 100 - 67.5
+    assert ob.best_bid() is None
+    assert ob.best_ask() == 0.98
+
+
+def test_market_order_sweeps_levels():
+    ob = OrderBook()
+    o = [make_order(*i) for i in orders]
+    for order in o:
+        ob.add_order(order)
+
+    # Takes all bids and is not rested, the rest is cancelled
+    taker = make_order(0, 100, None, 3)
+    trades = ob.add_order(taker)
+
+    assert [(t.price, t.amount) for t in trades if t.taker] == [
+        (0.99, 12.5),
+        (0.99, 30),
+        (0.98, 25),
+    ]
+    assert taker.remainingAmount == 100 - 67.5
+    assert taker.status == OrderStatus.CANCELLED
+    assert ob.best_bid() is None
+    assert ob.best_ask() == 1.01
+    assert len(ob) == 3
+
+    buy = make_order(1, 20, None, 4)
+    assert [t.price for t in ob.add_order(buy) if t.taker] == [1.01, 1.01]
+    assert buy.status == OrderStatus.FILLED
+    empty = make_order(1, 1, None, 5)
+    assert OrderBook().add_order(empty) == []
+    assert empty.status == OrderStatus.CANCELLED
+
+
+def test_cancel():
+    ob = OrderBook()
+    o = [make_order(*i) for i in orders]
+    for order in o:
+        ob.add_order(order)
+
+    assert ob.cancel_order(o[1])
+    assert not ob.cancel_order(o[1])
+    assert o[1].status == OrderStatus.CANCELLED
+    assert ob.depth(1, 1).tolist() == [[0.99, 30]]
+
+    ob.cancel_order(o[5])
+    assert ob.best_bid() == 0.98
+
+
+def test_ladder_grows():
+    ob = OrderBook(tick_size=1, size=8)
+    ob.add(1, 1, 100, 1.0)
+    ob.add(2, 0, 1_000, 1.0)
+    ob.add(3, 1, 10, 1.0)
+
+    assert ob.best_bid() == 100
+    assert ob.best_ask() == 1_000
+
+    assert ob.add(4, 0, 5, 3.0) == 1.0
+    assert [fill[0] for fill in ob.fills] == [1, 3]
+    assert ob.best_ask() == 5
@@ -0,0 +1,81 @@
+from pySimX.src.exchange import TOB_Exchange
+from pySimX.src.latency_models import ConstantLatency
+from pySimX.src.scheduler import Scheduler
+
+SYMBOL = "BTCUSDT"
+
+
+def make_exchange(timestamps, batch=False) -> TOB_Exchange:
+    exchange = TOB_Exchange(
+        fees=[0, 0], latency=ConstantLatency(2), batch_market_data=batch
+    )
+    exchange.add_market(SYMBOL, "BTC", "USDT")
+    exchange.add_balance("BTC", 1)
+    exchange.add_balance("USDT", 1_000)
+    exchange.load_tob([[ts, 1.0, 99.0, 101.0, 1.0] for ts in timestamps], SYMBOL)
+    return exchange
+
+
+def test_events_in_global_time_order():
+    a = make_exchange([0, 10, 20, 30])
+    b = make_exchange([5, 15, 16, 40])
+    scheduler = Scheduler({"a": a, "b": b})
+    scheduler.prepare_backtest()
+
+    clock = []
+    while scheduler.has_events():
+        scheduler.step()
+        clock.append(scheduler.now)
+
+    # The first update of every venue is its initial TOB
+    assert clock == [10, 15, 16, 20, 30, 40]
+
+
+def test_user_event_moves_exchange_ahead():
+    a = make_exchange([0, 10, 20])
+    b = make_exchange([0, 20])
+    scheduler = Scheduler({"a": a, "b": b})
+    scheduler.prepare_backtest()
+    assert scheduler.now == 10
+
+    # The order reaches b at 12, before its next market data
+    b.market_order(SYMBOL, 0.1, 1, scheduler.now)
+    assert scheduler.step() is a
+    assert scheduler.step() is b
+    assert scheduler.now == 12
+    assert [t.eventTime for t in b.trades] == [12]
+    assert scheduler.step() is a
+    assert scheduler.step() is b
+    assert not scheduler.has_events()
+
+
+def test_batching_stops_at_other_venues():
+    a = make_exchange(list(range(0, 100, 10)), batch=True)
+    b = make_exchange([0, 35, 70])
+    scheduler = Scheduler({"a": a, "b": b})
+    scheduler.prepare_backtest()
+
+    clock = []
+    while scheduler.has_events():
+        scheduler.step()
+        clock.append(scheduler.now)
+
+    assert clock == [30, 35, 70, 70, 90]
+
+
+def test_horizon_only_set_during_a_step():
+    a = make_exchange(list(range(0, 100, 10)), batch=True)
+    b = make_exchange([0, 35, 70])
+    scheduler = Scheduler({"a": a, "b": b})
+    scheduler.prepare_backtest()
+    scheduler.step()
+    assert scheduler.now == 30
+    assert a.horizon is None
+
+    # Replayed on its own, the whole market data is one batch
+    a.prepare_backtest()
+    steps = 0
+    while a.has_events():
+        a._simulation_step()
+        steps += 1
+    assert steps == 1
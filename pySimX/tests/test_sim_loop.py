@@ -0,0 +1,82 @@
+from pySimX.src.exchange import TOB_Exchange
+from pySimX.src.latency_models import ConstantLatency
+from pySimX.src.scheduler import Scheduler
+from pySimX.src.sim_loop import SimLoop, any_of, next_fill, next_tob, sleep
+
+SYMBOL = "BTCUSDT"
+
+# [timestamp, bid_amount, bid_price, ask_price, ask_amount]
+TOB_UPDATES = [
+    [0, 1.0, 99.0, 101.0, 1.0],
+    [10, 1.0, 99.0, 101.0, 1.0],
+    [20, 1.0, 99.5, 100.5, 1.0],
+    [30, 1.0, 98.0, 99.0, 1.0],
+    [40, 1.0, 100.0, 102.0, 1.0],
+]
+
+
+def make_exchange(symbols=[SYMBOL]) -> TOB_Exchange:
+    exchange = TOB_Exchange(fees=[0, 0], latency=ConstantLatency(1))
+    exchange.add_balance("BTC", 1)
+    exchange.add_balance("USDT", 1_000)
+    for symbol in symbols:
+        exchange.add_market(symbol, "BTC", "USDT")
+        exchange.load_tob([list(i) for i in TOB_UPDATES], symbol)
+    return exchange
+
+
+def test_tob_changes_and_timers():
+    exchange = make_exchange()
+    loop = SimLoop(Scheduler({"a": exchange}))
+
+    async def strategy():
+        seen = []
+        # The update at 10 repeats the TOB and does not wake the coroutine
+        tob = await next_tob(exchange, SYMBOL)
+        seen.append((loop.now, tob.bp))
+        await sleep(15)
+        seen.append(loop.now)
+        tob = await next_tob(exchange, SYMBOL)
+        seen.append((loop.now, tob.bp))
+        return seen
+
+    assert loop.run_tasks([strategy()]) == [[(20, 99.5), 35, (40, 100.0)]]
+
+
+def test_wait_for_fill_or_timeout():
+    exchange = make_exchange()
+    loop = SimLoop(Scheduler({"a": exchange}))
+
+    async def strategy():
+        # Nothing trades at 90 before the timeout
+        order = exchange.limit_order(SYMBOL, 0.1, 90.0, 1, loop.now)
+        which, _ = await any_of(next_fill(exchange, order), sleep(12))
+        exchange.cancel_order(order)
+
+        order = exchange.limit_order(SYMBOL, 0.1, 99.0, 1, loop.now)
+        which_2, trade = await any_of(next_fill(exchange, order), sleep(100))
+        return which, which_2, trade.price, loop.now
+
+    assert loop.run_tasks([strategy()]) == [(1, 0, 99.0, 30)]
+
+
+def test_waiting_coroutines_are_not_resumed():
+    exchange = make_exchange([SYMBOL, "ETHUSDT"])
+    loop = SimLoop(Scheduler({"a": exchange}))
+    resumed = []
+
+    async def waiter(i):
+        await next_fill(exchange)
+        resumed.append(i)
+
+    async def watcher():
+        tob = await next_tob(exchange, "ETHUSDT")
+        return tob.bp
+
+    for i in range(1_000):
+        loop.spawn(waiter(i))
+    task = loop.spawn(watcher())
+    loop.run()
+
+    assert resumed == []
+    assert task.result == 99.5
@@ -0,0 +1,59 @@
+from pySimX.src.event_store import EventStore
+from pySimX.src.exchange import TOB_Exchange
+from pySimX.src.latency_models import LogNormalLatency
+from pySimX.src.sweep import parameter_grid, run_sweep
+
+SYMBOL = "BTCUSDT"
+
+
+class buy_once:
+    def __init__(self, exchange, amount, price):
+        self.exchange = exchange
+        self.amount = amount
+        self.price = price
+
+    def run_simulation(self):
+        self.exchange.prepare_backtest()
+        self.exchange.limit_order(SYMBOL, self.amount, self.price, 1, 0)
+        while self.exchange.has_events():
+            self.exchange._simulation_step()
+
+
+def build(events, seed):
+    exchange = TOB_Exchange(
+        fees=[0, 0], latency=LogNormalLatency(5, 0.3, seed=seed), events=events
+    )
+    exchange.add_market(SYMBOL, "BTC", "USDT")
+    exchange.add_balance("BTC", 0)
+    exchange.add_balance("USDT", 1_000)
+    return {"exchange": exchange}
+
+
+def make_store():
+    store = EventStore()
+    store.add_tob(
+        [[t, 1, 100 - t / 10, 101 - t / 10, 1] for t in range(0, 100, 10)], SYMBOL
+    )
+    return store
+
+
+def test_parameter_grid():
+    grid = parameter_grid({"a": [1, 2], "b": [3]})
+
+    assert grid == [{"a": 1, "b": 3}, {"a": 2, "b": 3}]
+
+
+def test_run_sweep():
+    grid = {"amount": [1, 2], "price": [91.5, 99.0]}
+    store = make_store()
+    results = run_sweep(buy_once, grid, build, data=store, max_workers=2)
+    local = run_sweep(buy_once, grid, build, data=make_store(), max_workers=1)
+
+    assert len(results) == 4
+    assert results.equals(local)
+    # Merged once before the workers were forked
+    assert store._data is not None
+    assert results["seed"].nunique() == 4
+    assert results.loc[results.price == 99.0, "exchange_trades"].tolist() == [1, 1]
+    assert results.loc[results.price == 91.5, "exchange_trades"].tolist() == [0, 0]
+    assert results.loc[results.price == 99.0, "exchange_BTC"].tolist() == [1, 2]
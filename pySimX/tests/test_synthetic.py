@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from pySimX.src.data_types import EventKind
+from pySimX.src.exchange import TOB_Exchange
+from pySimX.src.latency_models import ConstantLatency
+from pySimX.src.synthetic import SyntheticMarket, synthetic_store, synthetic_stream
+
+MARKETS = [
+    SyntheticMarket("BTCUSDT", price=30_000, tick_size=0.1, trade_rate=20),
+    SyntheticMarket("ETHUSDT", price=2_000, tick_size=0.01, quote_rate=100),
+]
+MINUTE = 60_000_000
+
+
+def test_store_is_seeded_and_realistic():
+    store = synthetic_store(MARKETS, MINUTE * 15, chunk_us=MINUTE * 2, seed=1)
+    data = store.data
+    again = synthetic_store(MARKETS, MINUTE * 15, chunk_us=MINUTE * 2, seed=1).data
+    other = synthetic_store(MARKETS, MINUTE * 15, chunk_us=MINUTE * 2, seed=2).data
+    assert np.array_equal(again, data)
+    assert not np.array_equal(other[:100], data[:100])
+    assert (np.diff(data["ts"]) >= 0).all() and data["ts"][-1] <= MINUTE * 15
+
+    btc = data[data["symbol"] == store.symbol_ids["BTCUSDT"]]
+    tob = btc[btc["kind"] == EventKind.TOB]
+    trades = btc[btc["kind"] == EventKind.TRADE]
+    # 20 exogenous trades per second, 1 / (1 - 0.6) trades per exogenous trade
+    assert len(trades) / 900 == pytest.approx(50, rel=0.05)
+    assert (tob["ap"] > tob["bp"]).all()
+    assert np.allclose(tob["bp"] / 0.1, np.round(tob["bp"] / 0.1))
+
+    # Every trade is followed by the TOB after it and happened at the quote before it
+    rows = np.flatnonzero(btc["kind"] == EventKind.TRADE)
+    assert (btc["kind"][rows + 1] == EventKind.TOB).all()
+    _, _, bp, ap, _ = store.initial["BTCUSDT"]
+    bids = np.concatenate([[bp], tob["bp"]])
+    asks = np.concatenate([[ap], tob["ap"]])
+    # Number of TOB records before every trade
+    before = np.cumsum(btc["kind"] == EventKind.TOB)[rows]
+    quote = np.where(trades["side"] == 1, asks[before], bids[before])
+    assert np.array_equal(trades["price"], quote)
+
+
+def test_stream_replays_like_the_store():
+    stream = synthetic_stream(MARKETS, MINUTE, chunk_us=5_000_000, seed=3)
+    store = synthetic_store(MARKETS, MINUTE, chunk_us=5_000_000, seed=3)
+    assert stream.initial == store.initial
+
+    exchange = TOB_Exchange(latency=ConstantLatency(1), events=stream)
+    exchange.add_market("BTCUSDT", "BTC", "USDT", tick_size=0.1)
+    exchange.add_market("ETHUSDT", "ETH", "USDT")
+    exchange.add_balance("BTC", 0)
+    exchange.add_balance("USDT", 1_000_000)
+    exchange.prepare_backtest()
+    exchange.market_order("BTCUSDT", 1, 1, 0)
+    replayed = 0
+    while exchange.has_events():
+        exchange._simulation_step()
+        replayed += 1
+
+    assert replayed == len(store.data) + 1
+    assert exchange.balances["BTC"] == 1
+    last = store.data[store.data["kind"] == EventKind.TOB][-1]
+    symbol = store.symbols[last["symbol"]]
+    assert exchange.markets[symbol].ap == last["ap"]
+
+
+def test_invalid_parameters():
+    with pytest.raises(ValueError):
+        SyntheticMarket("X", branching=1.0)
+    with pytest.raises(ValueError):
+        SyntheticMarket("X", spread=0.5)
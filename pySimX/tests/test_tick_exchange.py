@@ -0,0 +1,201 @@
+import numpy as np
+import pandas as pd
+
+from pySimX.src.data_loader import read_tardis
+from pySimX.src.data_types import OrderStatus
+from pySimX.src.exchange import TickExchange
+from pySimX.src.ladder import BookLadder
+from pySimX.src.latency_models import ConstantLatency
+from pySimX.src.wakeup import At
+
+SYMBOL = "BTCUSDT"
+
+# [timestamp, side, price, amount, is_snapshot]
+BOOK = [
+    [0, "bid", 99.0, 2.0, True],
+    [0, "bid", 98.5, 3.0, True],
+    [0, "ask", 100.0, 1.0, True],
+    [0, "ask", 100.5, 2.0, True],
+    [15, "bid", 99.0, 1.0, False],
+    [40, "ask", 100.0, 0.5, False],
+]
+
+# [timestamp, id, side, price, amount]
+TRADES = [
+    [10, 1, "sell", 99.0, 1.5],
+    [20, 2, "sell", 99.0, 1.0],
+    [30, 3, "sell", 98.5, 0.1],
+]
+
+
+def make_exchange() -> TickExchange:
+    exchange = TickExchange(fees=[0, 0], latency=ConstantLatency(1))
+    exchange.add_market(SYMBOL, "BTC", "USDT", tick_size=0.5)
+    exchange.add_balance("BTC", 10)
+    exchange.add_balance("USDT", 10_000)
+    exchange.load_book([list(i) for i in BOOK], SYMBOL)
+    exchange.load_trades([list(i) for i in TRADES], SYMBOL)
+    exchange.prepare_backtest()
+    return exchange
+
+
+def test_ladder_updates_top_of_book():
+    ladder = BookLadder(0.1, size=8)
+    ladder.update(1, 100.0, 1.0)
+    ladder.update(1, 99.5, 2.0)
+    ladder.update(0, 100.3, 3.0)
+    # Outside of the initial ladder
+    ladder.update(0, 120.0, 4.0)
+
+    assert ladder.top() == (1.0, 100.0, 100.3, 3.0)
+
+    ladder.update(1, 100.0, 0)
+    ladder.update(0, 100.3, 0)
+
+    assert ladder.top() == (2.0, 99.5, 120.0, 4.0)
+    assert ladder.depth(1).tolist() == [[99.5, 2.0]]
+
+
+def test_market_order_walks_the_book():
+    exchange = make_exchange()
+    # Apply the snapshot, the order arrives at 1
+    for _ in range(4):
+        exchange._simulation_step()
+    exchange.market_order(SYMBOL, 1.5, 1, 0)
+    exchange._simulation_step()
+
+    assert [(t.price, t.amount) for t in exchange.trades] == [
+        (100.0, 1.0),
+        (100.5, 0.5),
+    ]
+    assert all(t.taker for t in exchange.trades)
+    assert exchange.markets[SYMBOL].ap == 100.5
+    assert exchange.markets[SYMBOL].aq == 1.5
+
+
+def test_resting_order_queue_position():
+    exchange = make_exchange()
+    exchange.limit_order(SYMBOL, 1.0, 99.0, 1, 0)
+
+    # Snapshot and the order arriving at 1
+    for _ in range(5):
+        exchange._simulation_step()
+    order = exchange.open_orders[SYMBOL][1].peekitem(-1)[1]
+    assert exchange.queue_ahead[order.order_id] == 2.0
+
+    # A trade of 1.5 at the price and a smaller level leave 0.5 in front of the order
+    exchange._simulation_step()
+    exchange._simulation_step()
+    assert exchange.queue_ahead[order.order_id] == 0.5
+    assert len(exchange.trades) == 0
+
+    # The next trade fills half the order, the one below its price the rest
+    exchange._simulation_step()
+    assert order.status == OrderStatus.PARTIALLY_FILLED
+    assert exchange.trades[0].amount == 0.5
+
+    exchange._simulation_step()
+    assert order.status == OrderStatus.FILLED
+    assert [t.amount for t in exchange.trades] == [0.5, 0.5]
+    assert not any(t.taker for t in exchange.trades)
+    assert len(exchange.open_orders[SYMBOL][1]) == 0
+
+
+def test_modify_after_partial_fill():
+    modified, replaced = make_exchange(), make_exchange()
+    orders = []
+    for exchange in [modified, replaced]:
+        orders.append(exchange.limit_order(SYMBOL, 1.0, 99.0, 1, 0))
+        for _ in range(8):
+            exchange._simulation_step()
+        assert orders[-1].remainingAmount == 0.5
+
+    # The new amount includes the filled 0.5, a smaller one is rejected
+    order = orders[0]
+    modified.modify_order(order, amount=0.4)
+    modified.modify_order(order, amount=0.8)
+    modified._simulation_step()
+    assert order.remainingAmount == 0.5
+    modified._simulation_step()
+    assert (order.amount, order.remainingAmount) == (0.8, 0.3)
+
+    new = replaced.replace_order(orders[1], amount=0.8)
+    replaced._simulation_step()
+    assert orders[1].status == OrderStatus.CANCELLED
+    assert (new.amount, new.remainingAmount) == (0.3, 0.3)
+
+    for exchange in [modified, replaced]:
+        while exchange.has_events():
+            exchange._simulation_step()
+        assert sum(t.amount for t in exchange.trades) == 0.8
+
+
+def test_crossing_limit_order_takes_liquidity_first():
+    exchange = make_exchange()
+    exchange.limit_order(SYMBOL, 2.0, 100.0, 1, 0)
+
+    while exchange.has_events():
+        exchange._simulation_step()
+
+    # 1.0 is taken from the ask at 100, the rest rests at 100 and is filled by the
+    # ask that arrives at its price
+    assert [(t.price, t.amount, t.taker) for t in exchange.trades] == [
+        (100.0, 1.0, True),
+        (100.0, 1.0, False),
+    ]
+
+
+def test_snapshot_replaces_book():
+    exchange = make_exchange()
+    exchange.events.add_book(
+        [[50, "bid", 90.0, 1.0, True], [50, "ask", 91.0, 1.0, True]], SYMBOL
+    )
+    exchange.prepare_backtest()
+
+    while exchange.has_events():
+        exchange._simulation_step()
+
+    bids, asks = exchange.book(SYMBOL)
+    assert bids.tolist() == [[90.0, 1.0]]
+    assert asks.tolist() == [[91.0, 1.0]]
+
+
+def test_fast_forward_applies_book_updates():
+    stepped = make_exchange()
+    while stepped.has_events():
+        stepped._simulation_step()
+
+    # Snapshots are never skipped
+    skipped = make_exchange()
+    assert skipped.fast_forward([At(1_000)]) == 0
+    for _ in range(4):
+        skipped._simulation_step()
+    assert skipped.fast_forward([At(1_000)]) == 5
+
+    for exchange in [stepped, skipped]:
+        bids, asks = exchange.book(SYMBOL)
+        assert bids.tolist() == [[99.0, 1.0], [98.5, 3.0]]
+        assert asks.tolist() == [[100.0, 0.5], [100.5, 2.0]]
+        assert exchange.markets[SYMBOL].ap == 100.0
+
+
+def test_read_tardis_book(tmp_path):
+    path = tmp_path / "binance-futures_incremental_book_L2_2023-07-01_BTCUSDT.csv.gz"
+    pd.DataFrame(
+        {
+            "exchange": "binance-futures",
+            "symbol": SYMBOL,
+            "timestamp": [0, 0, 5],
+            "local_timestamp": [1, 1, 6],
+            "is_snapshot": ["true", "true", "false"],
+            "side": ["bid", "ask", "bid"],
+            "price": [99.0, 100.0, 99.0],
+            "amount": [1.0, 2.0, 0.0],
+        }
+    ).to_csv(path, index=False)
+
+    store = read_tardis([], [], book=[str(path)])
+
+    assert store.data["kind"].tolist() == [6, 6, 5]
+    assert store.data["side"].tolist() == [1, 0, 1]
+    assert np.array_equal(store.data["amount"], [1.0, 2.0, 0.0])
@@ -0,0 +1,128 @@
+import numpy as np
+
+from pySimX.src.exchange import TOB_Exchange
+from pySimX.src.latency_models import ConstantLatency
+from pySimX.src.wakeup import At, Elapsed, PriceCross, Spread
+
+SYMBOL = "BTCUSDT"
+
+
+def make_exchange() -> TOB_Exchange:
+    exchange = TOB_Exchange(fees=[0, 0], latency=ConstantLatency(1))
+    exchange.add_market(SYMBOL, "BTC", "USDT")
+    exchange.add_balance("BTC", 10)
+    exchange.add_balance("USDT", 100_000)
+
+    mids = 100 + np.sin(np.arange(1_000) / 50) * 5
+    spreads = np.where(np.arange(1_000) == 700, 1.0, 0.1)
+    exchange.load_tob(
+        np.column_stack(
+            [
+                np.arange(1_000) * 10,
+                np.ones(1_000),
+                mids - spreads / 2,
+                mids + spreads / 2,
+                np.ones(1_000),
+            ]
+        ),
+        SYMBOL,
+    )
+    exchange.prepare_backtest()
+    return exchange
+
+
+def mid(exchange: TOB_Exchange) -> float:
+    return (exchange.markets[SYMBOL].bp + exchange.markets[SYMBOL].ap) / 2
+
+
+def test_price_cross():
+    exchange = make_exchange()
+
+    skipped = exchange.fast_forward([PriceCross(SYMBOL, above=104)])
+    exchange._simulation_step()
+
+    assert mid(exchange) >= 104
+    assert exchange.last_timestamp == (skipped + 1) * 10
+
+    # Before the last step, the price was still below
+    exchange = make_exchange()
+    exchange.fast_forward([PriceCross(SYMBOL, above=104)])
+    assert mid(exchange) < 104
+
+
+def test_spread_and_time():
+    exchange = make_exchange()
+    exchange.fast_forward([Spread(SYMBOL, above=0.5)])
+    exchange._simulation_step()
+
+    assert exchange.last_timestamp == 7_000
+
+    exchange.fast_forward([Elapsed(1_000)])
+    exchange._simulation_step()
+
+    assert exchange.last_timestamp == 8_000
+
+    exchange.fast_forward([At(9_000), PriceCross(SYMBOL, below=0)])
+    exchange._simulation_step()
+
+    assert exchange.last_timestamp == 9_000
+
+
+def test_open_orders_are_not_skipped():
+    exchange = make_exchange()
+    exchange.limit_order(SYMBOL, 1, 96, 1, 0)
+    exchange._simulation_step()
+    exchange._simulation_step()
+    assert len(exchange.open_orders[SYMBOL][1]) == 1
+
+    exchange.fast_forward([])
+
+    assert len(exchange.trades) == 0
+    exchange._simulation_step()
+    assert len(exchange.trades) == 1
+    assert exchange.trades[0].price == 96
+
+
+class threshold:
+    def __init__(self, exchange: TOB_Exchange) -> None:
+        self.exchange = exchange
+        self.position = 0
+
+    def run_strategy(self) -> None:
+        price = mid(self.exchange)
+        ts = self.exchange.last_timestamp or 0
+        if price <= 96 and self.position <= 0:
+            self.exchange.market_order(SYMBOL, 1, 1, ts)
+            self.position = 1
+        elif price >= 104 and self.position >= 0:
+            self.exchange.market_order(SYMBOL, 1, 0, ts)
+            self.position = -1
+
+    def wake_conditions(self) -> list:
+        # Only wake up for the price levels at which the strategy would trade
+        above = 104 if self.position >= 0 else None
+        below = 96 if self.position <= 0 else None
+        return [PriceCross(SYMBOL, above=above, below=below)]
+
+
+def test_fast_forward_matches_full_replay():
+    results = []
+    for fast in [False, True]:
+        exchange = make_exchange()
+        strategy = threshold(exchange)
+        steps = 0
+        while exchange.has_events():
+            strategy.run_strategy()
+            if fast:
+                exchange.fast_forward(strategy.wake_conditions())
+                if not exchange.has_events():
+                    break
+            exchange._simulation_step()
+            steps += 1
+        results.append(
+            (steps, [(t.eventTime, t.side, t.price) for t in exchange.trades])
+        )
+
+    assert len(results[0][1]) > 2
+    assert results[0][1] == results[1][1]
+    assert results[1][0] < results[0][0] / 10